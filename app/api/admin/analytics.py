@@ -202,15 +202,9 @@
 #     summary["repeat_rate"] = round((rc / tc) * 100, 2) if tc else 0
 #
 #     return {"window_days": days, "summary": summary, "cohorts": rows}
-from datetime import datetime, timezone, timedelta
-from fastapi import APIRouter, Query, Depends
-from app.db.mongo import get_db
-
-router = APIRouter(prefix="/admin/analytics", tags=["Admin Analytics"])
-
-from datetime import datetime, timezone, timedelta
-from fastapi import APIRouter, Query, Depends
-from app.db.mongo import get_db
+from fastapi import APIRouter, Query
+from app.core.cache import REQUESTS_TAG, cache_key, response_cache
+from app.services import cohort_rollups
 
 router = APIRouter(prefix="/admin/analytics", tags=["Admin Analytics"])
 
@@ -218,74 +212,23 @@ router = APIRouter(prefix="/admin/analytics", tags=["Admin Analytics"])
 async def get_cohorts(
     days: int = Query(30, ge=1, le=365),
     limit: int = Query(20, ge=1, le=200),
-    db=Depends(get_db),
 ):
-    now = datetime.now(timezone.utc)
-    start = now - timedelta(days=days)
-
-    col = db["service_requests"]  # ✅ make sure your collection name is EXACTLY "requests"
-
-    base = [
-        # ✅ normalize created_at to Date no matter if stored as Date or string
-        {"$addFields": {"_created_at": {"$toDate": "$timestamps.created_at"}}},
-
-        # ✅ filter window using normalized date
-        {"$match": {"_created_at": {"$gte": start}}},
-
-        # ✅ normalize grouping fields (use fallbacks like your old code)
-        {"$addFields": {
-            "_zone": {"$ifNull": ["$zone_name", {"$ifNull": ["$zone", {"$ifNull": ["$sla_policy.zone", ""]}]}]},
-            "_cat":  {"$ifNull": ["$category", {"$ifNull": ["$sla_policy.category_code", ""]}]},
-            "_sub":  {"$ifNull": ["$sub_category", {"$ifNull": ["$sub_category_code", {"$ifNull": ["$sla_policy.subcategory_code", ""]}]}]},
-        }},
-
-        {"$group": {
-            "_id": {"zone": "$_zone", "category": "$_cat", "sub_category": "$_sub"},
-            "total_requests": {"$sum": 1},
-            "first_seen": {"$min": "$_created_at"},
-            "last_seen": {"$max": "$_created_at"},
-        }},
-
-        {"$project": {
-            "_id": 0,
-            "zone": "$_id.zone",
-            "category": "$_id.category",
-            "sub_category": "$_id.sub_category",
-            "total_requests": 1,
-            "first_seen": 1,
-            "last_seen": 1,
-        }},
-    ]
-
-    summary_pipeline = base + [
-        {"$group": {
-            "_id": None,
-            "total_cohorts": {"$sum": 1},
-            "repeated_cohorts": {"$sum": {"$cond": [{"$gte": ["$total_requests", 2]}, 1, 0]}},
-            "total_requests_in_window": {"$sum": "$total_requests"},
-        }},
-        {"$project": {"_id": 0, "total_cohorts": 1, "repeated_cohorts": 1, "total_requests_in_window": 1}},
-    ]
+    return await response_cache.get_or_compute(
+        cache_key("admin.analytics.cohorts", days=days, limit=limit),
+        lambda: _build_cohorts(days, limit),
+        tags=(REQUESTS_TAG,),
+    )
 
-    list_pipeline = base + [
-        {"$sort": {"total_requests": -1, "last_seen": -1}},
-        {"$limit": limit},
-    ]
 
-    summary_rows = await col.aggregate(summary_pipeline).to_list(length=1)
-    summary = summary_rows[0] if summary_rows else {
-        "total_cohorts": 0,
-        "repeated_cohorts": 0,
-        "total_requests_in_window": 0,
-    }
+async def _build_cohorts(days: int, limit: int):
+    # ✅ answered from cohort_daily_rollups (maintained on create + backfill), no raw scan
+    result = await cohort_rollups.query_cohorts(days, limit)
 
-    total = summary["total_cohorts"] or 0
-    repeated = summary["repeated_cohorts"] or 0
-    summary["repeat_rate"] = round((repeated / total) * 100, 2) if total else 0
+    return {"__backend_version": "NEW_COHORTS_V2", **result}
 
-    cohorts = await col.aggregate(list_pipeline).to_list(length=limit)
-    for c in cohorts:
-        c["is_repeated"] = (c.get("total_requests") or 0) >= 2
-        c["cohort_key"] = f"{c.get('zone','')}|{c.get('category','')}|{c.get('sub_category','')}"
 
-    return {"__backend_version": "NEW_COHORTS_V2", "summary": summary, "cohorts": cohorts}
+@router.post("/cohorts/backfill")
+async def backfill_cohorts():
+    result = await cohort_rollups.backfill()
+    response_cache.invalidate(REQUESTS_TAG)
+    return result
@@ -1,6 +1,7 @@
 from fastapi import APIRouter
 from app.db.mongo import audit_collection
 from app.repositories.audit_repository import AuditRepository
+from app.services.audit_pipeline import audit_pipeline
 from app.services.audit_service import AuditService
 
 router = APIRouter(prefix="/admin/audit", tags=["Admin - Audit"])
@@ -12,3 +13,8 @@ service = AuditService(repo)
 async def list_audit_logs():
 
     return await service.list_logs()
+
+
+@router.get("/pipeline/stats")
+async def audit_pipeline_stats():
+    return audit_pipeline.stats()
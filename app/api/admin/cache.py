@@ -0,0 +1,20 @@
+from fastapi import APIRouter
+
+from app.core.cache import idempotency_cache, response_cache
+
+router = APIRouter(prefix="/admin/cache", tags=["Admin Cache"])
+
+
+@router.get("/stats")
+async def cache_stats():
+    return response_cache.stats()
+
+
+@router.get("/idempotency/stats")
+async def idempotency_cache_stats():
+    return idempotency_cache.stats()
+
+
+@router.post("/invalidate")
+async def invalidate_cache(tag: str | None = None):
+    return {"ok": True, "dropped": response_cache.invalidate(tag)}
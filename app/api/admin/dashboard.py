@@ -1,66 +1,217 @@
+import asyncio
+
 from fastapi import APIRouter
 from datetime import datetime, timedelta
-from collections import defaultdict
 
 from app.db.mongo import requests_collection
 from app.db.mongo import users_collection, team_collection
+from app.core.cache import REQUESTS_TAG, cache_key, response_cache
+from app.services import dashboard_counters
 from bson import ObjectId
 
 router = APIRouter(prefix="/admin", tags=["Admin Dashboard"])
 
+OPEN_STATUSES = ["new", "triaged", "assigned", "in_progress"]
+
+MS_PER_HOUR = 1000 * 60 * 60
+MS_PER_MINUTE = 1000 * 60
+
+
+def _dashboard_pipeline(now: datetime) -> list:
+    """
+    One pass over service_requests for the widgets that depend on "now" or on
+    per-document math (response time, SLA, categories, trend). Plain counts
+    (totals, status, priority, zones, teams) come from dashboard_counters,
+    open requests per stored-deadline SLA state from _open_sla_counts.
+    """
+    last_7_days = now - timedelta(days=7)
+
+    return [
+        {
+            "$project": {
+                "_id": 0,
+                "category": 1,
+                "sub_category": 1,
+                "created_at": "$timestamps.created_at",
+                "triaged_at": "$timestamps.triaged_at",
+                "sla_policy.target_hours": 1,
+                "sla_policy.breach_threshold_hours": 1,
+            }
+        },
+        {
+            "$facet": {
+                # =========================
+                # AVG RESPONSE TIME (created → triaged)
+                # =========================
+                "response": [
+                    {
+                        "$group": {
+                            "_id": None,
+                            "avg_response_minutes": {
+                                "$avg": {
+                                    "$cond": [
+                                        {"$and": ["$created_at", "$triaged_at"]},
+                                        {
+                                            "$divide": [
+                                                {"$subtract": ["$triaged_at", "$created_at"]},
+                                                MS_PER_MINUTE,
+                                            ]
+                                        },
+                                        None,
+                                    ]
+                                }
+                            },
+                        }
+                    }
+                ],
+
+                # =========================
+                # SLA PERFORMANCE (COMPUTED)
+                # every request with a policy, open or closed, measured from
+                # created_at: historical compliance
+                # =========================
+                "sla": [
+                    {"$match": {
+                        "sla_policy": {"$type": "object", "$ne": {}},
+                        "created_at": {"$ne": None},
+                    }},
+                    {
+                        "$project": {
+                            "elapsed_hours": {
+                                "$divide": [{"$subtract": [now, "$created_at"]}, MS_PER_HOUR]
+                            },
+                            "target_hours": "$sla_policy.target_hours",
+                            "breach_hours": "$sla_policy.breach_threshold_hours",
+                        }
+                    },
+                    {
+                        "$group": {
+                            "_id": {
+                                "$switch": {
+                                    "branches": [
+                                        {
+                                            "case": {"$gte": ["$elapsed_hours", "$breach_hours"]},
+                                            "then": "breached",
+                                        },
+                                        {
+                                            "case": {"$gte": ["$elapsed_hours", "$target_hours"]},
+                                            "then": "at_risk",
+                                        },
+                                    ],
+                                    "default": "ok",
+                                }
+                            },
+                            "count": {"$sum": 1},
+                        }
+                    },
+                ],
+
+                # =========================
+                # REQUESTS BY CATEGORY + SUBCATEGORY
+                # =========================
+                "categories": [
+                    {
+                        "$group": {
+                            "_id": {
+                                "category": {"$ifNull": ["$category", "Uncategorized"]},
+                                "sub": {"$ifNull": ["$sub_category", None]},
+                            },
+                            "count": {"$sum": 1},
+                        }
+                    },
+                    {
+                        "$group": {
+                            "_id": "$_id.category",
+                            "total": {"$sum": "$count"},
+                            "subs": {
+                                "$push": {
+                                    "$cond": [
+                                        {"$in": ["$_id.sub", [None, ""]]},
+                                        "$$REMOVE",
+                                        {"name": "$_id.sub", "count": "$count"},
+                                    ]
+                                }
+                            },
+                        }
+                    },
+                ],
+
+                # =========================
+                # TREND (LAST 7 DAYS)
+                # =========================
+                "trend": [
+                    {"$match": {"created_at": {"$gte": last_7_days}}},
+                    {
+                        "$group": {
+                            "_id": {"$dateToString": {"format": "%Y-%m-%d", "date": "$created_at"}},
+                            "count": {"$sum": 1},
+                        }
+                    },
+                    {"$sort": {"_id": 1}},
+                ],
+            }
+        },
+    ]
+
+
+async def _open_sla_counts(now: datetime) -> dict:
+    """
+    Open requests per SLA state right now, from the stored deadlines
+    (sla_target_at / sla_breach_at, measured from triage) with the same bounds
+    as /admin/requests/sla/at-risk. Indexed range counts on (status, deadline).
+    """
+    open_q = {"status": {"$in": OPEN_STATUSES}}
+    ok, at_risk, breached = await asyncio.gather(
+        requests_collection.count_documents(
+            {**open_q, "sla_target_at": {"$gt": now}, "sla_breach_at": {"$gt": now}}
+        ),
+        requests_collection.count_documents(
+            {**open_q, "sla_target_at": {"$lte": now}, "sla_breach_at": {"$gt": now}}
+        ),
+        requests_collection.count_documents({**open_q, "sla_breach_at": {"$lte": now}}),
+    )
+    return {"ok": ok, "at_risk": at_risk, "breached": breached}
+
 
 @router.get("/dashboard")
 async def admin_dashboard():
-    requests = await requests_collection.find({}).to_list(None)
+    return await response_cache.get_or_compute(
+        cache_key("admin.dashboard"), _build_dashboard, tags=(REQUESTS_TAG,)
+    )
 
-    now = datetime.utcnow()
 
-    # =========================
-    # TOTALS
-    # =========================
-    total_requests = len(requests)
+async def _build_dashboard():
+    now = datetime.utcnow()
 
-    open_statuses = {"new", "triaged", "assigned", "in_progress"}
-    open_requests = sum(1 for r in requests if r.get("status") in open_statuses)
+    counters = await dashboard_counters.read_counters()
+    if not counters["total"]:
+        # first read after deploy (or after a wipe) -> build the counters once
+        await dashboard_counters.reconcile()
+        counters = await dashboard_counters.read_counters()
 
-    closed_requests = sum(1 for r in requests if r.get("status") == "closed")
-    closed_rate = round((closed_requests / total_requests) * 100, 2) if total_requests else 0
+    rows = await requests_collection.aggregate(_dashboard_pipeline(now)).to_list(length=1)
+    facets = rows[0] if rows else {}
 
     # =========================
-    # AVG RESPONSE TIME (created → triaged)
+    # TOTALS
     # =========================
-    response_times = []
-
-    for r in requests:
-        ts = r.get("timestamps", {})
-        created = ts.get("created_at")
-        triaged = ts.get("triaged_at")
-
-        if created and triaged:
-            response_times.append((triaged - created).total_seconds() / 60)
+    by_status = counters["status"]
+    total_requests = counters["total"].get("all", 0)
+    open_requests = sum(by_status.get(s, 0) for s in OPEN_STATUSES)
+    closed_requests = by_status.get("closed", 0)
+    closed_rate = round((closed_requests / total_requests) * 100, 2) if total_requests else 0
 
-    avg_response_time = round(sum(response_times) / len(response_times), 1) if response_times else None
+    response = (facets.get("response") or [{}])[0]
+    avg_response = response.get("avg_response_minutes")
+    avg_response_time = round(avg_response, 1) if avg_response is not None else None
 
     # =========================
     # SLA PERFORMANCE (COMPUTED)
     # =========================
-    sla_ok = sla_at_risk = sla_breached = 0
-
-    for r in requests:
-        sla = r.get("sla_policy")
-        created = r.get("timestamps", {}).get("created_at")
-
-        if not sla or not created:
-            continue
-
-        elapsed_hours = (now - created).total_seconds() / 3600
-
-        if elapsed_hours >= sla["breach_threshold_hours"]:
-            sla_breached += 1
-        elif elapsed_hours >= sla["target_hours"]:
-            sla_at_risk += 1
-        else:
-            sla_ok += 1
+    sla_counts = {row["_id"]: row["count"] for row in facets.get("sla", [])}
+    sla_ok = sla_counts.get("ok", 0)
+    sla_at_risk = sla_counts.get("at_risk", 0)
+    sla_breached = sla_counts.get("breached", 0)
 
     total_sla = sla_ok + sla_at_risk + sla_breached
     compliance = round((sla_ok / total_sla) * 100, 2) if total_sla else 0
@@ -77,64 +228,19 @@ async def admin_dashboard():
         "closed": 0
     }
 
-    for r in requests:
-        status = r.get("status", "new")
+    for status, count in by_status.items():
         if status in status_breakdown:
-            status_breakdown[status] += 1
-
-    # =========================
-    # PRIORITY DISTRIBUTION
-    # =========================
-    priority_distribution = defaultdict(int)
-    for r in requests:
-        if r.get("priority"):
-            priority_distribution[r["priority"]] += 1
+            status_breakdown[status] += count
 
     # =========================
     # REQUESTS BY CATEGORY + SUBCATEGORY
     # =========================
-    categories = {}
-
-    for r in requests:
-        cat = r.get("category", "Uncategorized")
-        sub = r.get("sub_category")
-
-        if cat not in categories:
-            categories[cat] = {
-                "category": cat,
-                "total": 0,
-                "subs": defaultdict(int)
-            }
-
-        categories[cat]["total"] += 1
-        if sub:
-            categories[cat]["subs"][sub] += 1
-
     requests_by_category = [
-        {
-            "category": c["category"],
-            "total": c["total"],
-            "subs": [
-                {"name": s, "count": n}
-                for s, n in c["subs"].items()
-            ]
-        }
-        for c in categories.values()
+        {"category": c["_id"], "total": c["total"], "subs": c["subs"]}
+        for c in facets.get("categories", [])
     ]
 
-    # =========================
-    # TREND (LAST 7 DAYS)
-    # =========================
-    last_7_days = now - timedelta(days=7)
-    trend_map = defaultdict(int)
-
-    for r in requests:
-        created = r.get("timestamps", {}).get("created_at")
-        if created and created >= last_7_days:
-            day = created.date().isoformat()
-            trend_map[day] += 1
-
-    trend = [{"date": d, "count": c} for d, c in sorted(trend_map.items())]
+    trend = [{"date": row["_id"], "count": row["count"]} for row in facets.get("trend", [])]
 
     # =========================
     # USER VERIFICATION STATS
@@ -154,20 +260,7 @@ async def admin_dashboard():
 
     teams = await team_collection.find({"deleted": False}).to_list(None)
 
-    team_requests_map = defaultdict(int)
-
-    for r in requests:
-        team_id = None
-
-        assigned_team = r.get("assignment", {}).get("assigned_team_id")
-        if assigned_team:
-            team_id = assigned_team
-
-        else:
-            team_id = r.get("sla_policy", {}).get("team_id")
-
-        if team_id:
-            team_requests_map[str(team_id)] += 1
+    team_requests_map = counters["team"]
 
     teams_summary = [
         {
@@ -187,20 +280,9 @@ async def admin_dashboard():
         "deleted": False
     })
 
-    # =========================
-    # ZONE DISTRIBUTION (FIXED)
-    # =========================
-    zone_distribution = defaultdict(int)
-
-    for r in requests:
-        zone = r.get("zone_name")  # ✅ ROOT LEVEL
-        if zone:
-            zone_distribution[zone] += 1
+    zones = [{"zone": z, "count": c} for z, c in counters["zone"].items()]
 
-    zones = [
-        {"zone": z, "count": c}
-        for z, c in zone_distribution.items()
-    ]
+    open_sla = await _open_sla_counts(now)
 
     # =========================
     # FINAL RESPONSE
@@ -219,10 +301,11 @@ async def admin_dashboard():
             "breached": sla_breached,
             "compliance_percent": compliance
         },
+        "open_sla": open_sla,
         "trend": trend,
         "priority_distribution": [
             {"priority": p, "count": c}
-            for p, c in priority_distribution.items()
+            for p, c in counters["priority"].items()
         ],
         "status_breakdown": status_breakdown,
         "requests_by_category": requests_by_category,
@@ -241,3 +324,10 @@ async def admin_dashboard():
         "zones": zones,
 
     }
+
+
+@router.post("/dashboard/counters/reconcile")
+async def reconcile_dashboard_counters():
+    result = await dashboard_counters.reconcile()
+    response_cache.invalidate(REQUESTS_TAG)
+    return result
@@ -1,41 +1,14 @@
 from bson import ObjectId
 from fastapi import APIRouter, HTTPException, Query
-from datetime import datetime, timezone
+from datetime import datetime
 
 from app.db.mongo import requests_collection, users_collection, performance_logs_collection
+from app.services.sla import sla_deadlines, sla_window, to_datetime
 from app.utils.mongo import serialize_mongo
 
 router = APIRouter(prefix="/admin/requests", tags=["Admin Requests"])
 
 
-def _to_dt(v):
-    if not v:
-        return None
-    if isinstance(v, datetime):
-        return v if v.tzinfo else v.replace(tzinfo=timezone.utc)
-    try:
-        s = str(v)
-        if s.endswith("Z"):
-            s = s[:-1] + "+00:00"
-        dt = datetime.fromisoformat(s)
-        return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
-    except:
-        return None
-
-
-def _compute_state(elapsed_min, target_hours, breach_hours):
-    if elapsed_min is None or target_hours is None:
-        return None
-
-    target_min = int(float(target_hours) * 60)
-    breach_min = int(float(breach_hours) * 60) if breach_hours is not None else None
-
-    if breach_min is not None and elapsed_min >= breach_min:
-        return "breached"
-    if elapsed_min >= target_min:
-        return "at_risk"
-    return "on_track"
-
 @router.get("/{request_id}/sla-monitoring")
 async def get_sla_monitoring(request_id: str):
     req = await requests_collection.find_one({"request_id": request_id})
@@ -51,13 +24,18 @@ async def get_sla_monitoring(request_id: str):
         ]
     })
 
-    # compute elapsed from request created_at
-    created_at = (req.get("timestamps") or {}).get("created_at") or req.get("created_at")
-    created_dt = _to_dt(created_at)
-    now = datetime.now(timezone.utc)
-    elapsed_min = int((now - created_dt).total_seconds() // 60) if created_dt else None
-
+    # SLA clock from the stored deadlines (measured from triage), the same ones
+    # /sla/at-risk and the SLA monitor use; falls back to the policy for
+    # requests whose deadlines were not backfilled yet
     sla = req.get("sla_policy") or {}
+    start_at, end_at = sla_window(req)
+    stored = {k: req.get(k) for k in ("sla_target_at", "sla_breach_at")}
+    deadlines = stored if any(stored.values()) else sla_deadlines(req, sla)
+    target_at = to_datetime(deadlines.get("sla_target_at"))
+    breach_at = to_datetime(deadlines.get("sla_breach_at"))
+
+    now = end_at or datetime.utcnow()
+    elapsed_min = int(max(0, (now - start_at).total_seconds()) // 60)
 
     # ✅ ALWAYS define kpis so you can safely use it later
     kpis = {}
@@ -66,17 +44,20 @@ async def get_sla_monitoring(request_id: str):
         perf_ser = serialize_mongo(perf)
         kpis = perf_ser.get("computed_kpis") or {}
 
-    # target/breach fallback: KPIs -> request.sla_policy
-    target_hours = kpis.get("sla_target_hours") or sla.get("target_hours")
-    breach_hours = kpis.get("breach_threshold_hours") or sla.get("breach_threshold_hours")
+    target_hours = sla.get("target_hours") or kpis.get("sla_target_hours")
+    breach_hours = sla.get("breach_threshold_hours") or target_hours
 
-    state = kpis.get("sla_state") or _compute_state(elapsed_min, target_hours, breach_hours)
-
-    target_min = int(float(target_hours) * 60) if target_hours is not None else None
-    breach_min = int(float(breach_hours) * 60) if breach_hours is not None else None
+    if breach_at is not None and now >= breach_at:
+        state = "breached"
+    elif target_at is not None and now >= target_at:
+        state = "at_risk"
+    elif target_at is not None:
+        state = "on_track"
+    else:
+        state = kpis.get("sla_state")
 
-    rem_target = max(target_min - elapsed_min, 0) if (elapsed_min is not None and target_min is not None) else None
-    rem_breach = max(breach_min - elapsed_min, 0) if (elapsed_min is not None and breach_min is not None) else None
+    rem_target = int(max(0, (target_at - now).total_seconds()) // 60) if target_at else None
+    rem_breach = int(max(0, (breach_at - now).total_seconds()) // 60) if breach_at else None
 
     return {
         "request_id": request_id,
@@ -84,6 +65,9 @@ async def get_sla_monitoring(request_id: str):
         "monitoring": {
             "state": state,
             "elapsed_minutes": elapsed_min,
+            "sla_started_at": start_at,
+            "sla_target_at": target_at,
+            "sla_breach_at": breach_at,
             "sla_target_hours": target_hours,
             "breach_threshold_hours": breach_hours,
             "remaining_to_target_minutes": rem_target,
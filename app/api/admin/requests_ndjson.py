@@ -0,0 +1,65 @@
+from datetime import datetime
+from typing import List, Optional
+
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+
+from app.jobs.progress import get_job
+from app.jobs.requests_ndjson import (
+    REFRESH_JOB_KIND,
+    export_ndjson,
+    export_query,
+    import_ndjson,
+    iter_lines,
+    start_refresh,
+)
+
+router = APIRouter(prefix="/admin/requests/ndjson", tags=["Admin Requests NDJSON"])
+
+
+@router.post("/import")
+async def import_requests(
+    request: Request,
+    batch_size: int = Query(1000, ge=1, le=10000),
+    refresh: bool = Query(False, description="rebuild dashboard counters / rollups afterwards, in the background"),
+):
+    """
+    Body: NDJSON (one service request per line), read as a stream.
+
+    The derived read models (dashboard counters, cohort rollups, quadkeys, SLA
+    deadlines) are rebuilt by a background job, with refresh=true or via
+    POST /refresh after the last batch; result["refresh_job"] is its progress.
+    """
+    result = await import_ndjson(iter_lines(request.stream()), batch_size)
+    if refresh and result["inserted"]:
+        result["refresh_job"] = start_refresh().to_dict()
+    return result
+
+
+@router.post("/refresh")
+async def refresh_derived_models():
+    return start_refresh().to_dict()
+
+
+@router.get("/refresh/{job_id}")
+async def refresh_progress(job_id: str):
+    job = await get_job(job_id)
+    if job is None or job["kind"] != REFRESH_JOB_KIND:
+        raise HTTPException(status_code=404, detail="Refresh job not found")
+    return job
+
+
+@router.get("/export")
+async def export_requests(
+    status: Optional[List[str]] = Query(None),
+    zone: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    batch_size: int = Query(1000, ge=1, le=10000),
+):
+    query = export_query(status, zone, created_from, created_to)
+    return StreamingResponse(
+        export_ndjson(query, batch_size),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="service_requests.ndjson"'},
+    )
@@ -1,19 +1,27 @@
-from fastapi import APIRouter, HTTPException
-from datetime import datetime
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import JSONResponse
+from datetime import datetime, timedelta
 from bson import ObjectId
+from pymongo import ReturnDocument
 
 from app.db.mongo import (
     requests_collection,
-    sla_rules_collection,
-    subcategory_collection,
     team_collection,
     audit_collection,
-    performance_logs_collection,
 )
+from app.core.cache import REQUESTS_TAG, cache_key, response_cache
+from app.core.config import get_settings
+from app.jobs.sla_monitor import CHECKPOINT as SLA_MONITOR_CHECKPOINT
+from app.jobs.sla_worker import request_sla_sweep, run_sla_scan_exclusive
+from app.repositories.job_checkpoints import JobCheckpointRepository
+from app.repositories.performance_logs import PerformanceLogRepository
+from app.services.sla import compute_kpis, sla_deadlines
+from app.services.sla_lookup import sla_lookup
 from app.models.sla_policy import SLAPolicyCreate, SLAPolicyUpdate
 from app.utils.mongo import serialize_mongo
 from app.repositories.audit_repository import AuditRepository
 from app.services.audit_service import AuditService
+from app.services.request_hooks import request_changed
 
 audit_service = AuditService(AuditRepository(audit_collection))
 
@@ -58,70 +66,16 @@ async def _validate_team_for_zone(team_id_str: str, zone: str):
     return team, oid
 
 
-def _dt(v):
-    # normalize to datetime or None
-    if isinstance(v, datetime):
-        return v
-    return None
-
-
-def _now():
-    return datetime.utcnow()
-
-
-def _minutes_between(a: datetime, b: datetime) -> int:
-    return int(max(0, (b - a).total_seconds() // 60))
-
-
-def _hours_between(a: datetime, b: datetime) -> float:
-    return max(0.0, (b - a).total_seconds() / 3600.0)
-
-
 def _compute_sla_kpis(req_doc: dict, sla_policy: dict) -> dict:
     """
-    Returns computed_kpis for performance_logs.
-    Minimal + consistent fields you already expect in UI.
+    Returns computed_kpis for performance_logs (shared SLA engine in app.services.sla).
     """
-    ts = (req_doc.get("timestamps") or {})
-    created_at = _dt(ts.get("created_at")) or _dt(req_doc.get("created_at")) or _now()
-
-    # SLA usually starts at triage (or created if missing)
-    start_at = _dt(ts.get("triaged_at")) or created_at
-
-    status = str(req_doc.get("status") or "").lower()
-    end_at = None
-    if status == "resolved":
-        end_at = _dt(ts.get("resolved_at"))
-    elif status == "closed":
-        end_at = _dt(ts.get("closed_at")) or _dt(ts.get("updated_at"))
-
-    current = end_at or _now()
-
-    target_h = float(sla_policy.get("target_hours") or 0)
-    breach_h = float(sla_policy.get("breach_threshold_hours") or target_h)
-
-    elapsed_h = _hours_between(start_at, current)
-
-    # Simple states (adjust if you want different logic)
-    if breach_h > 0 and elapsed_h >= breach_h:
-        sla_state = "breached"
-    elif target_h > 0 and elapsed_h >= target_h:
-        sla_state = "at_risk"
-    else:
-        sla_state = "on_track"
-
-    resolution_minutes = None
-    if end_at is not None:
-        resolution_minutes = _minutes_between(start_at, end_at)
-
-    return {
-        "resolution_minutes": resolution_minutes,
-        "sla_target_hours": target_h,
-        "sla_state": sla_state,
-        "escalation_count": int(sla_policy.get("escalation_count") or 0),
-        "breach_reason": sla_policy.get("breach_reason"),  # keep if you set it later
-        "computed_at": _now(),  # optional but useful
-    }
+    return compute_kpis(
+        req_doc,
+        sla_policy,
+        escalation_count=int(sla_policy.get("escalation_count") or 0),
+        breach_reason=sla_policy.get("breach_reason"),
+    )
 
 
 async def _upsert_performance_log(req_doc: dict):
@@ -134,22 +88,7 @@ async def _upsert_performance_log(req_doc: dict):
         return  # nothing to compute yet
 
     computed_kpis = _compute_sla_kpis(req_doc, sla_policy)
-
-    await performance_logs_collection.update_one(
-        {"request_id": req_doc["_id"]},  # ✅ ObjectId link
-        {
-            "$setOnInsert": {
-                "request_id": req_doc["_id"],
-                "event_stream": [],
-                "created_at": _now(),
-            },
-            "$set": {
-                "computed_kpis": computed_kpis,
-                "updated_at": _now(),
-            },
-        },
-        upsert=True,
-    )
+    await PerformanceLogRepository.upsert_kpis(req_doc["_id"], computed_kpis)  # ✅ ObjectId link
 
 
 # -------------------------------------------------------------------
@@ -165,13 +104,12 @@ async def create_sla(request_id: str, payload: dict):
     category = req["category"]
     subcategory = req["sub_category"]
 
-    sub = await subcategory_collection.find_one({"name": subcategory})
-    if not sub:
+    # ✅ rules + subcategory priorities come from the in-memory cache
+    priority = await sla_lookup.priority_for(subcategory)
+    if priority is None:
         raise HTTPException(status_code=400, detail="Invalid subcategory")
 
-    priority = sub["priority"]
-
-    rules = await sla_rules_collection.find_one()
+    rules = await sla_lookup.rules()
     if not rules:
         raise HTTPException(status_code=400, detail="Missing SLA rules")
 
@@ -213,6 +151,9 @@ async def create_sla(request_id: str, payload: dict):
         "status": new_status,
         "timestamps.triaged_at": now,
         "assignment.assigned_team_id": team_oid,
+        "next_sla_check_at": now,  # ✅ picked up by the SLA scheduler on its next poll
+        # ✅ absolute deadlines (clock starts at triage = now) for indexed at-risk queries
+        **sla_deadlines({"timestamps": {"triaged_at": now}}, sla_dump),
     }
 
     update = {"$set": set_doc}
@@ -222,10 +163,13 @@ async def create_sla(request_id: str, payload: dict):
     else:
         update["$unset"] = {"timestamps.assigned_at": ""}  # ✅ remove field
 
-    await requests_collection.update_one({"request_id": request_id}, update)
+    before = req
+    req = await requests_collection.find_one_and_update(
+        {"request_id": request_id}, update, return_document=ReturnDocument.AFTER
+    )
 
     # ✅ recompute & upsert performance log
-    req = await requests_collection.find_one({"request_id": request_id})
+    await request_changed(before, req)
     await _upsert_performance_log(req)
 
     meta = {"sla": sla.dict(by_alias=True)}
@@ -306,7 +250,12 @@ async def update_sla(request_id: str, payload: SLAPolicyUpdate):
     # merge SLA updates
     new_sla = {**before, **updates}
 
-    set_doc = {"sla_policy": new_sla}
+    # ✅ thresholds may have moved -> let the SLA scheduler re-evaluate now
+    set_doc = {
+        "sla_policy": new_sla,
+        "next_sla_check_at": datetime.utcnow(),
+        **sla_deadlines(req, new_sla),
+    }
 
     # ✅ keep assignment in sync if team changed
     team_changed = (
@@ -334,7 +283,9 @@ async def update_sla(request_id: str, payload: SLAPolicyUpdate):
     await requests_collection.update_one({"request_id": request_id}, {"$set": set_doc})
 
     # ✅ recompute & upsert performance log
+    before_req = req
     req = await requests_collection.find_one({"request_id": request_id})
+    await request_changed(before_req, req)
     await _upsert_performance_log(req)
     # audit changes
     changes = {
@@ -396,3 +347,224 @@ async def get_sla_teams(request_id: str):
         {"id": str(t["_id"]), "name": t["name"], "zones": t.get("zones", [])}
         for t in teams
     ]
+
+
+# -------------------------------------------------------------------
+# SLA monitor: full sweep now
+# -------------------------------------------------------------------
+@router.post("/sla/monitor/run")
+async def run_sla_monitor(
+    batch_size: int | None = Query(None, ge=1, le=5000),
+    concurrency: int | None = Query(None, ge=1, le=64),
+):
+    """
+    Without an SLA worker holding the "sla_monitor" lease the sweep runs here
+    and its stats are returned. Otherwise (the default deployment) it is handed
+    to that worker: 202, and GET /sla/monitor shows it once it has run.
+    Throughput benchmark: python -m app.jobs.sla_benchmark.
+    """
+    settings = get_settings()
+    stats = await run_sla_scan_exclusive(
+        batch_size or settings.sla_monitor_batch_size,
+        concurrency or settings.sla_monitor_concurrency,
+    )
+    if stats is None:
+        await request_sla_sweep()
+        return JSONResponse(
+            status_code=202,
+            content={"queued": True, "detail": "handed to the SLA worker holding the lease"},
+        )
+    return stats
+
+
+@router.get("/sla/monitor")
+async def sla_monitor_status():
+    """
+    Full sweep state: last_run stats, completed_at, requested_at while a handed-over
+    run is pending, last_id while a sweep is in progress or interrupted.
+    """
+    checkpoint = await JobCheckpointRepository.get(SLA_MONITOR_CHECKPOINT)
+    return serialize_mongo(checkpoint or {})
+
+
+# -------------------------------------------------------------------
+# At-risk / breached open requests (indexed range on stored deadlines)
+# -------------------------------------------------------------------
+SLA_OPEN_STATUSES = ["new", "triaged", "assigned", "in_progress"]
+
+
+@router.get("/sla/at-risk")
+async def list_sla_at_risk(
+    state: str = Query("at_risk", regex="^(at_risk|breached|all)$"),
+    zone: str | None = Query(None),
+    team_id: str | None = Query(None),
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+):
+    """
+    at_risk  : sla_target_at <= now < sla_breach_at
+    breached : sla_breach_at <= now
+    all      : sla_target_at <= now
+    Most urgent (earliest breach) first.
+    """
+    now = datetime.utcnow()
+    q = {"status": {"$in": SLA_OPEN_STATUSES}}
+    if state == "breached":
+        q["sla_breach_at"] = {"$lte": now}
+    elif state == "at_risk":
+        q["sla_target_at"] = {"$lte": now}
+        q["sla_breach_at"] = {"$gt": now}
+    else:
+        q["sla_target_at"] = {"$lte": now}
+
+    if zone:
+        q["zone_name"] = zone
+    if team_id:
+        # assigned_team_id is stored as ObjectId or as its string form
+        team_ids = [team_id] + ([ObjectId(team_id)] if ObjectId.is_valid(team_id) else [])
+        q["assignment.assigned_team_id"] = {"$in": team_ids}
+
+    projection = {
+        "request_id": 1,
+        "status": 1,
+        "category": 1,
+        "sub_category": 1,
+        "priority": 1,
+        "zone_name": 1,
+        "assignment.assigned_team_id": 1,
+        "sla_policy.target_hours": 1,
+        "sla_policy.breach_threshold_hours": 1,
+        "sla_target_at": 1,
+        "sla_breach_at": 1,
+    }
+
+    sort_field = "sla_target_at" if state != "breached" else "sla_breach_at"
+    cursor = (
+        requests_collection.find(q, projection)
+        .sort([(sort_field, 1), ("_id", 1)])
+        .skip(offset)
+        .limit(limit)
+    )
+    items = []
+    async for r in cursor:
+        breach_at = r.get("sla_breach_at")
+        r["sla_state"] = "breached" if breach_at and breach_at <= now else "at_risk"
+        r["minutes_to_breach"] = (
+            int((breach_at - now).total_seconds() // 60) if breach_at else None
+        )
+        items.append(serialize_mongo(r))
+
+    return {
+        "state": state,
+        "now": now,
+        "limit": limit,
+        "offset": offset,
+        "total": await requests_collection.count_documents(q),
+        "items": items,
+    }
+
+
+# -------------------------------------------------------------------
+# Breach forecast: open requests breaching within 1h / 4h / 24h per team + zone
+# -------------------------------------------------------------------
+FORECAST_HORIZONS_HOURS = (1, 4, 24)
+
+
+def _breach_forecast_pipeline(now: datetime) -> list:
+    horizon_end = now + timedelta(hours=max(FORECAST_HORIZONS_HOURS))
+
+    buckets = {
+        f"within_{h}h": {"$sum": {"$cond": [
+            {"$and": [
+                {"$gt": ["$sla_breach_at", now]},
+                {"$lte": ["$sla_breach_at", now + timedelta(hours=h)]},
+            ]},
+            1,
+            0,
+        ]}}
+        for h in FORECAST_HORIZONS_HOURS
+    }
+
+    return [
+        # indexed range on (status, sla_breach_at): already breached + next 24h
+        {"$match": {
+            "status": {"$in": SLA_OPEN_STATUSES},
+            "sla_breach_at": {"$lte": horizon_end},
+        }},
+        {"$project": {
+            "sla_breach_at": 1,
+            # assigned_team_id is stored as ObjectId or as its string form: one group
+            # per team, and the teams $lookup below matches on ObjectId
+            "team_id": {"$convert": {
+                "input": "$assignment.assigned_team_id",
+                "to": "objectId",
+                "onError": "$assignment.assigned_team_id",
+                "onNull": None,
+            }},
+            "zone": {"$ifNull": ["$zone_name", "$sla_policy.zone"]},
+        }},
+        {"$lookup": {
+            "from": "performance_logs",
+            "localField": "_id",
+            "foreignField": "request_id",
+            "pipeline": [{"$project": {"_id": 0, "escalation_count": "$computed_kpis.escalation_count"}}],
+            "as": "perf",
+        }},
+        {"$group": {
+            "_id": {"team_id": "$team_id", "zone": "$zone"},
+            "breached_now": {"$sum": {"$cond": [{"$lte": ["$sla_breach_at", now]}, 1, 0]}},
+            **buckets,
+            "escalated": {"$sum": {"$cond": [
+                {"$gt": [{"$ifNull": [{"$first": "$perf.escalation_count"}, 0]}, 0]}, 1, 0,
+            ]}},
+            "next_breach_at": {"$min": {"$cond": [
+                {"$gt": ["$sla_breach_at", now]}, "$sla_breach_at", None,
+            ]}},
+        }},
+        {"$lookup": {
+            "from": "teams",
+            "localField": "_id.team_id",
+            "foreignField": "_id",
+            "pipeline": [{"$project": {"_id": 0, "name": 1}}],
+            "as": "team",
+        }},
+        {"$project": {
+            "_id": 0,
+            "team_id": "$_id.team_id",
+            "team_name": {"$first": "$team.name"},
+            "zone": "$_id.zone",
+            "breached_now": 1,
+            **{k: 1 for k in buckets},
+            "escalated": 1,
+            "next_breach_at": 1,
+        }},
+        {"$sort": {f"within_{FORECAST_HORIZONS_HOURS[0]}h": -1, "breached_now": -1, "zone": 1}},
+    ]
+
+
+async def _build_breach_forecast() -> dict:
+    now = datetime.utcnow()
+    rows = await requests_collection.aggregate(_breach_forecast_pipeline(now)).to_list(length=None)
+
+    totals = {"breached_now": 0, **{f"within_{h}h": 0 for h in FORECAST_HORIZONS_HOURS}}
+    for r in rows:
+        for k in totals:
+            totals[k] += r.get(k, 0)
+
+    return serialize_mongo({
+        "generated_at": now,
+        "horizons_hours": list(FORECAST_HORIZONS_HOURS),
+        "totals": totals,
+        "groups": rows,
+    })
+
+
+@router.get("/sla/forecast")
+async def sla_breach_forecast():
+    # ✅ one aggregation, cached for a short TTL (and dropped on request writes)
+    return await response_cache.get_or_compute(
+        cache_key("admin.sla_forecast"),
+        _build_breach_forecast,
+        ttl=get_settings().sla_forecast_ttl_seconds,
+        tags=(REQUESTS_TAG,),
+    )
@@ -1,6 +1,9 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query
 from app.db.mongo import db, sla_rules_collection
+from app.jobs.progress import get_job
+from app.jobs.sla_recompute import JOB_KIND, start_recompute
 from app.models.sla_rules import SLARules
+from app.services.sla_lookup import sla_lookup
 
 router = APIRouter(prefix="/admin/sla-rules", tags=["Admin SLA Rules"])
 
@@ -19,4 +22,26 @@ async def get_sla_rules():
 async def save_sla_rules(payload: SLARules):
     await sla_rules_collection.delete_many({})
     await sla_rules_collection.insert_one(payload.dict(by_alias=True, exclude={"id"}))
-    return {"ok": True}
\ No newline at end of file
+    await sla_lookup.invalidate()
+    return {"ok": True}
+
+@router.get("/lookup/stats")
+async def sla_lookup_stats():
+    return sla_lookup.stats()
+
+@router.post("/recompute")
+async def recompute_sla_policies(
+    dry_run: bool = Query(True),
+    include_closed: bool = Query(False),
+    batch_size: int = Query(500, ge=1, le=5000),
+):
+    # ✅ re-derive target hours + KPIs of existing requests from the current rules
+    return start_recompute(dry_run, include_closed, batch_size).to_dict()
+
+
+@router.get("/recompute/{job_id}")
+async def recompute_progress(job_id: str):
+    job = await get_job(job_id)
+    if job is None or job["kind"] != JOB_KIND:
+        raise HTTPException(status_code=404, detail="Recompute job not found")
+    return job
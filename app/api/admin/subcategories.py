@@ -13,6 +13,7 @@ from app.schemas.category import (
 from app.models.category import Priority
 from app.repositories.audit_repository import AuditRepository
 from app.services.audit_service import AuditService
+from app.services.sla_lookup import sla_lookup
 
 
 audit_service = AuditService(AuditRepository(audit_collection))
@@ -66,6 +67,7 @@ async def create_subcategory(
 
     res = await db.subcategory.insert_one(doc)
     sub_id = str(res.inserted_id)
+    await sla_lookup.invalidate()
 
     await audit_service.log_event({
         "time": datetime.utcnow(),
@@ -136,6 +138,7 @@ async def update_subcategory(
         {"_id": ObjectId(subcategory_id)},
         {"$set": update_data}
     )
+    await sla_lookup.invalidate()
 
     after = await db.subcategory.find_one({"_id": ObjectId(subcategory_id)})
 
@@ -200,6 +203,7 @@ async def toggle_subcategory(
         {"_id": ObjectId(subcategory_id)},
         {"$set": {"active": new_active}}
     )
+    await sla_lookup.invalidate()
 
     await audit_service.log_event({
         "time": datetime.utcnow(),
@@ -251,6 +255,7 @@ async def delete_subcategory(
         {"_id": ObjectId(subcategory_id)},
         {"$set": {"deleted": True, "active": False}}
     )
+    await sla_lookup.invalidate()
 
     await audit_service.log_event({
         "time": datetime.utcnow(),
@@ -1,22 +1,226 @@
-from fastapi import APIRouter, Response, HTTPException
-import httpx
+import hashlib
+
+from fastapi import APIRouter, Header, Query, Response, HTTPException
+
+from app.core.config import get_settings
+from app.core.cache import REQUESTS_TAG, cache_key, response_cache
+from app.db.mongo import service_requests_collection
+from app.jobs import tile_prefetch
+from app.jobs.progress import get_job, list_jobs
+from app.services.heatmap import OPEN_STATUSES
+from app.services.tile_cache import TileFetchError, tile_cache
+from app.utils.geo import QUADKEY_ZOOM, quadkey_to_tile, tile_center, tile_to_quadkey
+from app.utils.mvt import encode_point_layer, lnglat_to_tile_pixel
 
 router = APIRouter(prefix="/tiles", tags=["Tiles"])
 
+MVT_MEDIA_TYPE = "application/vnd.mapbox-vector-tile"
+
+# below this zoom a tile carries aggregated cells, from it on individual requests
+REQUEST_POINTS_MIN_ZOOM = 14
+# cells per tile side = 2 ** CELL_ZOOM_OFFSET
+CELL_ZOOM_OFFSET = 6
+MAX_POINTS_PER_TILE = 5000
+
+
 @router.get("/{z}/{x}/{y}.png")
-async def osm_tile(z: int, x: int, y: int):
-    url = f"https://tile.openstreetmap.org/{z}/{x}/{y}.png"
+async def osm_tile(
+    z: int,
+    x: int,
+    y: int,
+    if_none_match: str | None = Header(default=None, alias="If-None-Match"),
+):
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            r = await client.get(url)
-        if r.status_code != 200:
-            raise HTTPException(status_code=r.status_code, detail="Tile fetch failed")
-        return Response(
-            content=r.content,
-            media_type="image/png",
-            headers={
-                "Cache-Control": "public, max-age=86400",
+        content, meta = await tile_cache.get_tile(z, x, y)
+    except TileFetchError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+    headers = {"Cache-Control": "public, max-age=86400"}
+    etag = meta.get("etag") or f'"{hashlib.sha1(content).hexdigest()}"'
+    headers["ETag"] = etag
+    if meta.get("last_modified"):
+        headers["Last-Modified"] = meta["last_modified"]
+
+    if if_none_match and etag in [t.strip() for t in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+
+    return Response(content=content, media_type="image/png", headers=headers)
+
+
+# =========================
+# Prefetch / cache coverage
+# =========================
+
+def _bbox(west, south, east, north):
+    given = [v is not None for v in (west, south, east, north)]
+    if not any(given):
+        return None
+    if not all(given):
+        raise HTTPException(status_code=400, detail="Give all of west, south, east, north or none")
+    if west >= east or south >= north:
+        raise HTTPException(status_code=400, detail="Invalid bounding box")
+    return west, south, east, north
+
+
+@router.post("/prefetch")
+async def start_tile_prefetch(
+    west: float | None = Query(None, ge=-180, le=180),
+    south: float | None = Query(None, ge=-85.05112878, le=85.05112878),
+    east: float | None = Query(None, ge=-180, le=180),
+    north: float | None = Query(None, ge=-85.05112878, le=85.05112878),
+    min_zoom: int | None = Query(None, ge=0, le=19),
+    max_zoom: int | None = Query(None, ge=0, le=19),
+):
+    # ✅ default bbox = extent of service_requests.location, zooms from settings
+    try:
+        job = await tile_prefetch.start_prefetch(_bbox(west, south, east, north), min_zoom, max_zoom)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return job.to_dict()
+
+
+@router.get("/prefetch")
+async def list_tile_prefetches():
+    return {"items": await list_jobs(tile_prefetch.JOB_KIND)}
+
+
+@router.get("/prefetch/{job_id}")
+async def tile_prefetch_progress(job_id: str):
+    job = await get_job(job_id)
+    if job is None or job["kind"] != tile_prefetch.JOB_KIND:
+        raise HTTPException(status_code=404, detail="Prefetch job not found")
+    return job
+
+
+@router.get("/cache/coverage")
+async def tile_cache_coverage(
+    west: float | None = Query(None, ge=-180, le=180),
+    south: float | None = Query(None, ge=-85.05112878, le=85.05112878),
+    east: float | None = Query(None, ge=-180, le=180),
+    north: float | None = Query(None, ge=-85.05112878, le=85.05112878),
+    min_zoom: int | None = Query(None, ge=0, le=19),
+    max_zoom: int | None = Query(None, ge=0, le=19),
+):
+    settings = get_settings()
+    min_zoom = settings.tile_prefetch_min_zoom if min_zoom is None else min_zoom
+    max_zoom = settings.tile_prefetch_max_zoom if max_zoom is None else max_zoom
+    if min_zoom > max_zoom:
+        raise HTTPException(status_code=400, detail="Invalid zoom range")
+
+    bbox = _bbox(west, south, east, north) or await tile_prefetch.requests_extent()
+    if bbox is None:
+        raise HTTPException(status_code=404, detail="No request locations to derive a bounding box from")
+
+    return {
+        "bbox": list(bbox),
+        "zooms": tile_prefetch.coverage(bbox, min_zoom, max_zoom),
+        "cache": tile_cache.stats(),
+    }
+
+
+# =========================
+# Vector tiles (open requests)
+# =========================
+
+def _tile_prefix(z: int, x: int, y: int) -> str:
+    # quadkeys are stored at QUADKEY_ZOOM; deeper tiles filter by their zoom-18 parent
+    if z > QUADKEY_ZOOM:
+        shift = z - QUADKEY_ZOOM
+        return tile_to_quadkey(x >> shift, y >> shift, QUADKEY_ZOOM)
+    return tile_to_quadkey(x, y, z)
+
+
+async def _request_points_layer(z: int, x: int, y: int) -> bytes:
+    cursor = service_requests_collection.find(
+        {
+            "status": {"$in": OPEN_STATUSES},
+            "location_quadkey": {"$regex": f"^{_tile_prefix(z, x, y)}"},
+        },
+        {
+            "request_id": 1,
+            "status": 1,
+            "priority": 1,
+            "category": 1,
+            "sub_category": 1,
+            "zone_name": 1,
+            "location.coordinates": 1,
+        },
+    ).limit(MAX_POINTS_PER_TILE)
+
+    features = []
+    async for r in cursor:
+        lng, lat = r["location"]["coordinates"]
+        px, py = lnglat_to_tile_pixel(lng, lat, x, y, z)
+        if z > QUADKEY_ZOOM and not (0 <= px <= 4096 and 0 <= py <= 4096):
+            continue
+        features.append({
+            "x": px,
+            "y": py,
+            "properties": {
+                "request_id": r.get("request_id"),
+                "status": r.get("status"),
+                "priority": r.get("priority"),
+                "category": r.get("category"),
+                "sub_category": r.get("sub_category"),
+                "zone": r.get("zone_name"),
             },
-        )
-    except Exception:
-        raise HTTPException(status_code=502, detail="Tile proxy error")
+        })
+
+    return encode_point_layer("requests", features)
+
+
+async def _cells_layer(z: int, x: int, y: int) -> bytes:
+    cell_zoom = min(z + CELL_ZOOM_OFFSET, QUADKEY_ZOOM)
+    pipeline = [
+        {"$match": {
+            "status": {"$in": OPEN_STATUSES},
+            "location_quadkey": {"$regex": f"^{_tile_prefix(z, x, y)}"},
+        }},
+        {"$group": {
+            "_id": {"$substrCP": ["$location_quadkey", 0, cell_zoom]},
+            "count": {"$sum": 1},
+        }},
+    ]
+
+    features = []
+    async for row in service_requests_collection.aggregate(pipeline):
+        lng, lat = tile_center(*quadkey_to_tile(row["_id"]))
+        px, py = lnglat_to_tile_pixel(lng, lat, x, y, z)
+        features.append({
+            "x": px,
+            "y": py,
+            "properties": {"count": row["count"], "weight": row["count"], "quadkey": row["_id"]},
+        })
+
+    return encode_point_layer("cells", features)
+
+
+async def _build_requests_tile(z: int, x: int, y: int) -> bytes:
+    if z >= REQUEST_POINTS_MIN_ZOOM:
+        return await _request_points_layer(z, x, y)
+    return await _cells_layer(z, x, y)
+
+
+@router.get("/requests/{z}/{x}/{y}.mvt")
+async def requests_vector_tile(
+    z: int,
+    x: int,
+    y: int,
+    if_none_match: str | None = Header(default=None, alias="If-None-Match"),
+):
+    if not (0 <= z <= 22) or not (0 <= x < 2 ** z) or not (0 <= y < 2 ** z):
+        raise HTTPException(status_code=404, detail="Tile out of range")
+
+    body = await response_cache.get_or_compute(
+        cache_key("tiles.requests", z=z, x=x, y=y),
+        lambda: _build_requests_tile(z, x, y),
+        tags=(REQUESTS_TAG,),
+    )
+
+    etag = f'"{hashlib.sha1(body).hexdigest()}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+
+    if if_none_match and etag in [t.strip() for t in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+
+    return Response(content=body, media_type=MVT_MEDIA_TYPE, headers=headers)
@@ -1,17 +1,25 @@
 # app/api/service_requests.py
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Query, Header, Request
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Query, Header, Request, Response
 from datetime import datetime
 from bson import ObjectId
 from pathlib import Path
+import hashlib
+import json
 import uuid
 import os
 
 
-from pymongo.errors import DuplicateKeyError
+from pydantic import ValidationError
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 from pymongo import ReturnDocument
 
+from app.core.cache import idempotency_cache
+from app.core.config import get_settings
 from app.db.mongo import service_requests_collection, db, users_collection, team_collection
 from app.schemas.service_request import (
+    BulkCreateItemResult,
+    BulkCreateServiceRequestsBody,
+    BulkCreateServiceRequestsResponse,
     CreateServiceRequestBody,
     CreateServiceRequestResponse,
     UpdateServiceRequestBody,
@@ -19,105 +27,32 @@ from app.schemas.service_request import (
 )
 from app.db.mongo import audit_collection
 from app.repositories.audit_repository import AuditRepository
+from app.repositories.performance_logs import PerformanceLogRepository
+from app.repositories.requests import ServiceRequestRepository
 from app.services.audit_service import AuditService
+from app.services.request_hooks import request_changed, requests_changed
+from app.services.request_ids import make_request_id, request_ids
+from app.services.sla import compute_kpis
+from app.utils.geo import lnglat_to_quadkey
 
 audit_service = AuditService(AuditRepository(audit_collection))
 
 router = APIRouter(prefix="/service-requests", tags=["Service Requests"])
 
 performance_logs_collection = db["performance_logs"]
-counters_collection = db["counters"]
 
 
 # -------------------------
 # Helpers
 # -------------------------
 
-def _dt(v):
-    if isinstance(v, datetime):
-        return v
-    if isinstance(v, str):
-        try:
-            return datetime.fromisoformat(v.replace("Z", "+00:00"))
-        except:
-            return None
-    return None
-
-
-def _minutes_between(a: datetime, b: datetime) -> int:
-    return int(max(0, (b - a).total_seconds() // 60))
-
-
-def _hours_between(a: datetime, b: datetime) -> float:
-    return max(0.0, (b - a).total_seconds() / 3600.0)
-
-
 def _compute_kpis(sr: dict) -> dict:
-    ts = sr.get("timestamps") or {}
-    created_at = _dt(ts.get("created_at")) or _dt(sr.get("created_at")) or datetime.utcnow()
-    triaged_at = _dt(ts.get("triaged_at")) or created_at
-
-    status = (sr.get("status") or "").lower()
-    end_at = None
-    if status == "resolved":
-        end_at = _dt(ts.get("resolved_at"))
-    elif status == "closed":
-        end_at = _dt(ts.get("closed_at")) or _dt(ts.get("updated_at"))
-
-    now = datetime.utcnow()
-    current = end_at or now
-
-    sla_policy = sr.get("sla_policy") or {}
-    target_h = float(sla_policy.get("target_hours") or 0)
-    breach_h = float(sla_policy.get("breach_threshold_hours") or target_h)
-
-    elapsed_h = _hours_between(triaged_at, current)
-
-    if breach_h > 0 and elapsed_h >= breach_h:
-        sla_state = "breached"
-    elif target_h > 0 and elapsed_h >= target_h:
-        sla_state = "at_risk"
-    else:
-        sla_state = "on_track"
-
-    resolution_minutes = None
-    if end_at is not None:
-        resolution_minutes = _minutes_between(triaged_at, end_at)
-
-    return {
-        "resolution_minutes": resolution_minutes,
-        "sla_target_hours": target_h,
-        "sla_state": sla_state,
-        "escalation_count": 0,
-        "breach_reason": None,
-        "computed_at": now,
-    }
+    # shared SLA engine (app.services.sla); escalations are owned by the SLA monitor
+    return compute_kpis(sr)
 
 
 async def _upsert_perf_log(sr: dict):
-    sr_oid = sr["_id"]
-    now = datetime.utcnow()
-    kpis = _compute_kpis(sr)
-
-    await performance_logs_collection.update_one(
-        {"request_id": sr_oid},
-        {
-            "$setOnInsert": {
-                "request_id": sr_oid,
-                "event_stream": [],
-                "created_at": now,
-            },
-            "$set": {
-                "computed_kpis": kpis,
-                "updated_at": now,
-            },
-        },
-        upsert=True,
-    )
-
-
-def _make_request_id(year: int, seq: int) -> str:
-    return f"CST-{year}-{seq:04d}"
+    await PerformanceLogRepository.upsert_kpis(sr["_id"], _compute_kpis(sr))
 
 
 def _parse_citizen_id(x_citizen_id: str | None) -> ObjectId | None:
@@ -138,48 +73,6 @@ def _parse_oid(x: str | None) -> ObjectId | None:
     return ObjectId(x)
 
 
-async def _next_seq_for_year(year: int) -> int:
-    """
-    Atomic counter per year:
-    counters: { _id: "service_requests_2026", seq: 4 }
-    """
-    key = f"service_requests_{year}"
-    doc = await counters_collection.find_one_and_update(
-        {"_id": key},
-        {"$inc": {"seq": 1}},
-        upsert=True,
-        return_document=ReturnDocument.AFTER
-    )
-    return int(doc["seq"])
-
-
-async def _sync_counter_to_latest(year: int) -> int:
-    """
-    Self-healing:
-    If counters is behind existing requests, sync it to the latest seq found in DB.
-    Returns the max_seq it synced to.
-    """
-    last = await service_requests_collection.find_one(
-        {"request_id": {"$regex": f"^CST-{year}-"}},
-        sort=[("request_id", -1)]
-    )
-
-    max_seq = 0
-    if last and last.get("request_id"):
-        try:
-            max_seq = int(last["request_id"].split("-")[-1])
-        except:
-            max_seq = 0
-
-    key = f"service_requests_{year}"
-    await counters_collection.update_one(
-        {"_id": key},
-        {"$set": {"seq": max_seq}},
-        upsert=True
-    )
-    return max_seq
-
-
 async def _assert_staff_or_403(x_staff_id: str | None) -> ObjectId:
     staff_oid = _parse_oid(x_staff_id)
     if staff_oid is None:
@@ -248,24 +141,18 @@ def _actor_from_request(doc: dict, citizen_oid: ObjectId | None):
     }
 
 
-# =========================
-# Create Service Request
-# =========================
-@router.post("", response_model=CreateServiceRequestResponse)
-async def create_service_request(body: CreateServiceRequestBody):
-    now = datetime.utcnow()
-    year = now.year
+def _citizen_oid(body: CreateServiceRequestBody) -> ObjectId | None:
+    if body.citizen_ref.anonymous:
+        return None
+    if not body.citizen_ref.citizen_id:
+        raise HTTPException(400, "citizen_id is required when anonymous=false")
+    if not ObjectId.is_valid(body.citizen_ref.citizen_id):
+        raise HTTPException(400, "Invalid citizen_id")
+    return ObjectId(body.citizen_ref.citizen_id)
 
-    citizen_id = None
-    if not body.citizen_ref.anonymous:
-        if body.citizen_ref.citizen_id:
-            if not ObjectId.is_valid(body.citizen_ref.citizen_id):
-                raise HTTPException(400, "Invalid citizen_id")
-            citizen_id = ObjectId(body.citizen_ref.citizen_id)
-        else:
-            raise HTTPException(400, "citizen_id is required when anonymous=false")
 
-    doc_base = {
+def _new_request_doc(body: CreateServiceRequestBody, citizen_id: ObjectId | None, now: datetime) -> dict:
+    return {
         "citizen_ref": {
             "citizen_id": citizen_id,
             "anonymous": body.citizen_ref.anonymous,
@@ -289,61 +176,259 @@ async def create_service_request(body: CreateServiceRequestBody):
             "type": "Point",
             "coordinates": [body.location.lng, body.location.lat]
         },
+        "location_quadkey": lnglat_to_quadkey(body.location.lng, body.location.lat),
         "address_hint": body.address_hint,
         "zone_name": body.zone_name,
         "assignment": {"assigned_team_id": None},
         "evidence": [],
     }
 
+
+def _create_audit_event(body: CreateServiceRequestBody, citizen_id: ObjectId | None, request_id: str) -> dict:
+    actor = {
+        "role": "citizen" if not body.citizen_ref.anonymous else "anonymous",
+        "email": "citizen@system" if not body.citizen_ref.anonymous else "anonymous@system",
+    }
+    return {
+        "time": datetime.utcnow(),
+        "type": "request.create",
+        "actor": actor,
+        "entity": {"type": "service_request", "id": request_id},
+        "message": f"Service request created: {request_id}",
+        "meta": {
+            "anonymous": body.citizen_ref.anonymous,
+            "citizen_id": str(citizen_id) if citizen_id else None,
+            "contact_channel": body.citizen_ref.contact_channel,
+            "category": body.category,
+            "sub_category": body.sub_category,
+            "zone_name": body.zone_name,
+            "address_hint": body.address_hint,
+            "location": {"lng": body.location.lng, "lat": body.location.lat},
+            "status": "new",
+            "priority": "P1",
+        }
+    }
+
+
+# =========================
+# Create Service Request
+# =========================
+@router.post("", response_model=CreateServiceRequestResponse)
+async def create_service_request(
+    body: CreateServiceRequestBody,
+    response: Response,
+    idempotency_key: str | None = Header(default=None, alias="Idempotency-Key"),
+):
+    """
+    With an Idempotency-Key header, retries of the same key get the first
+    response back (Idempotent-Replayed: true) instead of a new request.
+    Keys are scoped to the citizen (anonymous callers share one scope) and
+    bound to the body they were first used with: a reused key with a different
+    body is rejected with 422. Recent keys are answered from memory; older ones
+    from the stored request.
+    """
+    citizen_id = _citizen_oid(body)
+    if idempotency_key is None:
+        result, _ = await _create_service_request(body, citizen_id)
+        return result
+
+    key = idempotency_key.strip()
+    if not key or len(key) > 255:
+        raise HTTPException(400, "Invalid Idempotency-Key")
+
+    scoped_key = f"{citizen_id or 'anonymous'}:{key}"
+    fingerprint = _body_fingerprint(body)
+    created = False
+
+    async def create_or_replay():
+        nonlocal created
+        existing = await ServiceRequestRepository.find_by_idempotency_key(scoped_key)
+        if existing is None:
+            result, existing = await _create_service_request(
+                body, citizen_id, (scoped_key, fingerprint)
+            )
+            if existing is None:
+                created = True
+                return {"response": result, "fingerprint": fingerprint}
+        return {
+            "response": _create_response(existing["request_id"]),
+            "fingerprint": existing.get("idempotency_fingerprint"),
+        }
+
+    # single-flight: concurrent retries of one key share a single create
+    entry = await idempotency_cache.get_or_compute(scoped_key, create_or_replay)
+    if entry["fingerprint"] != fingerprint:
+        raise HTTPException(422, "Idempotency-Key was already used with a different request body")
+    if not created:
+        response.headers["Idempotent-Replayed"] = "true"
+    return entry["response"]
+
+
+def _body_fingerprint(body: CreateServiceRequestBody) -> str:
+    return hashlib.sha256(
+        json.dumps(body.dict(), sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()
+
+
+def _create_response(request_id: str) -> dict:
+    return CreateServiceRequestResponse(
+        request_id=request_id,
+        status="new",
+        sla_hint="Submitted. Waiting for triage."
+    ).dict()
+
+
+def _is_idempotency_conflict(e: DuplicateKeyError) -> bool:
+    key_pattern = (e.details or {}).get("keyPattern") or {}
+    return "idempotency_key" in key_pattern or "idempotency_key" in str(e)
+
+
+async def _create_service_request(
+    body: CreateServiceRequestBody,
+    citizen_id: ObjectId | None,
+    idempotency: tuple[str, str] | None = None,
+) -> tuple[dict | None, dict | None]:
+    """
+    Returns (response, None) for a new request. With idempotency =
+    (scoped_key, fingerprint), a key stored concurrently by another worker
+    returns (None, existing_request) instead, to be answered as a replay.
+    """
+    now = datetime.utcnow()
+    year = now.year
+
+    doc_base = _new_request_doc(body, citizen_id, now)
+    if idempotency is not None:
+        doc_base["idempotency_key"], doc_base["idempotency_fingerprint"] = idempotency
+
     for attempt in range(12):
-        seq = await _next_seq_for_year(year)
-        request_id = _make_request_id(year, seq)
+        seq = await request_ids.next_seq(year)
+        request_id = make_request_id(year, seq)
 
         doc = dict(doc_base)
         doc["request_id"] = request_id
 
         try:
             await service_requests_collection.insert_one(doc)
+            await request_changed(None, doc)
+            await audit_service.log_event(_create_audit_event(body, citizen_id, request_id))
 
-            actor = {
-                "role": "citizen" if not body.citizen_ref.anonymous else "anonymous",
-                "email": "citizen@system" if not body.citizen_ref.anonymous else "anonymous@system",
-            }
+            return _create_response(request_id), None
 
-            await audit_service.log_event({
-                "time": datetime.utcnow(),
-                "type": "request.create",
-                "actor": actor,
-                "entity": {"type": "service_request", "id": request_id},
-                "message": f"Service request created: {request_id}",
-                "meta": {
-                    "anonymous": body.citizen_ref.anonymous,
-                    "citizen_id": str(citizen_id) if citizen_id else None,
-                    "contact_channel": body.citizen_ref.contact_channel,
-                    "category": body.category,
-                    "sub_category": body.sub_category,
-                    "zone_name": body.zone_name,
-                    "address_hint": body.address_hint,
-                    "location": {"lng": body.location.lng, "lat": body.location.lat},
-                    "status": "new",
-                    "priority": "P1",
-                }
-            })
-
-            return CreateServiceRequestResponse(
-                request_id=request_id,
-                status="new",
-                sla_hint="Submitted. Waiting for triage."
-            )
-
-        except DuplicateKeyError:
+        except DuplicateKeyError as e:
+            if idempotency is not None and _is_idempotency_conflict(e):
+                existing = await ServiceRequestRepository.find_by_idempotency_key(idempotency[0])
+                if existing:
+                    return None, existing
             if attempt == 0:
-                await _sync_counter_to_latest(year)
+                await request_ids.resync(year)
             continue
 
     raise HTTPException(500, "Failed to generate unique request_id after retries")
 
 
+# =========================
+# Bulk Create
+# =========================
+@router.post("/bulk", response_model=BulkCreateServiceRequestsResponse)
+async def bulk_create_service_requests(body: BulkCreateServiceRequestsBody):
+    """
+    Up to BULK_CREATE_MAX_ITEMS requests in one call. Items are validated one by
+    one; valid ones get their IDs from one counter increment and are written
+    with one unordered insert_many (plus one for their audit events). Every item
+    gets a result at its index, with the validation / insert errors of the
+    items that were not created. When the insert reports a write concern error,
+    the items it wrote are returned as ok=False, status "unconfirmed".
+    """
+    max_items = get_settings().bulk_create_max_items
+    if len(body.items) > max_items:
+        raise HTTPException(400, f"At most {max_items} items per bulk request")
+
+    now = datetime.utcnow()
+    year = now.year
+
+    results: list[BulkCreateItemResult | None] = [None] * len(body.items)
+    pending: list[tuple[int, CreateServiceRequestBody, ObjectId | None, dict]] = []
+    for index, raw in enumerate(body.items):
+        try:
+            item = CreateServiceRequestBody.parse_obj(raw)
+            citizen_id = _citizen_oid(item)
+        except ValidationError as e:
+            results[index] = BulkCreateItemResult(index=index, ok=False, errors=e.errors())
+            continue
+        except HTTPException as e:
+            results[index] = BulkCreateItemResult(index=index, ok=False, errors=[{"msg": e.detail}])
+            continue
+        pending.append((index, item, citizen_id, _new_request_doc(item, citizen_id, now)))
+
+    created: list[tuple[int, CreateServiceRequestBody, ObjectId | None, dict]] = []
+    unconfirmed: dict[int, str] = {}
+    for attempt in range(3):
+        if not pending:
+            break
+        seqs = await request_ids.allocate_many(year, len(pending))
+        docs = []
+        for (_, _, _, doc_base), seq in zip(pending, seqs):
+            doc = dict(doc_base)
+            doc["request_id"] = make_request_id(year, seq)
+            docs.append(doc)
+
+        failed: dict[int, dict] = {}
+        concern_error: str | None = None
+        try:
+            await service_requests_collection.insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            failed = {err["index"]: err for err in e.details.get("writeErrors", [])}
+            concern_errors = e.details.get("writeConcernErrors") or []
+            if concern_errors:
+                concern_error = concern_errors[0].get("errmsg", "write concern not satisfied")
+
+        retry = []
+        for i, (entry, doc) in enumerate(zip(pending, docs)):
+            err = failed.get(i)
+            if err is None:
+                created.append((*entry[:3], doc))
+                if concern_error is not None:
+                    unconfirmed[entry[0]] = concern_error
+            elif err.get("code") == 11000 and attempt < 2:
+                retry.append(entry)
+            else:
+                results[entry[0]] = BulkCreateItemResult(
+                    index=entry[0], ok=False, errors=[{"msg": err.get("errmsg", "insert failed")}]
+                )
+        if retry:
+            # counter behind the stored request IDs; same self-healing as the single create
+            await request_ids.resync(year)
+        pending = retry
+
+    if created:
+        await requests_changed([(None, doc) for _, _, _, doc in created])
+        await audit_service.log_events([
+            _create_audit_event(item, citizen_id, doc["request_id"])
+            for _, item, citizen_id, doc in created
+        ])
+    for index, _, _, doc in created:
+        if index in unconfirmed:
+            # on the primary (so counted and audited like the others) but it may
+            # still be rolled back; the caller has to check before relying on it
+            results[index] = BulkCreateItemResult(
+                index=index,
+                ok=False,
+                request_id=doc["request_id"],
+                status="unconfirmed",
+                errors=[{"msg": unconfirmed[index]}],
+            )
+        else:
+            results[index] = BulkCreateItemResult(index=index, ok=True, request_id=doc["request_id"], status="new")
+
+    confirmed = len(created) - len(unconfirmed)
+    return BulkCreateServiceRequestsResponse(
+        created=confirmed,
+        failed=len(body.items) - len(created),
+        unconfirmed=len(unconfirmed),
+        results=results,
+    )
+
+
 # =========================
 # Evidence Upload
 # =========================
@@ -512,10 +597,14 @@ async def update_service_request(
         if str(before_val) != str(after_val):
             changes[k] = {"from": before_val, "to": after_val}
 
+    if body.location is not None:
+        update_doc["location_quadkey"] = lnglat_to_quadkey(body.location.lng, body.location.lat)
+
     await service_requests_collection.update_one(
         {"request_id": request_id},
         {"$set": update_doc}
     )
+    await request_changed(doc, {**doc, **{k: v for k, v in update_doc.items() if "." not in k}})
 
     if changes:
         actor = _actor_from_request(doc, citizen_oid)
@@ -566,6 +655,8 @@ async def delete_service_request(
     if res.deleted_count != 1:
         raise HTTPException(500, "Delete failed")
 
+    await request_changed(doc, None)
+
     actor = _actor_from_request(doc, citizen_oid)
     await audit_service.log_event({
         "time": now,
@@ -586,18 +677,25 @@ async def delete_service_request(
 async def close_service_request(request_id: str):
     now = datetime.utcnow()
 
-    doc = await service_requests_collection.find_one_and_update(
+    before = await service_requests_collection.find_one_and_update(
         {"request_id": request_id},
         {"$set": {
             "status": "closed",
             "timestamps.closed_at": now,
             "timestamps.updated_at": now
         }},
-        return_document=ReturnDocument.AFTER
+        return_document=ReturnDocument.BEFORE
     )
-    if not doc:
+    if not before:
         raise HTTPException(404, "Request not found")
 
+    doc = {
+        **before,
+        "status": "closed",
+        "timestamps": {**(before.get("timestamps") or {}), "closed_at": now, "updated_at": now},
+    }
+    await request_changed(before, doc)
+
     await _upsert_perf_log(doc)
 
     await performance_logs_collection.update_one(
@@ -647,6 +745,7 @@ async def submit_feedback(
     await _ensure_performance_log_exists(doc)
 
     doc2 = await service_requests_collection.find_one({"request_id": request_id})
+    await request_changed(doc, doc2)
     await _upsert_perf_log(doc2)
 
     await performance_logs_collection.update_one(
@@ -873,6 +972,7 @@ async def staff_update_status(
 
     # reload updated doc (so KPI computation uses latest status/timestamps)
     doc2 = await service_requests_collection.find_one({"request_id": request_id})
+    await request_changed(doc, doc2)
 
     # ✅ ensure perf log + update KPIs
     await _ensure_performance_log_exists(doc2)
@@ -942,6 +1042,11 @@ async def staff_close_direct(
                   "timestamps.closed_at": now,
                   "timestamps.updated_at": now}}
     )
+    await request_changed(doc, {
+        **doc,
+        "status": "closed",
+        "timestamps": {**(doc.get("timestamps") or {}), "closed_at": now, "updated_at": now},
+    })
 
     await _ensure_performance_log_exists(doc)
     await performance_logs_collection.update_one(
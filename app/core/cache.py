@@ -0,0 +1,215 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Iterable
+
+from app.core.config import get_settings
+
+# entries derived from service_requests carry this tag; request writes invalidate it
+REQUESTS_TAG = "service_requests"
+
+
+def cache_key(namespace: str, **params) -> str:
+    """
+    Stable key: endpoint namespace + sorted query params.
+    e.g. cache_key("admin.analytics.cohorts", days=30, limit=20)
+    """
+    if not params:
+        return namespace
+    return f"{namespace}?{json.dumps(params, sort_keys=True, default=str)}"
+
+
+def _size_of(value: Any) -> int:
+    # rough memory estimate = size of the JSON payload we would send anyway
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    try:
+        return len(json.dumps(value, default=str))
+    except (TypeError, ValueError):
+        return 1024
+
+
+class _Entry:
+    __slots__ = ("value", "expires_at", "size", "tags")
+
+    def __init__(self, value: Any, expires_at: float, size: int, tags: tuple):
+        self.value = value
+        self.expires_at = expires_at
+        self.size = size
+        self.tags = tags
+
+
+# "not cached": None (or any falsy value) is a valid cached result
+_MISS = object()
+
+
+class _LeaderCancelled(Exception):
+    """
+    Set on a single-flight future whose computing caller was cancelled; the
+    coalesced callers retry instead of inheriting that cancellation.
+    """
+
+
+class ResponseCache:
+    """
+    In-process async cache for read-heavy endpoints.
+
+    - TTL per entry
+    - single-flight: concurrent callers of the same key share one computation
+    - LRU eviction once the estimated size goes over max_bytes
+    - tag invalidation (write paths call invalidate("service_requests"))
+    """
+
+    def __init__(self, ttl_seconds: float, max_bytes: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._inflight: dict[str, asyncio.Future] = {}
+        self._bytes = 0
+        # bumped by invalidate(tag) per tag and by invalidate() for everything;
+        # a result computed across a bump of one of its tags is not stored
+        self._tag_generations: dict[str, int] = {}
+        self._generation = 0
+
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "evictions": 0,
+            "invalidations": 0,
+        }
+
+    # -------------------------
+    def get(self, key: str, default: Any = None) -> Any:
+        value = self._lookup(key)
+        return default if value is _MISS else value
+
+    def set(self, key: str, value: Any, ttl: float | None = None, tags: Iterable[str] = ()) -> None:
+        size = _size_of(value)
+        if size > self.max_bytes:
+            return
+
+        if key in self._entries:
+            self._drop(key)
+
+        ttl = self.ttl_seconds if ttl is None else ttl
+        self._entries[key] = _Entry(value, time.monotonic() + ttl, size, tuple(tags))
+        self._bytes += size
+
+        while self._bytes > self.max_bytes and self._entries:
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+            self._stats["evictions"] += 1
+
+    async def get_or_compute(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[Any]],
+        ttl: float | None = None,
+        tags: Iterable[str] = (),
+    ) -> Any:
+        tags = tuple(tags)
+        while True:
+            cached = self._lookup(key)
+            if cached is not _MISS:
+                self._stats["hits"] += 1
+                return cached
+
+            pending = self._inflight.get(key)
+            if pending is None:
+                break
+            self._stats["coalesced"] += 1
+            try:
+                return await asyncio.shield(pending)
+            except _LeaderCancelled:
+                # the first waiter back finds no in-flight computation and takes over
+                continue
+
+        self._stats["misses"] += 1
+        fut = asyncio.get_running_loop().create_future()
+        # nobody may be waiting -> mark the exception as retrieved
+        fut.add_done_callback(lambda f: f.exception())
+        self._inflight[key] = fut
+        generation = self._generation_of(tags)
+
+        try:
+            value = await compute()
+        except asyncio.CancelledError:
+            fut.set_exception(_LeaderCancelled())
+            raise
+        except BaseException as e:
+            fut.set_exception(e)
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+        if generation == self._generation_of(tags):
+            self.set(key, value, ttl=ttl, tags=tags)
+        fut.set_result(value)
+        return value
+
+    def invalidate(self, tag: str | None = None) -> int:
+        """
+        Drop every entry carrying `tag` (or everything when tag is None).
+        Returns how many entries were dropped.
+        """
+        if tag is None:
+            self._generation += 1
+        else:
+            self._tag_generations[tag] = self._tag_generations.get(tag, 0) + 1
+        self._stats["invalidations"] += 1
+
+        keys = [k for k, e in self._entries.items() if tag is None or tag in e.tags]
+        for k in keys:
+            self._drop(k)
+        return len(keys)
+
+    def stats(self) -> dict:
+        lookups = self._stats["hits"] + self._stats["misses"] + self._stats["coalesced"]
+        return {
+            **self._stats,
+            "hit_rate": round((self._stats["hits"] / lookups) * 100, 2) if lookups else 0,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds,
+            "inflight": len(self._inflight),
+        }
+
+    # -------------------------
+    def _lookup(self, key: str) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return _MISS
+        if entry.expires_at <= time.monotonic():
+            self._drop(key)
+            return _MISS
+        self._entries.move_to_end(key)
+        return entry.value
+
+    def _generation_of(self, tags: tuple) -> tuple:
+        return (self._generation, *(self._tag_generations.get(t, 0) for t in tags))
+
+    def _drop(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.size
+
+
+_settings = get_settings()
+
+# shared by the admin analytics/dashboard endpoints
+response_cache = ResponseCache(
+    ttl_seconds=_settings.response_cache_ttl_seconds,
+    max_bytes=_settings.response_cache_max_bytes,
+)
+
+# POST /service-requests: recent Idempotency-Key -> response (never tag-invalidated)
+idempotency_cache = ResponseCache(
+    ttl_seconds=_settings.idempotency_cache_ttl_seconds,
+    max_bytes=_settings.idempotency_cache_max_bytes,
+)
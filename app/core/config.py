@@ -2,10 +2,13 @@ from __future__ import annotations
 
 import json
 from functools import lru_cache
-from typing import Dict, List
+from typing import Dict, List, Literal
 
 from pydantic import BaseSettings, Field
 
+# public OSM tiles: fine for on-demand proxying, but their usage policy forbids
+# bulk downloads, so tile prefetch refuses this upstream
+OSM_TILE_URL = "https://tile.openstreetmap.org/{z}/{x}/{y}.png"
 
 class Settings(BaseSettings):
     app_name: str = "Citizen Services Tracker"
@@ -17,6 +20,56 @@ class Settings(BaseSettings):
     duplicate_radius_m: int = Field(250, env="DUPLICATE_RADIUS_M")
     duplicate_window_hours: int = Field(24, env="DUPLICATE_WINDOW_HOURS")
     sla_scan_interval_seconds: int = Field(60, env="SLA_SCAN_INTERVAL_SECONDS")
+    # full checkpointed sweep of all open requests next to the deadline scheduler (0 = only on takeover)
+    sla_full_sweep_interval_seconds: int = Field(6 * 3600, env="SLA_FULL_SWEEP_INTERVAL_SECONDS")
+    sla_monitor_batch_size: int = Field(200, env="SLA_MONITOR_BATCH_SIZE")
+    sla_monitor_concurrency: int = Field(4, env="SLA_MONITOR_CONCURRENCY")
+    sla_scheduler_max_queue: int = Field(10000, env="SLA_SCHEDULER_MAX_QUEUE")
+    # run the SLA worker inside the API process (off when it runs via `python -m app.jobs.sla_worker`)
+    sla_worker_in_process: bool = Field(True, env="SLA_WORKER_IN_PROCESS")
+    sla_lease_ttl_seconds: int = Field(30, env="SLA_LEASE_TTL_SECONDS")
+    # on stop / lost lease the monitor finishes its current batch; cancelled after this
+    sla_stop_grace_seconds: float = Field(10, env="SLA_STOP_GRACE_SECONDS")
+    sla_lookup_check_seconds: float = Field(5, env="SLA_LOOKUP_CHECK_SECONDS")
+    sla_forecast_ttl_seconds: float = Field(60, env="SLA_FORECAST_TTL_SECONDS")
+    # request IDs leased from the per-year counter per round trip (app.services.request_ids)
+    request_id_block_size: int = Field(50, env="REQUEST_ID_BLOCK_SIZE")
+    bulk_create_max_items: int = Field(500, env="BULK_CREATE_MAX_ITEMS")
+    # recent Idempotency-Key -> create response, answered without a DB round trip
+    idempotency_cache_ttl_seconds: float = Field(600, env="IDEMPOTENCY_CACHE_TTL_SECONDS")
+    idempotency_cache_max_bytes: int = Field(4 * 1024 * 1024, env="IDEMPOTENCY_CACHE_MAX_BYTES")
+    # audit pipeline (app.services.audit_pipeline); overflow: "block" (back-pressure) or "spill" (to the fallback file)
+    audit_queue_max: int = Field(10000, env="AUDIT_QUEUE_MAX")
+    audit_batch_size: int = Field(500, env="AUDIT_BATCH_SIZE")
+    audit_flush_ms: int = Field(200, env="AUDIT_FLUSH_MS")
+    audit_overflow: Literal["block", "spill"] = Field("block", env="AUDIT_OVERFLOW")
+    audit_fallback_path: str = Field("audit_fallback.ndjson", env="AUDIT_FALLBACK_PATH")
+    dashboard_reconcile_interval_seconds: int = Field(
+        900, env="DASHBOARD_RECONCILE_INTERVAL_SECONDS"
+    )
+    # admin job progress records (app.jobs.progress) kept after the job's last update
+    job_progress_retention_seconds: int = Field(
+        7 * 24 * 3600, env="JOB_PROGRESS_RETENTION_SECONDS"
+    )
+    response_cache_ttl_seconds: float = Field(15, env="RESPONSE_CACHE_TTL_SECONDS")
+    response_cache_max_bytes: int = Field(32 * 1024 * 1024, env="RESPONSE_CACHE_MAX_BYTES")
+    heatmap_snapshot_max_age_seconds: int = Field(300, env="HEATMAP_SNAPSHOT_MAX_AGE_SECONDS")
+    heatmap_snapshot_retention_seconds: int = Field(
+        7 * 24 * 3600, env="HEATMAP_SNAPSHOT_RETENTION_SECONDS"
+    )
+
+    tile_upstream_url: str = Field(OSM_TILE_URL, env="TILE_UPSTREAM_URL")
+    tile_user_agent: str = Field("CST-Backend/1.0 tile proxy", env="TILE_USER_AGENT")
+    tile_cache_dir: str = Field("tile_cache", env="TILE_CACHE_DIR")
+    tile_cache_max_bytes: int = Field(512 * 1024 * 1024, env="TILE_CACHE_MAX_BYTES")
+    tile_cache_fresh_seconds: int = Field(7 * 24 * 3600, env="TILE_CACHE_FRESH_SECONDS")
+    tile_upstream_concurrency: int = Field(8, env="TILE_UPSTREAM_CONCURRENCY")
+    tile_upstream_timeout_seconds: float = Field(10.0, env="TILE_UPSTREAM_TIMEOUT_SECONDS")
+    tile_prefetch_min_zoom: int = Field(10, env="TILE_PREFETCH_MIN_ZOOM")
+    tile_prefetch_max_zoom: int = Field(15, env="TILE_PREFETCH_MAX_ZOOM")
+    tile_prefetch_concurrency: int = Field(4, env="TILE_PREFETCH_CONCURRENCY")
+    tile_prefetch_max_tiles: int = Field(20000, env="TILE_PREFETCH_MAX_TILES")
+    tile_prefetch_on_startup: bool = Field(False, env="TILE_PREFETCH_ON_STARTUP")
 
     default_priority: str = Field("P3", env="DEFAULT_PRIORITY")
     priority_by_category: Dict[str, str] = Field(default_factory=dict)
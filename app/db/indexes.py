@@ -0,0 +1,84 @@
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure
+
+from app.core.config import get_settings
+from app.db.mongo import db
+
+
+async def _ensure_ttl_index(collection, field: str, expire_after_seconds: int, **kwargs) -> None:
+    """
+    create_index fails if the TTL changed since the index was built -> update it via collMod.
+    """
+    try:
+        await collection.create_index(
+            [(field, ASCENDING)], expireAfterSeconds=expire_after_seconds, **kwargs
+        )
+    except OperationFailure as e:
+        if e.code not in (85, 86):  # IndexOptionsConflict / IndexKeySpecsConflict
+            raise
+        await db.command({
+            "collMod": collection.name,
+            "index": {"keyPattern": {field: 1}, "expireAfterSeconds": expire_after_seconds},
+        })
+
+
+async def ensure_indexes() -> None:
+    """
+    Idempotent; called once on startup from the app lifespan.
+    """
+    settings = get_settings()
+
+    # quadkey heatmap pyramid / vector tiles: prefix match on open requests
+    await db.service_requests.create_index([
+        ("status", ASCENDING),
+        ("location_quadkey", ASCENDING),
+    ])
+
+    # SLA scheduler: open requests whose next_sla_check_at has passed
+    await db.service_requests.create_index([
+        ("status", ASCENDING),
+        ("next_sla_check_at", ASCENDING),
+    ])
+
+    # at-risk / breached: range queries on absolute SLA deadlines of open requests
+    await db.service_requests.create_index([
+        ("status", ASCENDING),
+        ("sla_breach_at", ASCENDING),
+    ])
+    await db.service_requests.create_index([
+        ("status", ASCENDING),
+        ("sla_target_at", ASCENDING),
+    ])
+
+    # Idempotency-Key of POST /service-requests; only requests created with one carry it
+    await db.service_requests.create_index(
+        "idempotency_key", unique=True, sparse=True
+    )
+
+    # admin job progress: newest per kind + retention
+    await db.job_progress.create_index([("kind", ASCENDING), ("started_at", DESCENDING)])
+    await _ensure_ttl_index(db.job_progress, "updated_at", settings.job_progress_retention_seconds)
+
+    # cohort rollups: the cohorts query reads a day range
+    await db.cohort_daily_rollups.create_index([("day", ASCENDING)])
+
+    # heatmap snapshots: latest per (window_days, grid_step) + retention
+    await db.geo_feeds.create_index([
+        ("type", ASCENDING),
+        ("window_days", ASCENDING),
+        ("grid_step", ASCENDING),
+        ("created_at", DESCENDING),
+    ])
+    await _ensure_ttl_index(
+        db.geo_feeds,
+        "created_at",
+        settings.heatmap_snapshot_retention_seconds,
+        partialFilterExpression={"type": "open_requests_heatmap"},
+    )
+
+    # quadkey heatmap base cells: one generation of one window at a time
+    await db.heatmap_quadkey_cells.create_index([
+        ("window_days", ASCENDING),
+        ("generation", ASCENDING),
+        ("quadkey", ASCENDING),
+    ])
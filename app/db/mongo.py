@@ -24,6 +24,12 @@ cat_collection = db["category"]
 subcategory_collection = db["subcategory"]
 service_requests_collection = db["service_requests"]
 performance_logs_collection = db["performance_logs"]
+dashboard_counters_collection = db["dashboard_counters"]
+cohort_rollups_collection = db["cohort_daily_rollups"]
+job_checkpoints_collection = db["job_checkpoints"]
+job_leases_collection = db["job_leases"]
+job_progress_collection = db["job_progress"]
+cache_versions_collection = db["cache_versions"]
 
 def get_db():
     return db
\ No newline at end of file
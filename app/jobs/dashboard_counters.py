@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+
+from app.jobs.lease import Lease
+from app.services import dashboard_counters
+
+logger = logging.getLogger(__name__)
+
+LEASE_NAME = "dashboard_reconcile"
+
+
+async def dashboard_reconcile_loop(
+    interval_seconds: int, stop_event: asyncio.Event, lease: Lease | None = None
+) -> None:
+    """
+    Periodically recounts dashboard_counters from service_requests, so any drift
+    (failed $inc, manual edits, imports) heals within one interval.
+
+    Every API process runs this loop; only the holder of the "dashboard_reconcile"
+    lease reconciles. The lease outlives two intervals, so a holder that stops
+    renewing is replaced within about that long.
+    """
+    lease = lease or Lease(LEASE_NAME, 2 * interval_seconds)
+    try:
+        while not stop_event.is_set():
+            try:
+                if await lease.acquire():
+                    await dashboard_counters.reconcile()
+            except Exception:
+                logger.exception("dashboard counters reconcile failed")
+            try:
+                await asyncio.wait_for(stop_event.wait(), timeout=interval_seconds)
+            except asyncio.TimeoutError:
+                continue
+    finally:
+        try:
+            await lease.release()
+        except Exception:
+            logger.exception("failed to release the dashboard reconcile lease")
@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from app.db.mongo import job_leases_collection
+
+
+def default_owner() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+class Lease:
+    """
+    Single-holder lease in job_leases: { _id: name, owner, acquired_at, heartbeat_at, expires_at }.
+
+    acquire() succeeds when nobody holds the lease, it expired, or we already
+    hold it (which is also how it is renewed). Two processes racing for a free
+    lease both try the same upsert; the loser gets DuplicateKeyError on _id.
+    """
+
+    def __init__(self, name: str, ttl_seconds: int, owner: str | None = None):
+        self.name = name
+        self.ttl = timedelta(seconds=ttl_seconds)
+        self.owner = owner or default_owner()
+
+    async def acquire(self) -> bool:
+        now = datetime.utcnow()
+        try:
+            doc = await job_leases_collection.find_one_and_update(
+                {
+                    "_id": self.name,
+                    "$or": [{"owner": self.owner}, {"expires_at": {"$lt": now}}],
+                },
+                [
+                    {"$set": {
+                        "acquired_at": {"$cond": [
+                            {"$eq": ["$owner", self.owner]}, "$acquired_at", now,
+                        ]},
+                        "owner": self.owner,
+                        "heartbeat_at": now,
+                        "expires_at": now + self.ttl,
+                    }},
+                ],
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+        except DuplicateKeyError:
+            return False
+        return bool(doc) and doc.get("owner") == self.owner
+
+    renew = acquire
+
+    async def release(self) -> None:
+        await job_leases_collection.delete_one({"_id": self.name, "owner": self.owner})
+
+    async def holder(self) -> dict | None:
+        return await job_leases_collection.find_one({"_id": self.name})
@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import uuid
+from datetime import datetime
+
+from app.db.mongo import job_progress_collection
+
+logger = logging.getLogger(__name__)
+
+# Registry of long-running admin jobs (prefetches, backfills, ...), so an
+# endpoint can start a job in the background and another one can poll it.
+#
+# The process running a job keeps its JobProgress in memory (the most recent
+# MAX_JOBS) and mirrors it to job_progress, at most every PERSIST_SECONDS and
+# once when it ends, so any API worker can answer for it. "One at a time"
+# (running_job) is still per process.
+
+MAX_JOBS = 50
+
+PERSIST_SECONDS = 2.0
+
+
+class JobProgress:
+    def __init__(self, kind: str, total: int = 0, params: dict | None = None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.params = params or {}
+        self.total = total
+        self.done = 0
+        self.failed = 0
+        self.status = "running"
+        self.error: str | None = None
+        self.result: dict | None = None
+        self.started_at = datetime.utcnow()
+        self.finished_at: datetime | None = None
+        self._ended = asyncio.Event()
+
+    def advance(self, ok: bool = True, n: int = 1) -> None:
+        self.done += n
+        if not ok:
+            self.failed += n
+
+    def finish(self, result: dict | None = None) -> None:
+        self.status = "done"
+        self.result = result
+        self.finished_at = datetime.utcnow()
+        self._ended.set()
+
+    def fail(self, error: str) -> None:
+        self.status = "failed"
+        self.error = error
+        self.finished_at = datetime.utcnow()
+        self._ended.set()
+
+    def to_dict(self) -> dict:
+        end = self.finished_at or datetime.utcnow()
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "params": self.params,
+            "status": self.status,
+            "total": self.total,
+            "done": self.done,
+            "failed": self.failed,
+            "percent": round(self.done * 100 / self.total, 1) if self.total else None,
+            "elapsed_seconds": round((end - self.started_at).total_seconds(), 2),
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+            "result": self.result,
+        }
+
+
+_jobs: dict[str, JobProgress] = {}
+
+# keep references so the persist loops are not garbage collected
+_persisting: set[asyncio.Task] = set()
+
+
+async def _persist(job: JobProgress) -> None:
+    while True:
+        doc = job.to_dict()
+        doc["_id"] = doc.pop("job_id")
+        doc["updated_at"] = datetime.utcnow()
+        try:
+            await job_progress_collection.replace_one({"_id": job.id}, doc, upsert=True)
+        except Exception:
+            logger.exception("failed to store progress of job %s", job.id)
+        if job.status != "running":
+            return
+        try:
+            await asyncio.wait_for(job._ended.wait(), timeout=PERSIST_SECONDS)
+        except asyncio.TimeoutError:
+            continue
+
+
+def _from_doc(doc: dict) -> dict:
+    doc["job_id"] = doc.pop("_id")
+    if doc["status"] == "running":
+        # as of updated_at; a job whose process died stays "running" with an old updated_at
+        doc["elapsed_seconds"] = round((datetime.utcnow() - doc["started_at"]).total_seconds(), 2)
+    return doc
+
+
+def start_job(kind: str, total: int = 0, params: dict | None = None) -> JobProgress:
+    """
+    Call from inside the event loop: the progress is stored by a background task.
+    """
+    job = JobProgress(kind, total, params)
+    _jobs[job.id] = job
+    while len(_jobs) > MAX_JOBS:
+        _jobs.pop(next(iter(_jobs)))
+
+    task = asyncio.create_task(_persist(job))
+    _persisting.add(task)
+    task.add_done_callback(_persisting.discard)
+    return job
+
+
+async def get_job(job_id: str) -> dict | None:
+    """
+    Progress of a job started by any process (this one's in-memory state first).
+    """
+    job = _jobs.get(job_id)
+    if job is not None:
+        return job.to_dict()
+    doc = await job_progress_collection.find_one({"_id": job_id})
+    return _from_doc(doc) if doc else None
+
+
+async def list_jobs(kind: str | None = None) -> list[dict]:
+    """
+    The most recent MAX_JOBS jobs across processes, newest first.
+    """
+    query = {} if kind is None else {"kind": kind}
+    cursor = job_progress_collection.find(query).sort("started_at", -1).limit(MAX_JOBS)
+    out = []
+    async for doc in cursor:
+        job = _jobs.get(doc["_id"])
+        out.append(job.to_dict() if job is not None else _from_doc(doc))
+    return out
+
+
+def running_job(kind: str) -> JobProgress | None:
+    for j in _jobs.values():
+        if j.kind == kind and j.status == "running":
+            return j
+    return None
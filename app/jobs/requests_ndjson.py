@@ -0,0 +1,272 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import sys
+from datetime import datetime
+from typing import Any, AsyncIterable, AsyncIterator, Dict, Iterable, List
+
+from bson import ObjectId, json_util
+from bson.json_util import RELAXED_JSON_OPTIONS
+from pymongo.errors import BulkWriteError
+
+from app.core.cache import REQUESTS_TAG, response_cache
+from app.db.mongo import db, requests_collection
+from app.jobs.progress import JobProgress, running_job, start_job
+from app.jobs.sla_recompute import backfill_sla_deadlines
+from app.services import cohort_rollups, dashboard_counters
+from app.services.heatmap import backfill_quadkeys
+from app.services.request_ids import parse_request_id, request_ids
+from app.services.sla import to_datetime
+
+logger = logging.getLogger(__name__)
+
+# NDJSON import / export of service_requests, one document per line.
+#
+# Export writes MongoDB extended JSON (relaxed: {"$oid": ...}, {"$date": ...}),
+# so an export imports back unchanged. Import also accepts plain JSON: ISO date
+# strings under timestamps / *_at and hex strings in _id / citizen_ref.citizen_id
+# are converted. Both sides stream: memory is bounded by one batch.
+
+# import errors kept in the result
+MAX_ERRORS = 100
+
+OBJECT_ID_FIELDS = (("_id",), ("citizen_ref", "citizen_id"))
+
+REFRESH_JOB_KIND = "ndjson_refresh"
+
+_tasks: set[asyncio.Task] = set()
+
+
+def _convert_dates(doc: Dict[str, Any]) -> None:
+    for key, value in list(doc.items()):
+        if isinstance(value, dict):
+            if key == "timestamps":
+                for ts_key, ts in value.items():
+                    if isinstance(ts, str):
+                        value[ts_key] = to_datetime(ts) or ts
+            else:
+                _convert_dates(value)
+        elif isinstance(value, str) and key.endswith("_at"):
+            doc[key] = to_datetime(value) or value
+
+
+def decode_line(line: str | bytes) -> Dict[str, Any]:
+    doc = json_util.loads(line)
+    if not isinstance(doc, dict):
+        raise ValueError("line is not a JSON object")
+
+    _convert_dates(doc)
+    for path in OBJECT_ID_FIELDS:
+        parent = doc
+        for key in path[:-1]:
+            parent = parent.get(key) if isinstance(parent, dict) else None
+        value = parent.get(path[-1]) if isinstance(parent, dict) else None
+        if isinstance(value, str) and ObjectId.is_valid(value):
+            parent[path[-1]] = ObjectId(value)
+    return doc
+
+
+def encode_doc(doc: Dict[str, Any]) -> str:
+    return json_util.dumps(doc, json_options=RELAXED_JSON_OPTIONS) + "\n"
+
+
+async def iter_lines(chunks: AsyncIterable[bytes]) -> AsyncIterator[bytes]:
+    """
+    Byte chunks (e.g. a request body stream) -> complete lines.
+    """
+    tail = b""
+    async for chunk in chunks:
+        tail += chunk
+        *lines, tail = tail.split(b"\n")
+        for line in lines:
+            yield line
+    if tail:
+        yield tail
+
+
+async def _aiter(lines: Iterable) -> AsyncIterator:
+    for line in lines:
+        yield line
+
+
+async def _insert_batch(docs: List[Dict[str, Any]], line_numbers: List[int], result: Dict[str, Any]) -> None:
+    failed = []
+    try:
+        await requests_collection.insert_many(docs, ordered=False)
+    except BulkWriteError as e:
+        failed = e.details.get("writeErrors", [])
+
+    result["inserted"] += len(docs) - len(failed)
+    for err in failed:
+        if err.get("code") == 11000:
+            result["duplicates"] += 1
+            continue
+        result["failed"] += 1
+        if len(result["errors"]) < MAX_ERRORS:
+            result["errors"].append({"line": line_numbers[err["index"]], "error": err.get("errmsg")})
+
+
+async def import_ndjson(lines: AsyncIterable[str | bytes], batch_size: int = 1000) -> Dict[str, Any]:
+    """
+    Inserts every line with unordered insert_many batches. Existing documents
+    (duplicate _id / request_id) are skipped and counted, not overwritten.
+    """
+    result: Dict[str, Any] = {"lines": 0, "inserted": 0, "duplicates": 0, "failed": 0, "errors": []}
+    max_seq: Dict[int, int] = {}
+
+    docs: List[Dict[str, Any]] = []
+    line_numbers: List[int] = []
+    async for line in lines:
+        result["lines"] += 1
+        if not line.strip():
+            continue
+        try:
+            doc = decode_line(line)
+        except ValueError as e:  # json.JSONDecodeError is a ValueError
+            result["failed"] += 1
+            if len(result["errors"]) < MAX_ERRORS:
+                result["errors"].append({"line": result["lines"], "error": str(e)})
+            continue
+
+        parsed = parse_request_id(doc.get("request_id"))
+        if parsed:
+            year, seq = parsed
+            max_seq[year] = max(seq, max_seq.get(year, 0))
+
+        docs.append(doc)
+        line_numbers.append(result["lines"])
+        if len(docs) >= batch_size:
+            await _insert_batch(docs, line_numbers, result)
+            docs, line_numbers = [], []
+
+    if docs:
+        await _insert_batch(docs, line_numbers, result)
+
+    # new requests must not be handed IDs the import already used
+    for year, seq in max_seq.items():
+        await request_ids.advance_to(year, seq)
+
+    result["errors_truncated"] = result["failed"] > len(result["errors"])
+    return result
+
+
+async def refresh_derived() -> Dict[str, Any]:
+    """
+    Rebuild what request writes normally maintain incrementally; run after an import.
+    """
+    out = {
+        "dashboard_counters": await dashboard_counters.reconcile(),
+        "cohort_rollups": await cohort_rollups.backfill(),
+        "quadkeys": await backfill_quadkeys(db),
+        "sla_deadlines": await backfill_sla_deadlines(),
+    }
+    response_cache.invalidate(REQUESTS_TAG)
+    return out
+
+
+def start_refresh() -> JobProgress:
+    """
+    Runs refresh_derived() in the background; one at a time (a second call returns the running job).
+    """
+    current = running_job(REFRESH_JOB_KIND)
+    if current is not None:
+        return current
+
+    job = start_job(REFRESH_JOB_KIND)
+
+    async def run():
+        try:
+            job.finish(await refresh_derived())
+        except Exception as e:
+            logger.exception("derived read model refresh failed")
+            job.fail(str(e))
+
+    task = asyncio.create_task(run())
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+    return job
+
+
+def export_query(
+    status: List[str] | None = None,
+    zone: str | None = None,
+    created_from: datetime | None = None,
+    created_to: datetime | None = None,
+) -> Dict[str, Any]:
+    query: Dict[str, Any] = {}
+    if status:
+        query["status"] = {"$in": status}
+    if zone:
+        query["zone_name"] = zone
+    if created_from or created_to:
+        query["timestamps.created_at"] = {}
+        if created_from:
+            query["timestamps.created_at"]["$gte"] = created_from
+        if created_to:
+            query["timestamps.created_at"]["$lt"] = created_to
+    return query
+
+
+async def export_ndjson(query: Dict[str, Any], batch_size: int = 1000) -> AsyncIterator[str]:
+    """
+    Streams matching requests as NDJSON, `batch_size` lines per chunk.
+    """
+    lines: List[str] = []
+    async for doc in requests_collection.find(query).sort("_id", 1).batch_size(batch_size):
+        lines.append(encode_doc(doc))
+        if len(lines) >= batch_size:
+            yield "".join(lines)
+            lines = []
+    if lines:
+        yield "".join(lines)
+
+
+# ----------------------------- CLI -----------------------------
+
+async def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.jobs.requests_ndjson")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_import = sub.add_parser("import", help="load NDJSON into service_requests")
+    p_import.add_argument("path", help="NDJSON file, - for stdin")
+    p_import.add_argument("--batch-size", type=int, default=1000)
+    p_import.add_argument("--no-refresh", action="store_true", help="skip rebuilding counters / rollups")
+
+    p_export = sub.add_parser("export", help="dump service_requests as NDJSON")
+    p_export.add_argument("path", help="output file, - for stdout")
+    p_export.add_argument("--status", action="append")
+    p_export.add_argument("--zone")
+    p_export.add_argument("--from", dest="created_from", type=datetime.fromisoformat)
+    p_export.add_argument("--to", dest="created_to", type=datetime.fromisoformat)
+    p_export.add_argument("--batch-size", type=int, default=1000)
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    if args.command == "import":
+        f = sys.stdin.buffer if args.path == "-" else open(args.path, "rb")
+        try:
+            result = await import_ndjson(_aiter(f), args.batch_size)
+        finally:
+            if f is not sys.stdin.buffer:
+                f.close()
+        logger.info("import: %s", json_util.dumps(result))
+        if not args.no_refresh and result["inserted"]:
+            await refresh_derived()
+            logger.info("derived read models rebuilt")
+        return
+
+    query = export_query(args.status, args.zone, args.created_from, args.created_to)
+    f = sys.stdout if args.path == "-" else open(args.path, "w", encoding="utf-8")
+    try:
+        async for chunk in export_ndjson(query, args.batch_size):
+            f.write(chunk)
+    finally:
+        if f is not sys.stdout:
+            f.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import random
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from pymongo import monitoring
+
+from app.utils.bench import CommandCounter
+
+# Throughput benchmark for the SLA monitor's full scan (run_sla_scan):
+#
+#   python -m app.jobs.sla_benchmark [n] [batch_size] [concurrency]
+#
+# Runs in its own process against a scratch database on the configured server:
+# MONGO_DB is pointed at {MONGO_DB}_bench_sla_<id> before app.db.mongo is
+# imported, so the real repositories run unchanged but never see production
+# data, and no lease is involved. Seeds n open requests with performance logs,
+# then times two scans: the first fires the due escalations, the second is the
+# steady state. The scratch database is dropped afterwards.
+
+STATUSES = ["new", "triaged", "assigned", "in_progress"]
+
+# registered as a global pymongo listener by __main__, before the app client exists
+_commands = CommandCounter()
+
+
+def _seed(n: int, now: datetime, seed: int = 42):
+    """
+    (request, performance_log) pairs spread over the last 4 days, so requests
+    land on either side of their target / breach / escalation thresholds.
+    """
+    from bson import ObjectId
+
+    rng = random.Random(seed)
+    for _ in range(n):
+        oid = ObjectId()
+        created_at = now - timedelta(minutes=rng.randrange(4 * 24 * 60))
+        target = rng.choice([4, 8, 24, 48])
+        request = {
+            "_id": oid,
+            "status": rng.choice(STATUSES),
+            "timestamps": {
+                "created_at": created_at,
+                "triaged_at": created_at + timedelta(minutes=rng.randrange(60)),
+            },
+            "sla_policy": {
+                "target_hours": target,
+                "breach_threshold_hours": target * 2,
+                "escalation_steps": [
+                    {"after_hours": target, "action": "notify_team_lead"},
+                    {"after_hours": target * 2, "action": "notify_manager"},
+                ],
+            },
+        }
+        log = {"request_id": oid, "computed_kpis": {"escalation_count": 0}, "event_stream": []}
+        yield request, log
+
+
+async def benchmark(n: int = 100_000, batch_size: int = 200, concurrency: int = 4) -> dict:
+    from app.db import mongo
+    from app.db.indexes import ensure_indexes
+    from app.jobs.sla_monitor import run_sla_scan
+
+    if "_bench_sla_" not in mongo.MONGO_DB:
+        # imported into a process that already uses the real database
+        raise RuntimeError("run as `python -m app.jobs.sla_benchmark`, not from the app")
+
+    result = {"n": n, "batch_size": batch_size, "concurrency": concurrency}
+    try:
+        await ensure_indexes()
+
+        t0 = time.perf_counter()
+        requests, logs = [], []
+        for request, log in _seed(n, datetime.utcnow()):
+            requests.append(request)
+            logs.append(log)
+            if len(requests) == 10_000:
+                await mongo.service_requests_collection.insert_many(requests, ordered=False)
+                await mongo.performance_logs_collection.insert_many(logs, ordered=False)
+                requests, logs = [], []
+        if requests:
+            await mongo.service_requests_collection.insert_many(requests, ordered=False)
+            await mongo.performance_logs_collection.insert_many(logs, ordered=False)
+        result["seed_seconds"] = round(time.perf_counter() - t0, 2)
+
+        for name in ("first_scan", "steady_scan"):
+            _commands.count = 0
+            stats = await run_sla_scan(batch_size, concurrency)
+            result[name] = {**stats, "round_trips": _commands.count}
+    finally:
+        await mongo.client.drop_database(mongo.MONGO_DB)
+    return result
+
+
+if __name__ == "__main__":
+    import json
+    import sys
+
+    os.environ["MONGO_DB"] = f"{os.getenv('MONGO_DB', 'cst')}_bench_sla_{uuid.uuid4().hex[:8]}"
+    # registered before app.db.mongo creates its client, so every command is counted
+    monitoring.register(_commands)
+
+    args = [int(a) for a in sys.argv[1:4]]
+    print(json.dumps(asyncio.run(benchmark(*args)), indent=2, default=str))
@@ -1,60 +1,332 @@
 from __future__ import annotations
 
 import asyncio
-from datetime import datetime
-from typing import Any, Dict
+import logging
+import time
+import heapq
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
 
+from app.core.config import get_settings
+from app.repositories.job_checkpoints import JobCheckpointRepository
 from app.repositories.performance_logs import PerformanceLogRepository
 from app.repositories.requests import ServiceRequestRepository
-from app.services.sla import compute_sla_state
+from app.services.sla import compute_sla_states, due_escalations, next_sla_check_at, sla_window
 
+logger = logging.getLogger(__name__)
 
-async def _process_request(request: Dict[str, Any]) -> None:
-    performance_log = await PerformanceLogRepository.get_by_request_oid(
-        request["_id"]
-    )
-    if not performance_log:
-        return
-    kpis = performance_log["computed_kpis"]
-    computed = compute_sla_state(
-        request["timestamps"]["created_at"],
-        request["sla_policy"],
-        kpis.get("escalation_count", 0),
+CHECKPOINT = "sla_monitor"
+
+# everything the batch needs from service_requests
+MONITOR_PROJECTION = {
+    "status": 1,
+    "timestamps.created_at": 1,
+    "timestamps.triaged_at": 1,
+    "sla_policy.target_hours": 1,
+    "sla_policy.breach_threshold_hours": 1,
+    "sla_policy.escalation_steps": 1,
+}
+
+# requests the monitor cannot evaluate yet (no performance log) are retried after this
+SKIPPED_RETRY = timedelta(hours=1)
+
+
+def _process_request(
+    request: Dict[str, Any],
+    start_at: datetime,
+    state: Dict[str, Any],
+    escalation_count: int,
+    now: datetime,
+) -> Tuple[Dict[str, Any], List[Dict[str, Any]], Optional[datetime]]:
+    """
+    KPI fields, escalation events and next_sla_check_at for one request,
+    given its state from the batch computation.
+    """
+    sla_policy = request["sla_policy"]
+
+    events = []
+    for index, step in due_escalations(sla_policy, state["elapsed_hours"], escalation_count):
+        escalation_count = index
+        events.append(
+            {
+                "type": "sla_escalation",
+                "by": {"actor_type": "system", "actor_id": "cst"},
+                "at": now,
+                "meta": {"action": step["action"], "after_hours": step["after_hours"]},
+            }
+        )
+
+    kpis = {
+        "sla_target_hours": state["target_hours"],
+        "sla_state": state["sla_state"],
+        "breach_reason": state["breach_reason"],
+        "escalation_count": escalation_count,
+        "computed_at": now,
+    }
+    next_at = next_sla_check_at(start_at, sla_policy, escalation_count, now=now)
+    return kpis, events, next_at
+
+
+async def _process_batch(
+    requests: List[Dict[str, Any]], stats: Dict[str, int]
+) -> Dict[Any, Optional[datetime]]:
+    """
+    One $in read for the batch's performance logs, one column-wise SLA state
+    computation, one bulk_write for all KPI updates and one for the requests'
+    next_sla_check_at. Returns that schedule.
+    """
+    logs = await PerformanceLogRepository.get_many_by_request_oids(
+        (r["_id"] for r in requests), {"request_id": 1, "computed_kpis.escalation_count": 1}
     )
-    escalation_steps = sorted(
-        request["sla_policy"].get("escalation_steps", []),
-        key=lambda step: step["after_hours"],
+
+    now = datetime.utcnow()
+    schedule: Dict[Any, Optional[datetime]] = {}
+
+    ready = []
+    for request in requests:
+        if request.get("sla_policy") and request["_id"] in logs:
+            ready.append(request)
+        else:
+            stats["skipped"] += 1
+            if request.get("sla_policy"):
+                schedule[request["_id"]] = now + SKIPPED_RETRY
+
+    starts = [sla_window(r, now)[0] for r in ready]
+    states = compute_sla_states(starts, [r["sla_policy"] for r in ready], now)
+
+    ops = []
+    for request, start_at, state in zip(ready, starts, states):
+        log_kpis = logs[request["_id"]].get("computed_kpis") or {}
+        escalation_count = log_kpis.get("escalation_count") or 0
+        kpis, events, next_at = _process_request(request, start_at, state, escalation_count, now)
+        ops.append(PerformanceLogRepository.kpis_update(
+            request["_id"], kpis, events, expected_escalation_count=escalation_count
+        ))
+        schedule[request["_id"]] = next_at
+        stats["escalations"] += len(events)
+
+    updated = await PerformanceLogRepository.bulk_write(ops)
+    await ServiceRequestRepository.set_next_sla_checks(schedule)
+    stats["updated"] += updated
+    stats["processed"] += len(requests)
+    return schedule
+
+
+async def run_sla_scan(
+    batch_size: int, concurrency: int, stop_event: Optional[asyncio.Event] = None
+) -> Dict[str, Any]:
+    """
+    Evaluates every open request once, streaming them from a cursor in _id order,
+    `concurrency` batches at a time. Progress is checkpointed by _id: a scan
+    interrupted by a restart resumes after the last fully processed batch.
+    When stop_event is set the scan stops reading, finishes the batches in
+    flight and returns with interrupted=True, leaving the checkpoint to resume from.
+    Returns counters plus throughput (requests per second).
+    """
+    started = time.perf_counter()
+    stats = {"processed": 0, "updated": 0, "skipped": 0, "escalations": 0, "batches": 0}
+
+    checkpoint = await JobCheckpointRepository.get(CHECKPOINT)
+    after_id = (checkpoint or {}).get("last_id")
+    stats["resumed_after"] = str(after_id) if after_id else None
+    if after_id is None:
+        await JobCheckpointRepository.start(CHECKPOINT, datetime.utcnow())
+
+    cursor = ServiceRequestRepository.iter_open_requests(
+        after_id, MONITOR_PROJECTION, batch_size=batch_size
     )
-    escalation_count = kpis.get("escalation_count", 0)
-    for index, step in enumerate(escalation_steps, start=1):
-        if computed["elapsed_hours"] >= step["after_hours"] and escalation_count < index:
-            escalation_count = index
-            await PerformanceLogRepository.append_event(
-                request["_id"],
-                {
-                    "type": "sla_escalation",
-                    "by": {"actor_type": "system", "actor_id": "cst"},
-                    "at": datetime.utcnow(),
-                    "meta": {"action": step["action"], "after_hours": step["after_hours"]},
-                },
-            )
-    kpis.update(
-        {
-            "sla_target_hours": computed["target_hours"],
-            "sla_state": computed["sla_state"],
-            "breach_reason": computed["breach_reason"],
-            "escalation_count": escalation_count,
-        }
+
+    # batches finish out of order; the checkpoint only moves past a batch
+    # once every earlier batch is done too
+    sem = asyncio.Semaphore(max(1, concurrency))
+    finished: Dict[int, Any] = {}
+    next_seq = 0
+    tasks = []
+
+    async def run(seq: int, batch: List[Dict[str, Any]]) -> None:
+        nonlocal next_seq
+        try:
+            await _process_batch(batch, stats)
+            finished[seq] = batch[-1]["_id"]
+            last_id = None
+            while next_seq in finished:
+                last_id = finished.pop(next_seq)
+                next_seq += 1
+            if last_id is not None:
+                await JobCheckpointRepository.advance(CHECKPOINT, last_id)
+        finally:
+            sem.release()
+
+    async def submit(batch: List[Dict[str, Any]]) -> None:
+        await sem.acquire()  # back-pressure: stop reading the cursor while all slots are busy
+        tasks.append(asyncio.create_task(run(stats["batches"], batch)))
+        stats["batches"] += 1
+
+    def stopped() -> bool:
+        return stop_event is not None and stop_event.is_set()
+
+    batch: List[Dict[str, Any]] = []
+    async for request in cursor:
+        batch.append(request)
+        if len(batch) >= batch_size:
+            await submit(batch)
+            batch = []
+            if stopped():
+                break
+    if batch and not stopped():
+        await submit(batch)
+    await cursor.close()
+
+    await asyncio.gather(*tasks)
+
+    seconds = time.perf_counter() - started
+    stats["seconds"] = round(seconds, 3)
+    stats["requests_per_second"] = round(stats["processed"] / seconds, 1) if seconds else None
+    stats["interrupted"] = stopped()
+
+    if not stats["interrupted"]:
+        await JobCheckpointRepository.complete(CHECKPOINT, dict(stats))
+    return stats
+
+
+async def _sweep_due(now: datetime, interval_seconds: int) -> Optional[str]:
+    """
+    Why the monitor should run a full run_sla_scan now, or None:
+    "requested" when an admin asked for one (POST /admin/requests/sla/monitor/run
+    while this process holds the lease), "resume" when a sweep was interrupted
+    (checkpoint still has last_id), "periodic" when the last completed sweep is
+    older than interval_seconds. Read from the shared checkpoint, so the
+    schedule carries over to a new leader.
+    """
+    if await JobCheckpointRepository.take_request(CHECKPOINT):
+        return "requested"
+    checkpoint = await JobCheckpointRepository.get(CHECKPOINT) or {}
+    if checkpoint.get("last_id") is not None:
+        return "resume"
+    completed_at = checkpoint.get("completed_at")
+    if interval_seconds > 0 and (
+        completed_at is None or completed_at + timedelta(seconds=interval_seconds) <= now
+    ):
+        return "periodic"
+    return None
+
+
+class SLAScheduler:
+    """
+    In-memory min-heap of the nearest next_sla_check_at deadlines.
+
+    Every poll refills it with the requests due within the next `horizon`
+    (indexed query on status + next_sla_check_at); between polls the loop only
+    wakes when the earliest deadline passes. Processing a request writes its
+    new deadline back and re-queues it if it falls inside the horizon.
+    """
+
+    def __init__(self, horizon_seconds: float, max_size: int):
+        self.horizon = timedelta(seconds=horizon_seconds)
+        self.max_size = max_size
+        self._heap: List[Tuple[datetime, Any]] = []
+        self._deadline: Dict[Any, datetime] = {}
+
+    def __len__(self) -> int:
+        return len(self._deadline)
+
+    def push(self, oid, at: Optional[datetime], now: datetime) -> None:
+        if at is None or at > now + self.horizon:
+            self._deadline.pop(oid, None)  # any heap entry left behind is stale
+            return
+        if self._deadline.get(oid) == at:
+            return
+        self._deadline[oid] = at
+        heapq.heappush(self._heap, (at, oid))
+
+    async def refill(self, now: datetime) -> None:
+        rows = await ServiceRequestRepository.find_due_sla_checks(
+            now + self.horizon, self.max_size
+        )
+        for r in rows:
+            # never scheduled -> due now
+            self.push(r["_id"], r.get("next_sla_check_at") or now, now)
+
+    def pop_due(self, now: datetime) -> List[Any]:
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            at, oid = heapq.heappop(self._heap)
+            if self._deadline.get(oid) == at:
+                del self._deadline[oid]
+                due.append(oid)
+        return due
+
+    def next_deadline(self) -> Optional[datetime]:
+        while self._heap and self._deadline.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+        return self._heap[0][0] if self._heap else None
+
+
+async def _process_due(
+    scheduler: SLAScheduler, oids: List[Any], batch_size: int, concurrency: int
+) -> Dict[str, int]:
+    stats = {"processed": 0, "updated": 0, "skipped": 0, "escalations": 0}
+    sem = asyncio.Semaphore(max(1, concurrency))
+
+    async def run(chunk):
+        async with sem:
+            requests = await ServiceRequestRepository.find_open_by_ids(chunk, MONITOR_PROJECTION)
+            schedule = await _process_batch(requests, stats)
+            now = datetime.utcnow()
+            for oid, at in schedule.items():
+                scheduler.push(oid, at, now)
+
+    await asyncio.gather(
+        *(run(oids[i:i + batch_size]) for i in range(0, len(oids), batch_size))
     )
-    await PerformanceLogRepository.update_kpis(request["_id"], kpis)
+    return stats
 
 
 async def sla_monitor_loop(interval_seconds: int, stop_event: asyncio.Event) -> None:
+    """
+    Deadline-driven: polls for due requests every interval_seconds and otherwise
+    sleeps until the nearest next_sla_check_at in the heap.
+
+    On each poll it also checks whether a full checkpointed sweep (run_sla_scan)
+    is due: one interrupted by a restart or lease handover is resumed by the
+    next leader, and a complete sweep runs every sla_full_sweep_interval_seconds
+    as a catch-up for requests whose next_sla_check_at is missing or wrong.
+    """
+    settings = get_settings()
+    scheduler = SLAScheduler(interval_seconds, settings.sla_scheduler_max_queue)
+    next_poll = datetime.min
+
     while not stop_event.is_set():
-        open_requests = await ServiceRequestRepository.find_open_requests()
-        for request in open_requests:
-            await _process_request(request)
+        now = datetime.utcnow()
+        try:
+            if now >= next_poll:
+                reason = await _sweep_due(now, settings.sla_full_sweep_interval_seconds)
+                if reason:
+                    stats = await run_sla_scan(
+                        settings.sla_monitor_batch_size, settings.sla_monitor_concurrency, stop_event
+                    )
+                    logger.info("sla full sweep (%s): %s", reason, stats)
+                    if stop_event.is_set():
+                        break
+                    now = datetime.utcnow()
+                next_poll = now + timedelta(seconds=interval_seconds)
+                await scheduler.refill(now)
+
+            due = scheduler.pop_due(now)
+            if due:
+                stats = await _process_due(
+                    scheduler, due, settings.sla_monitor_batch_size, settings.sla_monitor_concurrency
+                )
+                logger.info("sla checks: %s", stats)
+        except Exception:
+            logger.exception("sla monitor iteration failed")
+
+        wake_at = next_poll
+        deadline = scheduler.next_deadline()
+        if deadline is not None and deadline < wake_at:
+            wake_at = deadline
+        timeout = max(0.0, (wake_at - datetime.utcnow()).total_seconds())
         try:
-            await asyncio.wait_for(stop_event.wait(), timeout=interval_seconds)
+            await asyncio.wait_for(stop_event.wait(), timeout=timeout)
         except asyncio.TimeoutError:
             continue
@@ -0,0 +1,206 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Dict, List
+
+from pymongo import UpdateOne
+
+from app.core.cache import REQUESTS_TAG, response_cache
+from app.db.mongo import requests_collection, sla_rules_collection
+from app.jobs.progress import JobProgress, running_job, start_job
+from app.repositories.performance_logs import PerformanceLogRepository
+from app.services.sla import compute_sla_states, sla_deadlines, sla_window
+
+logger = logging.getLogger(__name__)
+
+JOB_KIND = "sla_recompute"
+
+# diff entries kept in a dry-run result
+MAX_DIFF = 500
+
+OPEN_STATUSES = ["new", "triaged", "assigned", "in_progress"]
+
+RECOMPUTE_PROJECTION = {
+    "request_id": 1,
+    "status": 1,
+    "timestamps": 1,
+    "sla_policy.zone": 1,
+    "sla_policy.priority": 1,
+    "sla_policy.target_hours": 1,
+    "sla_policy.breach_threshold_hours": 1,
+}
+
+_tasks: set[asyncio.Task] = set()
+
+
+def _new_policy_hours(policy: Dict[str, Any], rules: Dict[str, Any]) -> tuple[float, float] | None:
+    """
+    (target_hours, breach_threshold_hours) under `rules`, None when the zone or
+    priority is not in the table. A breach threshold equal to the old target
+    (create_sla's default) moves with it; a custom one is kept.
+    """
+    zone_hours = (rules.get("zones") or {}).get(policy.get("zone"))
+    priority_hours = (rules.get("priorities") or {}).get(policy.get("priority"))
+    if zone_hours is None or priority_hours is None:
+        return None
+
+    old_target = float(policy.get("target_hours") or 0)
+    old_breach = float(policy.get("breach_threshold_hours") or old_target)
+    target = float(zone_hours + priority_hours)
+    breach = target if old_breach == old_target else old_breach
+    return target, breach
+
+
+async def _recompute_batch(
+    batch: List[Dict[str, Any]], rules: Dict[str, Any], dry_run: bool, result: Dict[str, Any]
+) -> None:
+    now = datetime.utcnow()
+
+    changed = []
+    for r in batch:
+        hours = _new_policy_hours(r["sla_policy"], rules)
+        if hours is None:
+            result["unmatched"] += 1
+            continue
+        old = (
+            float(r["sla_policy"].get("target_hours") or 0),
+            float(r["sla_policy"].get("breach_threshold_hours") or r["sla_policy"].get("target_hours") or 0),
+        )
+        if hours != old:
+            changed.append((r, old, hours))
+
+    if not changed:
+        return
+
+    # column-wise: clocks, new policies -> states in one pass
+    windows = [sla_window(r, now) for r, _, _ in changed]
+    states = compute_sla_states(
+        [w[0] for w in windows],
+        [{"target_hours": t, "breach_threshold_hours": b} for _, _, (t, b) in changed],
+        now,
+        [w[1] for w in windows],
+    )
+
+    request_ops = []
+    log_ops = []
+    for (r, old, (target, breach)), state in zip(changed, states):
+        result["changed"] += 1
+        if len(result["diff"]) < MAX_DIFF:
+            result["diff"].append({
+                "request_id": r.get("request_id"),
+                "zone": r["sla_policy"].get("zone"),
+                "priority": r["sla_policy"].get("priority"),
+                "target_hours": [old[0], target],
+                "breach_threshold_hours": [old[1], breach],
+                "sla_state": state["sla_state"],
+            })
+        if dry_run:
+            continue
+
+        sets = {
+            "sla_policy.target_hours": target,
+            "sla_policy.breach_threshold_hours": breach,
+            "sla_policy.updated_at": now,
+            **sla_deadlines(r, {"target_hours": target, "breach_threshold_hours": breach}),
+        }
+        if r.get("status") in OPEN_STATUSES:
+            sets["next_sla_check_at"] = now  # let the SLA scheduler re-evaluate escalations
+        request_ops.append(UpdateOne({"_id": r["_id"]}, {"$set": sets}))
+        log_ops.append(PerformanceLogRepository.kpis_update(r["_id"], {
+            "sla_target_hours": state["target_hours"],
+            "sla_state": state["sla_state"],
+            "breach_reason": state["breach_reason"],
+            "computed_at": now,
+        }))
+
+    if request_ops:
+        await requests_collection.bulk_write(request_ops, ordered=False)
+        result["kpis_updated"] += await PerformanceLogRepository.bulk_write(log_ops)
+
+
+async def recompute_sla(job: JobProgress, dry_run: bool, include_closed: bool, batch_size: int) -> Dict[str, Any]:
+    rules = await sla_rules_collection.find_one() or {}
+
+    query: Dict[str, Any] = {"sla_policy": {"$exists": True}}
+    if not include_closed:
+        query["status"] = {"$in": OPEN_STATUSES}
+
+    job.total = await requests_collection.count_documents(query)
+    result: Dict[str, Any] = {
+        "dry_run": dry_run,
+        "scanned": 0,
+        "changed": 0,
+        "unmatched": 0,
+        "kpis_updated": 0,
+        "diff": [],
+    }
+
+    batch = []
+    async for r in requests_collection.find(query, RECOMPUTE_PROJECTION).batch_size(batch_size):
+        batch.append(r)
+        if len(batch) >= batch_size:
+            await _recompute_batch(batch, rules, dry_run, result)
+            result["scanned"] += len(batch)
+            job.advance(n=len(batch))
+            batch = []
+    if batch:
+        await _recompute_batch(batch, rules, dry_run, result)
+        result["scanned"] += len(batch)
+        job.advance(n=len(batch))
+
+    if not dry_run and result["changed"]:
+        response_cache.invalidate(REQUESTS_TAG)
+    result["diff_truncated"] = result["changed"] > len(result["diff"])
+    return result
+
+
+def start_recompute(dry_run: bool = True, include_closed: bool = False, batch_size: int = 500) -> JobProgress:
+    """
+    Starts the recompute in the background; one at a time (a second call returns the running job).
+    """
+    current = running_job(JOB_KIND)
+    if current is not None:
+        return current
+
+    job = start_job(
+        JOB_KIND,
+        params={"dry_run": dry_run, "include_closed": include_closed, "batch_size": batch_size},
+    )
+
+    async def run():
+        try:
+            job.finish(await recompute_sla(job, dry_run, include_closed, batch_size))
+        except Exception as e:
+            logger.exception("sla recompute failed")
+            job.fail(str(e))
+
+    task = asyncio.create_task(run())
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+    return job
+
+
+async def backfill_sla_deadlines(batch_size: int = 1000) -> dict:
+    """
+    Set sla_target_at / sla_breach_at on requests whose SLA was created before they existed.
+    """
+    updated = 0
+    ops = []
+    cursor = requests_collection.find(
+        {"sla_policy": {"$type": "object"}, "sla_breach_at": {"$exists": False}},
+        {"timestamps": 1, "sla_policy.target_hours": 1, "sla_policy.breach_threshold_hours": 1},
+    )
+    async for r in cursor:
+        ops.append(UpdateOne({"_id": r["_id"]}, {"$set": sla_deadlines(r)}))
+        if len(ops) >= batch_size:
+            await requests_collection.bulk_write(ops, ordered=False)
+            updated += len(ops)
+            ops = []
+
+    if ops:
+        await requests_collection.bulk_write(ops, ordered=False)
+        updated += len(ops)
+
+    return {"updated": updated}
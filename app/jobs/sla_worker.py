@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+import signal
+
+from app.core.config import get_settings
+from app.jobs.lease import Lease
+from app.jobs.sla_monitor import CHECKPOINT, run_sla_scan, sla_monitor_loop
+from app.repositories.job_checkpoints import JobCheckpointRepository
+
+logger = logging.getLogger(__name__)
+
+LEASE_NAME = "sla_monitor"
+
+
+async def _wait(stop_event: asyncio.Event, timeout: float) -> None:
+    try:
+        await asyncio.wait_for(stop_event.wait(), timeout=timeout)
+    except asyncio.TimeoutError:
+        pass
+
+
+async def _stop_monitor(monitor: asyncio.Task, grace: float) -> None:
+    """
+    Lets a signalled monitor finish its current batch (its KPI and escalation
+    writes); cancels it only if that takes longer than `grace`.
+    """
+    try:
+        await asyncio.wait_for(monitor, timeout=grace)
+    except asyncio.TimeoutError:
+        logger.warning("sla monitor did not stop within %ss, cancelled", grace)
+    except Exception:
+        logger.exception("sla monitor failed")
+
+
+async def run_sla_worker(stop_event: asyncio.Event, lease: Lease | None = None) -> None:
+    """
+    Runs sla_monitor_loop only while this process holds the "sla_monitor" lease,
+    so exactly one process across all workers/replicas escalates.
+
+    Followers retry the lease every ttl/3. The leader renews it at the same
+    pace; if a renewal fails (e.g. the process stalled past the TTL and someone
+    else took over) the monitor is stopped after its current batch.
+    """
+    settings = get_settings()
+    lease = lease or Lease(LEASE_NAME, settings.sla_lease_ttl_seconds)
+    beat = max(1.0, settings.sla_lease_ttl_seconds / 3)
+
+    while not stop_event.is_set():
+        try:
+            leader = await lease.acquire()
+        except Exception:
+            logger.exception("sla lease acquire failed")
+            leader = False
+
+        if not leader:
+            await _wait(stop_event, beat)
+            continue
+
+        logger.info("sla worker %s is leader", lease.owner)
+        monitor_stop = asyncio.Event()
+        monitor = asyncio.create_task(
+            sla_monitor_loop(settings.sla_scan_interval_seconds, monitor_stop)
+        )
+
+        try:
+            while not stop_event.is_set() and not monitor.done():
+                await _wait(stop_event, beat)
+                if stop_event.is_set():
+                    break
+                try:
+                    still_leader = await lease.renew()
+                except Exception:
+                    logger.exception("sla lease renew failed")
+                    still_leader = False
+                if not still_leader:
+                    logger.warning("sla worker %s lost the lease", lease.owner)
+                    break
+        finally:
+            monitor_stop.set()
+            await _stop_monitor(monitor, settings.sla_stop_grace_seconds)
+
+    with contextlib.suppress(Exception):
+        await lease.release()
+
+
+async def run_sla_scan_exclusive(batch_size: int, concurrency: int) -> dict | None:
+    """
+    One full scan (run_sla_scan) under the "sla_monitor" lease, so a manual run
+    never overlaps the leader's monitor or another scan and their shared
+    checkpoint. Returns None, without scanning, while someone else holds it
+    (see request_sla_sweep). If the lease is lost midway the scan stops after
+    its batches in flight (interrupted=True); the new holder resumes it from
+    the checkpoint.
+    """
+    settings = get_settings()
+    lease = Lease(LEASE_NAME, settings.sla_lease_ttl_seconds)
+    if not await lease.acquire():
+        return None
+
+    beat = max(1.0, settings.sla_lease_ttl_seconds / 3)
+    lost = asyncio.Event()
+    scan = asyncio.create_task(run_sla_scan(batch_size, concurrency, lost))
+    try:
+        while True:
+            done, _ = await asyncio.wait({scan}, timeout=beat)
+            if done:
+                return scan.result()
+            if lost.is_set():
+                continue
+            try:
+                still_holder = await lease.renew()
+            except Exception:
+                logger.exception("sla lease renew failed")
+                still_holder = False
+            if not still_holder:
+                logger.warning("manual sla scan %s lost the lease, stopping", lease.owner)
+                lost.set()
+    finally:
+        if not scan.done():
+            scan.cancel()
+            with contextlib.suppress(asyncio.CancelledError, Exception):
+                await scan
+        with contextlib.suppress(Exception):
+            await lease.release()
+
+
+async def request_sla_sweep() -> None:
+    """
+    Hands a full sweep to the SLA worker holding the lease; its monitor runs
+    it at the next poll (within sla_scan_interval_seconds).
+    """
+    await JobCheckpointRepository.request_run(CHECKPOINT)
+
+
+async def main() -> None:
+    from app.db.indexes import ensure_indexes
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        with contextlib.suppress(NotImplementedError):  # Windows
+            loop.add_signal_handler(sig, stop_event.set)
+
+    await ensure_indexes()
+    await run_sla_worker(stop_event)
+
+
+if __name__ == "__main__":
+    # out-of-process worker: python -m app.jobs.sla_worker
+    asyncio.run(main())
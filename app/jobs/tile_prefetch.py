@@ -0,0 +1,186 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from urllib.parse import urlparse
+
+from app.core.config import OSM_TILE_URL, get_settings
+from app.db.mongo import service_requests_collection
+from app.jobs.progress import JobProgress, running_job, start_job
+from app.services.tile_cache import TileFetchError, tile_cache
+from app.utils.geo import lnglat_to_tile
+
+logger = logging.getLogger(__name__)
+
+JOB_KIND = "tile_prefetch"
+
+# keep references so running prefetches are not garbage collected
+_tasks: set[asyncio.Task] = set()
+
+
+async def requests_extent() -> tuple[float, float, float, float] | None:
+    """
+    (west, south, east, north) of all request locations, None if there are none.
+    """
+    pipeline = [
+        {"$match": {
+            "location.type": "Point",
+            "location.coordinates.0": {"$type": "number"},
+            "location.coordinates.1": {"$type": "number"},
+        }},
+        {"$project": {
+            "_id": 0,
+            "lng": {"$arrayElemAt": ["$location.coordinates", 0]},
+            "lat": {"$arrayElemAt": ["$location.coordinates", 1]},
+        }},
+        {"$group": {
+            "_id": None,
+            "west": {"$min": "$lng"},
+            "south": {"$min": "$lat"},
+            "east": {"$max": "$lng"},
+            "north": {"$max": "$lat"},
+        }},
+    ]
+    rows = await service_requests_collection.aggregate(pipeline).to_list(length=1)
+    if not rows:
+        return None
+    r = rows[0]
+    return r["west"], r["south"], r["east"], r["north"]
+
+
+def tile_range(bbox: tuple[float, float, float, float], z: int) -> tuple[int, int, int, int]:
+    """
+    (x_min, y_min, x_max, y_max), inclusive, of the zoom-z tiles covering bbox.
+    """
+    west, south, east, north = bbox
+    x0, y0 = lnglat_to_tile(west, north, z)
+    x1, y1 = lnglat_to_tile(east, south, z)
+    return x0, y0, x1, y1
+
+
+def count_tiles(bbox, min_zoom: int, max_zoom: int) -> int:
+    total = 0
+    for z in range(min_zoom, max_zoom + 1):
+        x0, y0, x1, y1 = tile_range(bbox, z)
+        total += (x1 - x0 + 1) * (y1 - y0 + 1)
+    return total
+
+
+def iter_tiles(bbox, min_zoom: int, max_zoom: int):
+    for z in range(min_zoom, max_zoom + 1):
+        x0, y0, x1, y1 = tile_range(bbox, z)
+        for x in range(x0, x1 + 1):
+            for y in range(y0, y1 + 1):
+                yield z, x, y
+
+
+def coverage(bbox, min_zoom: int, max_zoom: int) -> list[dict]:
+    ranges = {z: tile_range(bbox, z) for z in range(min_zoom, max_zoom + 1)}
+    cached = tile_cache.count_cached(ranges)
+
+    out = []
+    for z, (x0, y0, x1, y1) in ranges.items():
+        tiles = (x1 - x0 + 1) * (y1 - y0 + 1)
+        out.append({
+            "zoom": z,
+            "tiles": tiles,
+            "cached": cached[z],
+            "percent": round(cached[z] * 100 / tiles, 1) if tiles else 0,
+        })
+    return out
+
+
+async def prefetch_tiles(bbox, min_zoom: int, max_zoom: int, concurrency: int, job: JobProgress) -> dict:
+    """
+    Pulls every tile of bbox in [min_zoom, max_zoom] through the tile cache.
+    `concurrency` workers share one tile iterator; the cache's own semaphore
+    still bounds upstream requests.
+    """
+    tiles = iter_tiles(bbox, min_zoom, max_zoom)
+
+    async def worker():
+        for z, x, y in tiles:
+            try:
+                await tile_cache.get_tile(z, x, y)
+                job.advance()
+            except TileFetchError:
+                job.advance(ok=False)
+
+    await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+    return {"tiles": job.done, "failed": job.failed}
+
+
+def check_prefetch_upstream(upstream_url: str) -> None:
+    """
+    Prefetch needs an explicitly configured tile server (TILE_UPSTREAM_URL);
+    the public OSM servers are refused whatever the subdomain.
+    """
+    osm_host = urlparse(OSM_TILE_URL).hostname
+    host = urlparse(upstream_url).hostname or ""
+    if host == osm_host or host.endswith("." + osm_host):
+        raise ValueError(
+            "Tile prefetch is not allowed against the public OpenStreetMap tile servers; "
+            "set TILE_UPSTREAM_URL to your own tile server or provider"
+        )
+
+
+async def start_prefetch(
+    bbox: tuple[float, float, float, float] | None = None,
+    min_zoom: int | None = None,
+    max_zoom: int | None = None,
+) -> JobProgress:
+    """
+    Starts a prefetch in the background and returns its progress record.
+    Defaults: bbox = extent of service_requests.location, zooms from settings.
+    Only one prefetch runs at a time; a second call returns the running one.
+    Raises ValueError when the upstream is the public OSM tile server.
+    """
+    settings = get_settings()
+    check_prefetch_upstream(settings.tile_upstream_url)
+
+    current = running_job(JOB_KIND)
+    if current is not None:
+        return current
+
+    min_zoom = settings.tile_prefetch_min_zoom if min_zoom is None else min_zoom
+    max_zoom = settings.tile_prefetch_max_zoom if max_zoom is None else max_zoom
+    if not (0 <= min_zoom <= max_zoom <= 19):
+        raise ValueError("Invalid zoom range")
+
+    if bbox is None:
+        bbox = await requests_extent()
+        if bbox is None:
+            raise ValueError("No request locations to derive a bounding box from")
+
+    total = count_tiles(bbox, min_zoom, max_zoom)
+    if total > settings.tile_prefetch_max_tiles:
+        raise ValueError(
+            f"{total} tiles requested, limit is {settings.tile_prefetch_max_tiles}; "
+            "narrow the bounding box or zoom range"
+        )
+
+    job = start_job(
+        JOB_KIND,
+        total=total,
+        params={"bbox": list(bbox), "min_zoom": min_zoom, "max_zoom": max_zoom},
+    )
+
+    async def run():
+        try:
+            job.finish(await prefetch_tiles(
+                bbox, min_zoom, max_zoom, settings.tile_prefetch_concurrency, job
+            ))
+        except Exception as e:
+            logger.exception("tile prefetch failed")
+            job.fail(str(e))
+
+    task = asyncio.create_task(run())
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+    return job
+
+
+async def cancel_prefetches() -> None:
+    for task in list(_tasks):
+        task.cancel()
+    await asyncio.gather(*_tasks, return_exceptions=True)
@@ -1,3 +1,7 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
@@ -9,8 +13,10 @@ from app.api.admin import analytics
 from app.api.admin import categories, subcategories
 from app.api.admin.requests_sla import router as requests_sla_router
 from app.api.admin.requests import router as requests_router
+from app.api.admin.requests_ndjson import router as requests_ndjson_router
 from app.api.admin.sla_rules import router as sla_rules_router
 from app.api.admin.dashboard import router as dashboard_router
+from app.api.admin.cache import router as cache_router
 
 from app.api.auth import router as auth_router
 from app.api.service_requests import router as service_requests_router
@@ -18,11 +24,64 @@ from app.api.admin.tiles import router as tiles_router
 from app.api.admin.analytics import router as analytics_router
 
 from app.api.admin.geo_feeds import router as geo_feeds_router
+from app.core.config import get_settings
+from app.db.indexes import ensure_indexes
+from app.db.mongo import db
+from app.services import cohort_rollups
+from app.services.heatmap import backfill_quadkeys
+from app.services.audit_pipeline import audit_pipeline
+from app.services.tile_cache import tile_cache
+from app.jobs.dashboard_counters import dashboard_reconcile_loop
+from app.jobs.tile_prefetch import cancel_prefetches, start_prefetch
+from app.jobs.sla_worker import run_sla_worker
+from app.jobs.sla_recompute import backfill_sla_deadlines
 from pathlib import Path
 from fastapi.staticfiles import StaticFiles
 
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    settings = get_settings()
+    stop_event = asyncio.Event()
+
+    await ensure_indexes()
+    await tile_cache.start()
+    await audit_pipeline.start()
+
+    background = [
+        asyncio.create_task(
+            dashboard_reconcile_loop(settings.dashboard_reconcile_interval_seconds, stop_event)
+        ),
+        # first start on a database without cohort rollups
+        asyncio.create_task(cohort_rollups.backfill_if_empty()),
+        # requests created before location_quadkey existed
+        asyncio.create_task(backfill_quadkeys(db)),
+        # requests triaged before sla_target_at / sla_breach_at existed
+        asyncio.create_task(backfill_sla_deadlines()),
+    ]
+    if settings.sla_worker_in_process:
+        # lease-guarded: only one process across all workers runs the SLA monitor
+        background.append(asyncio.create_task(run_sla_worker(stop_event)))
+
+    if settings.tile_prefetch_on_startup:
+        try:
+            await start_prefetch()
+        except ValueError as e:
+            logger.warning("tile prefetch on startup skipped: %s", e)
+
+    yield
+
+    stop_event.set()
+    await asyncio.gather(*background, return_exceptions=True)
+    await cancel_prefetches()
+    await tile_cache.close()
+    # last: drains the audit events of everything above
+    await audit_pipeline.stop()
+
 
-app = FastAPI(title="CST Backend (MongoDB)")
+app = FastAPI(title="CST Backend (MongoDB)", lifespan=lifespan)
 
 UPLOAD_DIR = Path("uploads")
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
@@ -54,10 +113,12 @@ app.include_router(tiles_router)
 app.include_router(analytics_router)
 app.include_router(categories.router)
 app.include_router(subcategories.router)
+app.include_router(requests_ndjson_router)
 app.include_router(requests_sla_router)
 app.include_router(requests_router)
 app.include_router(sla_rules_router)
 app.include_router(dashboard_router)
+app.include_router(cache_router)
 app.include_router(geo_feeds_router)
 
 
@@ -1,3 +1,5 @@
+from typing import List
+
 from app.utils.mongo import serialize_mongo
 
 
@@ -15,3 +17,7 @@ class AuditRepository:
 
     async def create(self, data: dict):
         await self.collection.insert_one(data)
+
+    async def create_many(self, data: List[dict]):
+        if data:
+            await self.collection.insert_many(data, ordered=False)
@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from pymongo import ReturnDocument
+
+from app.db.mongo import job_checkpoints_collection
+
+
+class JobCheckpointRepository:
+    """
+    One document per job: { _id: <job name>, last_id, started_at, updated_at, ... }.
+    last_id only moves forward ($max), so out-of-order saves are harmless.
+    """
+
+    @staticmethod
+    async def get(job: str) -> Optional[Dict[str, Any]]:
+        return await job_checkpoints_collection.find_one({"_id": job})
+
+    @staticmethod
+    async def start(job: str, started_at: datetime) -> None:
+        await job_checkpoints_collection.update_one(
+            {"_id": job},
+            {"$set": {"started_at": started_at, "updated_at": started_at}},
+            upsert=True,
+        )
+
+    @staticmethod
+    async def advance(job: str, last_id: Any) -> None:
+        await job_checkpoints_collection.update_one(
+            {"_id": job},
+            {"$max": {"last_id": last_id}, "$set": {"updated_at": datetime.utcnow()}},
+            upsert=True,
+        )
+
+    @staticmethod
+    async def complete(job: str, summary: Dict[str, Any]) -> None:
+        now = datetime.utcnow()
+        await job_checkpoints_collection.update_one(
+            {"_id": job},
+            {
+                "$unset": {"last_id": "", "started_at": ""},
+                "$set": {"completed_at": now, "updated_at": now, "last_run": summary},
+            },
+            upsert=True,
+        )
+
+    @staticmethod
+    async def request_run(job: str) -> None:
+        """
+        Asks whichever process runs `job` to run it at its next check.
+        """
+        now = datetime.utcnow()
+        await job_checkpoints_collection.update_one(
+            {"_id": job},
+            {"$set": {"requested_at": now, "updated_at": now}},
+            upsert=True,
+        )
+
+    @staticmethod
+    async def take_request(job: str) -> bool:
+        """
+        Clears a pending request_run; True for the one caller that cleared it.
+        """
+        doc = await job_checkpoints_collection.find_one_and_update(
+            {"_id": job, "requested_at": {"$exists": True}},
+            {"$unset": {"requested_at": ""}},
+            projection={"_id": 1},
+            return_document=ReturnDocument.BEFORE,
+        )
+        return doc is not None
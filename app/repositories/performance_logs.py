@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from app.db.mongo import performance_logs_collection
+
+
+class PerformanceLogRepository:
+    @staticmethod
+    async def get_by_request_oid(request_oid: ObjectId) -> Optional[Dict[str, Any]]:
+        return await performance_logs_collection.find_one({"request_id": request_oid})
+
+    @staticmethod
+    async def get_many_by_request_oids(
+        request_oids: Iterable[ObjectId], projection: Optional[Dict[str, Any]] = None
+    ) -> Dict[ObjectId, Dict[str, Any]]:
+        """
+        One $in query for a whole batch, keyed by request ObjectId.
+        """
+        oids = list(request_oids)
+        if not oids:
+            return {}
+        cursor = performance_logs_collection.find({"request_id": {"$in": oids}}, projection)
+        return {doc["request_id"]: doc async for doc in cursor}
+
+    @staticmethod
+    async def append_event(request_oid: ObjectId, event: Dict[str, Any]) -> None:
+        await performance_logs_collection.update_one(
+            {"request_id": request_oid},
+            {"$push": {"event_stream": event}, "$set": {"updated_at": datetime.utcnow()}},
+        )
+
+    @staticmethod
+    async def update_kpis(request_oid: ObjectId, kpis: Dict[str, Any]) -> None:
+        await performance_logs_collection.update_one(
+            {"request_id": request_oid},
+            {"$set": PerformanceLogRepository._kpis_set(kpis, datetime.utcnow())},
+        )
+
+    @staticmethod
+    def _kpis_set(kpis: Dict[str, Any], now: datetime) -> Dict[str, Any]:
+        # dotted paths: fields owned by other writers (citizen_feedback, ...) survive
+        out = {f"computed_kpis.{k}": v for k, v in kpis.items()}
+        out["updated_at"] = now
+        return out
+
+    @staticmethod
+    def kpis_update(
+        request_oid: ObjectId,
+        kpis: Dict[str, Any],
+        events: List[Dict[str, Any]] = (),
+        expected_escalation_count: Optional[int] = None,
+    ) -> UpdateOne:
+        """
+        update_kpis + append_event for one request as a single bulk_write operation.
+
+        With expected_escalation_count the update only applies while the log
+        still has the escalation_count that was read: of two concurrent
+        evaluations of the same request, the second one matches nothing
+        instead of recording the same escalations again.
+        """
+        update: Dict[str, Any] = {
+            "$set": PerformanceLogRepository._kpis_set(kpis, datetime.utcnow())
+        }
+        if events:
+            update["$push"] = {"event_stream": {"$each": list(events)}}
+
+        query: Dict[str, Any] = {"request_id": request_oid}
+        if expected_escalation_count is not None:
+            # a log without the field reads as 0
+            query["computed_kpis.escalation_count"] = (
+                {"$in": [0, None]} if expected_escalation_count == 0 else expected_escalation_count
+            )
+        return UpdateOne(query, update)
+
+    @staticmethod
+    def _upsert_spec(request_oid: ObjectId, kpis: Dict[str, Any]) -> Dict[str, Any]:
+        # escalation_count is owned by the SLA monitor: only written when the log is created
+        now = datetime.utcnow()
+        kpis = dict(kpis)
+        escalation_count = kpis.pop("escalation_count", 0)
+        return {
+            "$setOnInsert": {
+                "request_id": request_oid,
+                "event_stream": [],
+                "created_at": now,
+                "computed_kpis.escalation_count": escalation_count,
+            },
+            "$set": PerformanceLogRepository._kpis_set(kpis, now),
+        }
+
+    @staticmethod
+    def kpis_upsert(request_oid: ObjectId, kpis: Dict[str, Any]) -> UpdateOne:
+        """
+        Create-or-update from request handlers, as a bulk_write operation.
+        """
+        return UpdateOne(
+            {"request_id": request_oid},
+            PerformanceLogRepository._upsert_spec(request_oid, kpis),
+            upsert=True,
+        )
+
+    @staticmethod
+    async def upsert_kpis(request_oid: ObjectId, kpis: Dict[str, Any]) -> None:
+        await performance_logs_collection.update_one(
+            {"request_id": request_oid},
+            PerformanceLogRepository._upsert_spec(request_oid, kpis),
+            upsert=True,
+        )
+
+    @staticmethod
+    async def upsert_many_kpis(kpis_by_request: Dict[ObjectId, Dict[str, Any]]) -> int:
+        return await PerformanceLogRepository.bulk_write([
+            PerformanceLogRepository.kpis_upsert(oid, kpis)
+            for oid, kpis in kpis_by_request.items()
+        ])
+
+    @staticmethod
+    async def bulk_write(ops: List[UpdateOne]) -> int:
+        if not ops:
+            return 0
+        result = await performance_logs_collection.bulk_write(ops, ordered=False)
+        return result.modified_count + result.upserted_count
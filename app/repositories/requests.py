@@ -4,22 +4,25 @@ from datetime import datetime, timedelta
 from typing import Any, Dict, List, Optional
 
 from bson import ObjectId
+from pymongo import UpdateOne
 
-from app.db.mongo import mongo
+from app.db.mongo import db
+
+OPEN_STATUSES = ["new", "triaged", "assigned", "in_progress"]
 
 
 class ServiceRequestRepository:
     @staticmethod
     async def find_by_request_id(request_id: str) -> Optional[Dict[str, Any]]:
-        return await mongo.db.service_requests.find_one({"request_id": request_id})
+        return await db.service_requests.find_one({"request_id": request_id})
 
     @staticmethod
     async def find_by_idempotency_key(key: str) -> Optional[Dict[str, Any]]:
-        return await mongo.db.service_requests.find_one({"idempotency_key": key})
+        return await db.service_requests.find_one({"idempotency_key": key})
 
     @staticmethod
     async def insert(document: Dict[str, Any]) -> Dict[str, Any]:
-        result = await mongo.db.service_requests.insert_one(document)
+        result = await db.service_requests.insert_one(document)
         document["_id"] = result.inserted_id
         return document
 
@@ -27,7 +30,7 @@ class ServiceRequestRepository:
     async def update_by_request_id(
         request_id: str, update: Dict[str, Any]
     ) -> Optional[Dict[str, Any]]:
-        await mongo.db.service_requests.update_one({"request_id": request_id}, update)
+        await db.service_requests.update_one({"request_id": request_id}, update)
         return await ServiceRequestRepository.find_by_request_id(request_id)
 
     @staticmethod
@@ -38,7 +41,7 @@ class ServiceRequestRepository:
         window_hours: int,
     ) -> List[Dict[str, Any]]:
         since = datetime.utcnow() - timedelta(hours=window_hours)
-        cursor = mongo.db.service_requests.find(
+        cursor = db.service_requests.find(
             {
                 "category": category,
                 "timestamps.created_at": {"$gte": since},
@@ -56,7 +59,7 @@ class ServiceRequestRepository:
     async def add_duplicate_link(
         master_request_id: str, duplicate_request_id: str
     ) -> None:
-        await mongo.db.service_requests.update_one(
+        await db.service_requests.update_one(
             {"request_id": master_request_id},
             {
                 "$addToSet": {"duplicates.linked_duplicates": duplicate_request_id},
@@ -66,7 +69,7 @@ class ServiceRequestRepository:
 
     @staticmethod
     async def set_duplicate_master(request_id: str, master_request_id: str) -> None:
-        await mongo.db.service_requests.update_one(
+        await db.service_requests.update_one(
             {"request_id": request_id},
             {
                 "$set": {
@@ -78,16 +81,73 @@ class ServiceRequestRepository:
         )
 
     @staticmethod
-    async def find_open_requests() -> List[Dict[str, Any]]:
-        cursor = mongo.db.service_requests.find(
-            {"status": {"$in": ["new", "triaged", "assigned", "in_progress"]}}
+    def iter_open_requests(
+        after_id: Optional[ObjectId] = None,
+        projection: Optional[Dict[str, Any]] = None,
+        batch_size: int = 500,
+    ):
+        """
+        Streaming cursor over open requests in _id order, starting after `after_id`
+        (so a scan can resume from a checkpoint).
+        """
+        query: Dict[str, Any] = {"status": {"$in": OPEN_STATUSES}}
+        if after_id is not None:
+            query["_id"] = {"$gt": after_id}
+        return (
+            db.service_requests.find(query, projection)
+            .sort("_id", 1)
+            .batch_size(batch_size)
+        )
+
+    @staticmethod
+    async def find_open_by_ids(
+        ids: List[ObjectId], projection: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        cursor = db.service_requests.find(
+            {"_id": {"$in": ids}, "status": {"$in": OPEN_STATUSES}}, projection
+        )
+        return await cursor.to_list(length=None)
+
+    @staticmethod
+    async def find_due_sla_checks(until: datetime, limit: int) -> List[Dict[str, Any]]:
+        """
+        Open requests with an SLA policy whose next_sla_check_at is at or before
+        `until`, nearest first. Requests never scheduled (no field) count as due now;
+        next_sla_check_at = null means nothing left to check.
+        """
+        cursor = (
+            db.service_requests.find(
+                {
+                    "status": {"$in": OPEN_STATUSES},
+                    "sla_policy": {"$exists": True},
+                    "$or": [
+                        {"next_sla_check_at": {"$lte": until}},
+                        {"next_sla_check_at": {"$exists": False}},
+                    ],
+                },
+                {"next_sla_check_at": 1},
+            )
+            .sort("next_sla_check_at", 1)
+            .limit(limit)
+        )
+        return await cursor.to_list(length=limit)
+
+    @staticmethod
+    async def set_next_sla_checks(schedule: Dict[ObjectId, Optional[datetime]]) -> None:
+        if not schedule:
+            return
+        await db.service_requests.bulk_write(
+            [
+                UpdateOne({"_id": oid}, {"$set": {"next_sla_check_at": at}})
+                for oid, at in schedule.items()
+            ],
+            ordered=False,
         )
-        return await cursor.to_list(length=500)
 
     @staticmethod
     async def list_by_status(status: str, limit: int, offset: int) -> List[Dict[str, Any]]:
         cursor = (
-            mongo.db.service_requests.find({"status": status})
+            db.service_requests.find({"status": status})
             .skip(offset)
             .limit(limit)
         )
@@ -97,12 +157,12 @@ class ServiceRequestRepository:
     async def list_requests(
         filters: Dict[str, Any], limit: int, offset: int
     ) -> List[Dict[str, Any]]:
-        cursor = mongo.db.service_requests.find(filters).skip(offset).limit(limit)
+        cursor = db.service_requests.find(filters).skip(offset).limit(limit)
         return await cursor.to_list(length=limit)
 
     @staticmethod
     async def count_workload(agent_id: ObjectId) -> int:
-        return await mongo.db.service_requests.count_documents(
+        return await db.service_requests.count_documents(
             {
                 "assignment.assigned_agent_id": agent_id,
                 "status": {"$in": ["assigned", "in_progress"]},
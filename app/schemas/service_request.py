@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional, Literal
+from typing import Any, Dict, List, Optional, Literal
 
 class CitizenRefIn(BaseModel):
     citizen_id: str | None = None
@@ -25,6 +25,24 @@ class CreateServiceRequestResponse(BaseModel):
     status: str
     sla_hint: Optional[str] = None
 
+class BulkCreateServiceRequestsBody(BaseModel):
+    # raw items, validated one by one so a bad item does not reject the batch
+    items: List[Dict[str, Any]] = Field(..., min_items=1)
+
+class BulkCreateItemResult(BaseModel):
+    index: int
+    ok: bool
+    request_id: Optional[str] = None
+    status: Optional[str] = None
+    errors: Optional[List[Dict[str, Any]]] = None
+
+class BulkCreateServiceRequestsResponse(BaseModel):
+    created: int
+    failed: int
+    # written on the primary, but the write concern was not satisfied (ok=False, status "unconfirmed")
+    unconfirmed: int = 0
+    results: List[BulkCreateItemResult]
+
 class UpdateServiceRequestBody(BaseModel):
     category: Optional[str] = None
     sub_category: Optional[str] = None
@@ -1,32 +1,74 @@
-from datetime import datetime
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta
+
 from app.db.mongo import requests_collection
+from app.core.cache import REQUESTS_TAG, cache_key, response_cache
+from app.utils.bench import percentiles, scratch_db
 
 
 class AnalyticsService:
+    def __init__(self, collection=None):
+        self.collection = requests_collection if collection is None else collection
+
     async def get_dashboard(self, zone=None, category=None, date_from=None, date_to=None):
+        return await response_cache.get_or_compute(
+            cache_key(
+                "analytics.dashboard",
+                zone=zone, category=category, date_from=date_from, date_to=date_to,
+            ),
+            lambda: self._compute_dashboard(zone, category, date_from, date_to),
+            tags=(REQUESTS_TAG,),
+        )
+
+    # -------------------------
+    async def _compute_dashboard(self, zone, category, date_from, date_to):
         query = self._build_query(zone, category, date_from, date_to)
 
-        total = await requests_collection.count_documents(query)
-        open_count = await requests_collection.count_documents({**query, "status": {"$ne": "closed"}})
-        closed = await requests_collection.count_documents({**query, "status": "closed"})
+        # one round trip: $match once, then every widget as a $facet branch
+        pipeline = [
+            {"$match": query},
+            {"$project": {"_id": 0, "status": 1, "zone": 1, "priority": 1,
+                          "created_at": 1, "sla_breached": 1}},
+            {
+                "$facet": {
+                    "summary": self._summary_facet(),
+                    "by_status": self._group_facet("$status"),
+                    "by_zone": self._group_facet("$zone"),
+                    "by_priority": self._group_facet("$priority"),
+                    "by_day": self._by_day_facet(),
+                }
+            },
+        ]
+
+        rows = await self.collection.aggregate(pipeline).to_list(length=1)
+        facets = rows[0] if rows else {}
 
-        breached = await requests_collection.count_documents({
-            **query,
-            "sla_breached": True
-        })
+        summary = (facets.get("summary") or [{}])[0]
+        total = summary.get("total", 0)
+        breached = summary.get("breached", 0)
 
         return {
             "summary": {
                 "total_requests": total,
-                "open_requests": open_count,
-                "closed_requests": closed,
+                "open_requests": summary.get("open", 0),
+                "closed_requests": summary.get("closed", 0),
                 "sla_breached": breached,
                 "sla_breached_pct": round((breached / total) * 100, 2) if total else 0,
             },
-            "by_status": await self._by_status(query),
-            "by_zone": await self._by_zone(query),
-            "priority_distribution": await self._by_priority(query),
-            "trend": await self._by_day(query),
+            "by_status": {row["_id"]: row["count"] for row in facets.get("by_status", [])},
+            "by_zone": [
+                {"zone": row["_id"] or "unknown", "count": row["count"]}
+                for row in facets.get("by_zone", [])
+            ],
+            "priority_distribution": {
+                row["_id"]: row["count"] for row in facets.get("by_priority", [])
+            },
+            "trend": [
+                {"date": row["_id"], "count": row["count"]}
+                for row in facets.get("by_day", [])
+            ],
         }
 
     # -------------------------
@@ -51,50 +93,28 @@ class AnalyticsService:
         return q
 
     # -------------------------
-    async def _by_status(self, base_query):
-        pipeline = [
-            {"$match": base_query},
-            {"$group": {"_id": "$status", "count": {"$sum": 1}}},
-        ]
-
-        data = {}
-        async for row in requests_collection.aggregate(pipeline):
-            data[row["_id"]] = row["count"]
-
-        return data
-
-    # -------------------------
-    async def _by_zone(self, base_query):
-        pipeline = [
-            {"$match": base_query},
-            {"$group": {"_id": "$zone", "count": {"$sum": 1}}},
+    def _summary_facet(self):
+        return [
+            {
+                "$group": {
+                    "_id": None,
+                    "total": {"$sum": 1},
+                    "open": {"$sum": {"$cond": [{"$ne": ["$status", "closed"]}, 1, 0]}},
+                    "closed": {"$sum": {"$cond": [{"$eq": ["$status", "closed"]}, 1, 0]}},
+                    "breached": {"$sum": {"$cond": [{"$eq": ["$sla_breached", True]}, 1, 0]}},
+                }
+            },
         ]
 
-        out = []
-        async for row in requests_collection.aggregate(pipeline):
-            out.append({
-                "zone": row["_id"] or "unknown",
-                "count": row["count"]
-            })
-        return out
-
     # -------------------------
-    async def _by_priority(self, base_query):
-        pipeline = [
-            {"$match": base_query},
-            {"$group": {"_id": "$priority", "count": {"$sum": 1}}},
+    def _group_facet(self, field):
+        return [
+            {"$group": {"_id": field, "count": {"$sum": 1}}},
         ]
 
-        data = {}
-        async for row in requests_collection.aggregate(pipeline):
-            data[row["_id"]] = row["count"]
-
-        return data
-
     # -------------------------
-    async def _by_day(self, base_query):
-        pipeline = [
-            {"$match": base_query},
+    def _by_day_facet(self):
+        return [
             {
                 "$group": {
                     "_id": {
@@ -106,11 +126,119 @@ class AnalyticsService:
             {"$sort": {"_id": 1}},
         ]
 
-        out = []
-        async for row in requests_collection.aggregate(pipeline):
-            out.append({
-                "date": row["_id"],
-                "count": row["count"]
-            })
 
-        return out
+# -------------------------
+# benchmark: the eight-call dashboard this replaced vs the $facet pipeline
+
+async def _legacy_dashboard(collection, query) -> dict:
+    """
+    _compute_dashboard as it was before the $facet rewrite: four
+    count_documents and four aggregations, one round trip each.
+    """
+    async def grouped(field):
+        pipeline = [{"$match": query}, {"$group": {"_id": field, "count": {"$sum": 1}}}]
+        return [row async for row in collection.aggregate(pipeline)]
+
+    total = await collection.count_documents(query)
+    open_count = await collection.count_documents({**query, "status": {"$ne": "closed"}})
+    closed = await collection.count_documents({**query, "status": "closed"})
+    breached = await collection.count_documents({**query, "sla_breached": True})
+
+    by_status = await grouped("$status")
+    by_zone = await grouped("$zone")
+    by_priority = await grouped("$priority")
+    by_day = [
+        row async for row in collection.aggregate([
+            {"$match": query},
+            {"$group": {
+                "_id": {"$dateToString": {"format": "%Y-%m-%d", "date": "$created_at"}},
+                "count": {"$sum": 1},
+            }},
+            {"$sort": {"_id": 1}},
+        ])
+    ]
+
+    return {
+        "summary": {
+            "total_requests": total,
+            "open_requests": open_count,
+            "closed_requests": closed,
+            "sla_breached": breached,
+            "sla_breached_pct": round((breached / total) * 100, 2) if total else 0,
+        },
+        "by_status": {row["_id"]: row["count"] for row in by_status},
+        "by_zone": [{"zone": row["_id"] or "unknown", "count": row["count"]} for row in by_zone],
+        "priority_distribution": {row["_id"]: row["count"] for row in by_priority},
+        "trend": [{"date": row["_id"], "count": row["count"]} for row in by_day],
+    }
+
+
+def _seed_requests(n: int, seed: int = 42):
+    rng = random.Random(seed)
+    start = datetime(2026, 1, 1)
+    statuses = ["new", "triaged", "assigned", "in_progress", "resolved", "closed"]
+    zones = ["North", "South", "East", "West", "Central", None]
+    categories = ["roads", "water", "waste", "lighting", "parks"]
+    for _ in range(n):
+        yield {
+            "status": rng.choice(statuses),
+            "zone": rng.choice(zones),
+            "priority": rng.choice(["P1", "P2", "P3", None]),
+            "category_code": rng.choice(categories),
+            "created_at": start + timedelta(minutes=rng.randrange(180 * 24 * 60)),
+            "sla_breached": rng.random() < 0.15,
+        }
+
+
+async def benchmark(n: int = 100_000, repeat: int = 20, zone: str | None = None) -> dict:
+    """
+    Seeds n requests into a scratch database, then runs the dashboard `repeat`
+    times per path (cache bypassed). Reports round trips per call, p50/p95
+    latency and whether both paths return the same result.
+    """
+    async with scratch_db("analytics") as (db, counter):
+        collection = db["service_requests"]
+        batch = []
+        for doc in _seed_requests(n):
+            batch.append(doc)
+            if len(batch) == 10_000:
+                await collection.insert_many(batch, ordered=False)
+                batch = []
+        if batch:
+            await collection.insert_many(batch, ordered=False)
+
+        service = AnalyticsService(collection)
+        query = service._build_query(zone, None, None, None)
+        paths = {
+            "eight_calls": lambda: _legacy_dashboard(collection, query),
+            "facet": lambda: service._compute_dashboard(zone, None, None, None),
+        }
+
+        result = {"n": n, "repeat": repeat, "zone": zone}
+        outputs = {}
+        for name, run in paths.items():
+            await run()  # warm-up (plan cache, working set)
+            timings = []
+            counter.count = 0
+            for _ in range(repeat):
+                t0 = time.perf_counter()
+                outputs[name] = await run()
+                timings.append(time.perf_counter() - t0)
+            result[name] = {"round_trips": counter.count / repeat, **percentiles(timings)}
+
+    result["same_result"] = _normalized(outputs["eight_calls"]) == _normalized(outputs["facet"])
+    return result
+
+
+def _normalized(dashboard: dict) -> dict:
+    # group order is unspecified
+    return {**dashboard, "by_zone": sorted(dashboard["by_zone"], key=lambda z: str(z["zone"]))}
+
+
+if __name__ == "__main__":
+    # python -m app.services.analytics_service [n] [repeat] [zone]
+    import json
+    import sys
+
+    args = [int(a) for a in sys.argv[1:3]] + sys.argv[3:4]
+    print(json.dumps(asyncio.run(benchmark(*args)), indent=2))
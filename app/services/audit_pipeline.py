@@ -0,0 +1,282 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+from typing import Any, Dict, List
+
+from bson import json_util
+from pymongo.errors import BulkWriteError, PyMongoError
+
+from app.core.config import get_settings
+from app.db.mongo import audit_collection
+
+logger = logging.getLogger(__name__)
+
+# Audit events off the request path.
+#
+# AuditService.log_event enqueues into a bounded asyncio.Queue; one flusher task
+# writes them with insert_many every `batch_size` events or `flush_seconds`,
+# whichever comes first. When the queue is full, overflow="block" makes callers
+# wait for the flusher (back-pressure) and overflow="spill" appends the event to
+# the fallback file instead.
+#
+# Fallback: batches MongoDB rejects or cannot be reached for are appended to an
+# NDJSON file (extended JSON, _id included). The file is replayed on start and
+# after the next successful flush; already written events come back as
+# duplicate keys and are skipped, so a replay never double-inserts.
+
+_STOP = object()
+
+DUPLICATE_KEY = 11000
+
+
+class AuditPipeline:
+    def __init__(
+        self,
+        collection,
+        max_queue: int,
+        batch_size: int,
+        flush_seconds: float,
+        overflow: str,
+        fallback_path: str,
+    ):
+        self.collection = collection
+        self.max_queue = max_queue
+        self.batch_size = max(1, batch_size)
+        self.flush_seconds = flush_seconds
+        self.overflow = overflow
+        self.fallback_path = fallback_path
+
+        self._queue: asyncio.Queue | None = None
+        self._task: asyncio.Task | None = None
+        self._replay_task: asyncio.Task | None = None
+        self._file_lock = asyncio.Lock()
+        self._spilled = False
+
+        self._stats = {
+            "enqueued": 0,
+            "written": 0,
+            "batches": 0,
+            "overflowed": 0,
+            "spilled": 0,
+            "replayed": 0,
+            "lost": 0,
+        }
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    # -------------------------
+    async def start(self) -> None:
+        if self.running:
+            return
+        self._queue = asyncio.Queue(self.max_queue)
+        self._spilled = self._has_fallback()
+        self._task = asyncio.create_task(self._run())
+        if self._spilled:
+            self._schedule_replay()
+
+    async def stop(self) -> None:
+        """
+        Flushes everything queued so far, then stops the flusher.
+        """
+        if not self.running:
+            return
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+
+        # events enqueued behind the stop marker
+        rest = []
+        while not self._queue.empty():
+            event = self._queue.get_nowait()
+            if event is not _STOP:
+                rest.append(event)
+        if rest:
+            await self._write(rest)
+        if self._replay_task is not None:
+            await self._replay_task
+
+    async def enqueue(self, event: Dict[str, Any]) -> None:
+        self._stats["enqueued"] += 1
+        if self.overflow == "spill":
+            try:
+                self._queue.put_nowait(event)
+            except asyncio.QueueFull:
+                self._stats["overflowed"] += 1
+                await self._spill([event])
+            return
+        if self._queue.full():
+            self._stats["overflowed"] += 1
+        await self._queue.put(event)
+
+    def stats(self) -> dict:
+        return {
+            **self._stats,
+            "running": self.running,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "max_queue": self.max_queue,
+            "fallback_pending": self._has_fallback(),
+        }
+
+    # -------------------------
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            event = await self._queue.get()
+            if event is _STOP:
+                break
+            batch = [event]
+            deadline = loop.time() + self.flush_seconds
+
+            while len(batch) < self.batch_size:
+                try:
+                    event = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        event = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                if event is _STOP:
+                    stopping = True
+                    break
+                batch.append(event)
+
+            try:
+                await self._write(batch)
+            except Exception:
+                logger.exception("audit flush failed, %d events lost", len(batch))
+                self._stats["lost"] += len(batch)
+
+    async def _write(self, batch: List[Dict[str, Any]]) -> None:
+        # insert_many sets _id on the dicts first, so a spilled event keeps the
+        # _id it may already have been stored under
+        try:
+            await self.collection.insert_many(batch, ordered=False)
+            failed = []
+        except BulkWriteError as e:
+            failed = [
+                batch[err["index"]]
+                for err in e.details.get("writeErrors", [])
+                if err.get("code") != DUPLICATE_KEY
+            ]
+        except PyMongoError:
+            logger.warning("audit flush of %d events failed, spilling to %s", len(batch), self.fallback_path, exc_info=True)
+            await self._spill(batch)
+            return
+
+        self._stats["batches"] += 1
+        self._stats["written"] += len(batch) - len(failed)
+        if failed:
+            await self._spill(failed)
+        elif self._spilled:
+            self._schedule_replay()
+
+    # ------------------------- fallback file
+    def _schedule_replay(self) -> None:
+        # in the background, so a large backlog does not stall the flusher
+        if self._replay_task is None or self._replay_task.done():
+            self._replay_task = asyncio.create_task(self._replay_in_background())
+
+    async def _replay_in_background(self) -> None:
+        try:
+            await self.replay_fallback()
+        except Exception:
+            logger.exception("audit fallback replay failed")
+
+    def _has_fallback(self) -> bool:
+        return os.path.exists(self.fallback_path) or os.path.exists(self.fallback_path + ".replay")
+
+    def _append(self, lines: List[str]) -> None:
+        with open(self.fallback_path, "a", encoding="utf-8") as f:
+            f.writelines(lines)
+            f.flush()
+            os.fsync(f.fileno())
+
+    async def _spill(self, events: List[Dict[str, Any]]) -> None:
+        lines = [json_util.dumps(e) + "\n" for e in events]
+        async with self._file_lock:
+            try:
+                await asyncio.to_thread(self._append, lines)
+            except OSError:
+                logger.exception("audit fallback write failed, %d events lost", len(events))
+                self._stats["lost"] += len(events)
+                return
+        self._spilled = True
+        self._stats["spilled"] += len(events)
+
+    async def replay_fallback(self) -> int:
+        """
+        Re-inserts the fallback file in batches; keeps it when MongoDB is still unreachable.
+        """
+        replay_path = self.fallback_path + ".replay"
+        async with self._file_lock:
+            # a .replay left by an interrupted replay goes first; the lock only
+            # covers the rename, spills keep appending to fallback_path meanwhile
+            if not os.path.exists(replay_path):
+                if not os.path.exists(self.fallback_path):
+                    self._spilled = False
+                    return 0
+                os.replace(self.fallback_path, replay_path)
+
+        replayed = 0
+        try:
+            with open(replay_path, encoding="utf-8") as f:
+                batch = []
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        batch.append(json_util.loads(line))
+                    except ValueError:
+                        logger.error("unreadable audit fallback line skipped: %.200s", line)
+                        self._stats["lost"] += 1
+                    if len(batch) >= self.batch_size:
+                        replayed += await self._replay_batch(batch)
+                        batch = []
+                if batch:
+                    replayed += await self._replay_batch(batch)
+        except PyMongoError:
+            logger.warning("audit fallback replay interrupted, %s kept", replay_path)
+            return replayed
+
+        async with self._file_lock:
+            os.remove(replay_path)
+            self._spilled = os.path.exists(self.fallback_path)
+
+        if replayed:
+            logger.info("replayed %d audit events from %s", replayed, replay_path)
+        return replayed
+
+    async def _replay_batch(self, batch: List[Dict[str, Any]]) -> int:
+        try:
+            await self.collection.insert_many(batch, ordered=False)
+            written = len(batch)
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            rejected = [err for err in errors if err.get("code") != DUPLICATE_KEY]
+            if rejected:
+                # the document itself is refused; retrying it would never succeed
+                logger.error("%d audit fallback events rejected: %s", len(rejected), rejected[0].get("errmsg"))
+                self._stats["lost"] += len(rejected)
+            written = len(batch) - len(errors)
+        self._stats["replayed"] += written
+        return written
+
+
+_settings = get_settings()
+
+audit_pipeline = AuditPipeline(
+    audit_collection,
+    max_queue=_settings.audit_queue_max,
+    batch_size=_settings.audit_batch_size,
+    flush_seconds=_settings.audit_flush_ms / 1000,
+    overflow=_settings.audit_overflow,
+    fallback_path=_settings.audit_fallback_path,
+)
@@ -1,4 +1,5 @@
 from app.repositories.audit_repository import AuditRepository
+from app.services.audit_pipeline import audit_pipeline
 
 class AuditService:
     def __init__(self, repo: AuditRepository):
@@ -8,4 +9,16 @@ class AuditService:
         return await self.repo.list()
 
     async def log_event(self, event: dict):
-        await self.repo.create(event)
+        # queued and written in batches while the app runs; direct insert
+        # elsewhere (CLI, standalone workers)
+        if audit_pipeline.running:
+            await audit_pipeline.enqueue(event)
+        else:
+            await self.repo.create(event)
+
+    async def log_events(self, events: list[dict]):
+        if audit_pipeline.running:
+            for event in events:
+                await audit_pipeline.enqueue(event)
+        else:
+            await self.repo.create_many(events)
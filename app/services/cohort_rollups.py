@@ -0,0 +1,288 @@
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+
+from pymongo import UpdateOne
+
+from app.db.mongo import cohort_rollups_collection, requests_collection
+
+# Daily cohort rollups.
+# One document per (day, zone, category, sub_category):
+#   { _id: {day, zone, category, sub_category}, day, zone, category, sub_category,
+#     count, first_seen, last_seen }
+# Request creation $inc's the matching day; backfill() rebuilds everything from
+# service_requests. /admin/analytics/cohorts merges rollups instead of scanning requests.
+
+
+def _to_dt(v):
+    if isinstance(v, datetime):
+        return v.replace(tzinfo=None) if v.tzinfo else v
+    if isinstance(v, str):
+        try:
+            dt = datetime.fromisoformat(v.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+        return dt.astimezone(timezone.utc).replace(tzinfo=None) if dt.tzinfo else dt
+    return None
+
+
+def _first(*values):
+    for v in values:
+        if v is not None:
+            return v
+    return ""
+
+
+def _cohort_of(doc: dict | None):
+    """
+    (day, zone, category, sub_category, created_at) for a request,
+    using the same field fallbacks as the cohorts endpoint.
+    """
+    if not doc:
+        return None
+
+    created_at = _to_dt((doc.get("timestamps") or {}).get("created_at"))
+    if created_at is None:
+        return None
+
+    sla = doc.get("sla_policy") or {}
+    day = created_at.replace(hour=0, minute=0, second=0, microsecond=0)
+    zone = _first(doc.get("zone_name"), doc.get("zone"), sla.get("zone"))
+    category = _first(doc.get("category"), sla.get("category_code"))
+    sub = _first(doc.get("sub_category"), doc.get("sub_category_code"), sla.get("subcategory_code"))
+
+    return day, zone, category, sub, created_at
+
+
+def _rollup_update(cohort, inc: int) -> UpdateOne:
+    day, zone, category, sub, created_at = cohort
+    key = {"day": day, "zone": zone, "category": category, "sub_category": sub}
+
+    update = {"$inc": {"count": inc}}
+    if inc > 0:
+        update["$setOnInsert"] = key
+        update["$min"] = {"first_seen": created_at}
+        update["$max"] = {"last_seen": created_at}
+
+    # a decrement never creates a rollup: with no document to take it from,
+    # an upsert would leave one behind with a negative count
+    return UpdateOne({"_id": key}, update, upsert=inc > 0)
+
+
+async def apply_changes(changes: list[tuple[dict | None, dict | None]]) -> None:
+    """
+    changes: [(before, after), ...] exactly like dashboard_counters.apply_changes.
+    Only a change of day/zone/category/sub_category moves a request between rollups.
+    Removals only decrement the count; first_seen/last_seen are corrected by backfill().
+    """
+    ops = []
+    for before, after in changes:
+        old = _cohort_of(before)
+        new = _cohort_of(after)
+        if old and new and old[:4] == new[:4]:
+            continue
+        if old:
+            ops.append(_rollup_update(old, -1))
+        if new:
+            ops.append(_rollup_update(new, +1))
+
+    if ops:
+        await cohort_rollups_collection.bulk_write(ops, ordered=False)
+
+
+# request -> cohort fields, the aggregation form of _cohort_of()
+_COHORT_PROJECTION = {"$project": {
+    "_created_at": {"$toDate": "$timestamps.created_at"},
+    "_zone": {"$ifNull": ["$zone_name", {"$ifNull": ["$zone", {"$ifNull": ["$sla_policy.zone", ""]}]}]},
+    "_cat":  {"$ifNull": ["$category", {"$ifNull": ["$sla_policy.category_code", ""]}]},
+    "_sub":  {"$ifNull": ["$sub_category", {"$ifNull": ["$sub_category_code", {"$ifNull": ["$sla_policy.subcategory_code", ""]}]}]},
+}}
+
+
+async def backfill() -> dict:
+    """
+    Rebuild the whole rollup collection from service_requests with one aggregation ($out).
+    """
+    pipeline = [
+        _COHORT_PROJECTION,
+        {"$match": {"_created_at": {"$ne": None}}},
+        {"$group": {
+            "_id": {
+                "day": {"$dateFromString": {"dateString": {
+                    "$dateToString": {"format": "%Y-%m-%d", "date": "$_created_at"}
+                }}},
+                "zone": "$_zone",
+                "category": "$_cat",
+                "sub_category": "$_sub",
+            },
+            "count": {"$sum": 1},
+            "first_seen": {"$min": "$_created_at"},
+            "last_seen": {"$max": "$_created_at"},
+        }},
+        {"$addFields": {
+            "day": "$_id.day",
+            "zone": "$_id.zone",
+            "category": "$_id.category",
+            "sub_category": "$_id.sub_category",
+        }},
+        {"$out": cohort_rollups_collection.name},
+    ]
+
+    await requests_collection.aggregate(pipeline).to_list(length=None)
+    return {
+        "rollups": await cohort_rollups_collection.count_documents({}),
+        "backfilled_at": datetime.utcnow(),
+    }
+
+
+async def backfill_if_empty() -> dict | None:
+    """
+    Startup: build the rollups once on a fresh deployment (or after a wipe).
+    """
+    if await cohort_rollups_collection.estimated_document_count():
+        return None
+    return await backfill()
+
+
+def _window_start(days: int) -> datetime:
+    return (datetime.utcnow() - timedelta(days=days)).replace(
+        hour=0, minute=0, second=0, microsecond=0
+    )
+
+
+def _cohorts_stages(limit: int) -> list:
+    """
+    Stages shared by the rollup read and the on-the-fly scan, starting from
+    one document per cohort {_id: {zone, category, sub_category}, total_requests,
+    first_seen, last_seen}.
+    """
+    return [
+        {"$project": {
+            "_id": 0,
+            "zone": "$_id.zone",
+            "category": "$_id.category",
+            "sub_category": "$_id.sub_category",
+            "total_requests": 1,
+            "first_seen": 1,
+            "last_seen": 1,
+        }},
+        {"$facet": {
+            "summary": [
+                {"$group": {
+                    "_id": None,
+                    "total_cohorts": {"$sum": 1},
+                    "repeated_cohorts": {"$sum": {"$cond": [{"$gte": ["$total_requests", 2]}, 1, 0]}},
+                    "total_requests_in_window": {"$sum": "$total_requests"},
+                }},
+                {"$project": {"_id": 0, "total_cohorts": 1, "repeated_cohorts": 1, "total_requests_in_window": 1}},
+            ],
+            "cohorts": [
+                # full key as tie-break, so both sources return the same page
+                {"$sort": {"total_requests": -1, "last_seen": -1,
+                           "zone": 1, "category": 1, "sub_category": 1}},
+                {"$limit": limit},
+            ],
+        }},
+    ]
+
+
+async def query_cohorts(days: int, limit: int) -> dict:
+    """
+    Merge the daily rollups of the last `days` days into cohorts.
+    The window is day-aligned: it starts at 00:00 UTC of (now - days).
+    """
+    pipeline = [
+        {"$match": {"day": {"$gte": _window_start(days)}, "count": {"$gt": 0}}},
+        {"$group": {
+            "_id": {"zone": "$zone", "category": "$category", "sub_category": "$sub_category"},
+            "total_requests": {"$sum": "$count"},
+            "first_seen": {"$min": "$first_seen"},
+            "last_seen": {"$max": "$last_seen"},
+        }},
+        *_cohorts_stages(limit),
+    ]
+
+    rows = await cohort_rollups_collection.aggregate(pipeline).to_list(length=1)
+    return _cohorts_result(rows)
+
+
+async def scan_cohorts(days: int, limit: int) -> dict:
+    """
+    query_cohorts computed on the fly from service_requests (no rollups);
+    the reference the rollups are benchmarked and checked against.
+    """
+    pipeline = [
+        _COHORT_PROJECTION,
+        {"$match": {"_created_at": {"$gte": _window_start(days)}}},
+        {"$group": {
+            "_id": {"zone": "$_zone", "category": "$_cat", "sub_category": "$_sub"},
+            "total_requests": {"$sum": 1},
+            "first_seen": {"$min": "$_created_at"},
+            "last_seen": {"$max": "$_created_at"},
+        }},
+        *_cohorts_stages(limit),
+    ]
+
+    rows = await requests_collection.aggregate(pipeline).to_list(length=1)
+    return _cohorts_result(rows)
+
+
+def _cohorts_result(rows: list) -> dict:
+    facets = rows[0] if rows else {}
+
+    summary = (facets.get("summary") or [None])[0] or {
+        "total_cohorts": 0,
+        "repeated_cohorts": 0,
+        "total_requests_in_window": 0,
+    }
+
+    total = summary["total_cohorts"] or 0
+    repeated = summary["repeated_cohorts"] or 0
+    summary["repeat_rate"] = round((repeated / total) * 100, 2) if total else 0
+
+    cohorts = facets.get("cohorts") or []
+    for c in cohorts:
+        c["is_repeated"] = (c.get("total_requests") or 0) >= 2
+        c["cohort_key"] = f"{c.get('zone','')}|{c.get('category','')}|{c.get('sub_category','')}"
+
+    return {"summary": summary, "cohorts": cohorts}
+
+
+async def benchmark(days: int = 30, limit: int = 50, repeat: int = 5) -> dict:
+    """
+    `repeat` cohort queries computed on the fly from service_requests vs read
+    from the rollups (backfilled first, not timed). Reports timings and whether
+    both return the same summary and cohorts.
+    """
+    await backfill()
+
+    result = {"days": days, "limit": limit, "repeat": repeat}
+    outputs = {}
+    for name, query in (("on_the_fly", scan_cohorts), ("rollups", query_cohorts)):
+        timings = []
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            outputs[name] = await query(days, limit)
+            timings.append(time.perf_counter() - t0)
+        result[name] = {
+            "best_seconds": round(min(timings), 4),
+            "avg_seconds": round(sum(timings) / len(timings), 4),
+        }
+
+    scanned, rolled = outputs["on_the_fly"], outputs["rollups"]
+    result["speedup"] = (
+        round(result["on_the_fly"]["best_seconds"] / result["rollups"]["best_seconds"], 1)
+        if result["rollups"]["best_seconds"] else None
+    )
+    result["same_summary"] = scanned["summary"] == rolled["summary"]
+    result["same_cohorts"] = scanned["cohorts"] == rolled["cohorts"]
+    return result
+
+
+if __name__ == "__main__":
+    # python -m app.services.cohort_rollups [days] [limit] [repeat]
+    import json
+    import sys
+
+    args = [int(a) for a in sys.argv[1:4]]
+    print(json.dumps(asyncio.run(benchmark(*args)), indent=2, default=str))
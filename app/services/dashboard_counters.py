@@ -0,0 +1,170 @@
+from collections import Counter, defaultdict
+from datetime import datetime
+
+from pymongo import DeleteMany, UpdateOne
+
+from app.db.mongo import dashboard_counters_collection, requests_collection
+
+# Materialized dashboard counters.
+# One small document per (kind, key), e.g.
+#   { _id: "status:new", kind: "status", key: "new", count: 12 }
+# Kinds: total, status, priority, zone, team.
+# Write paths $inc the affected documents; reconcile() rebuilds them from service_requests.
+
+KINDS = ("total", "status", "priority", "zone", "team")
+
+
+def _counter_keys(doc: dict | None) -> list[tuple[str, str]]:
+    """
+    Which counters a single request contributes to (same rules as the dashboard).
+    """
+    if not doc:
+        return []
+
+    keys = [("total", "all"), ("status", doc.get("status") or "new")]
+
+    if doc.get("priority"):
+        keys.append(("priority", doc["priority"]))
+
+    if doc.get("zone_name"):
+        keys.append(("zone", doc["zone_name"]))
+
+    team_id = (doc.get("assignment") or {}).get("assigned_team_id") \
+        or (doc.get("sla_policy") or {}).get("team_id")
+    if team_id:
+        keys.append(("team", str(team_id)))
+
+    return keys
+
+
+def _counter_update(kind: str, key: str, inc: int) -> UpdateOne:
+    update = {"$inc": {"count": inc}, "$set": {"updated_at": datetime.utcnow()}}
+    if inc > 0:
+        update["$setOnInsert"] = {"kind": kind, "key": key}
+    # decrements only touch existing counters (no negative documents)
+    return UpdateOne({"_id": f"{kind}:{key}"}, update, upsert=inc > 0)
+
+
+async def apply_changes(changes: list[tuple[dict | None, dict | None]]) -> None:
+    """
+    changes: [(before, after), ...]
+      - create -> (None, doc)
+      - delete -> (doc, None)
+      - update -> (old_doc, new_doc)
+    Net deltas are folded first so a batch becomes one bulk_write.
+    """
+    deltas = Counter()
+    for before, after in changes:
+        for k in _counter_keys(before):
+            deltas[k] -= 1
+        for k in _counter_keys(after):
+            deltas[k] += 1
+
+    ops = [_counter_update(kind, key, inc) for (kind, key), inc in deltas.items() if inc]
+    if ops:
+        await dashboard_counters_collection.bulk_write(ops, ordered=False)
+
+
+async def apply_change(before: dict | None, after: dict | None) -> None:
+    await apply_changes([(before, after)])
+
+
+async def read_counters() -> dict:
+    """
+    Returns {kind: {key: count}} for every kind (missing kinds -> {}).
+    """
+    out = {kind: {} for kind in KINDS}
+    async for c in dashboard_counters_collection.find({}, {"kind": 1, "key": 1, "count": 1}):
+        kind = c.get("kind")
+        if kind in out and c.get("count"):
+            out[kind][c["key"]] = c["count"]
+    return out
+
+
+async def _read_counts() -> dict:
+    return {
+        (c["kind"], c["key"]): c.get("count") or 0
+        async for c in dashboard_counters_collection.find({}, {"kind": 1, "key": 1, "count": 1})
+    }
+
+
+async def reconcile() -> dict:
+    """
+    Recount every counter from service_requests (one aggregation) and correct
+    the materialized documents by the difference, as an $inc, so increments
+    from concurrent writes are kept rather than overwritten.
+
+    The counters are read before and after the aggregation; a counter that
+    moved in between had writes in flight that the aggregation may or may not
+    have seen, so it is left for the next pass. Counters that drop to zero are removed.
+    """
+    before = await _read_counts()
+
+    pipeline = [
+        {
+            "$project": {
+                "_id": 0,
+                "status": {"$ifNull": ["$status", "new"]},
+                "priority": 1,
+                "zone_name": 1,
+                "team_id": {
+                    "$ifNull": ["$assignment.assigned_team_id", "$sla_policy.team_id"]
+                },
+            }
+        },
+        {
+            "$facet": {
+                "total": [{"$group": {"_id": "all", "count": {"$sum": 1}}}],
+                "status": [{"$group": {"_id": "$status", "count": {"$sum": 1}}}],
+                "priority": [
+                    {"$match": {"priority": {"$nin": [None, ""]}}},
+                    {"$group": {"_id": "$priority", "count": {"$sum": 1}}},
+                ],
+                "zone": [
+                    {"$match": {"zone_name": {"$nin": [None, ""]}}},
+                    {"$group": {"_id": "$zone_name", "count": {"$sum": 1}}},
+                ],
+                "team": [
+                    {"$match": {"team_id": {"$nin": [None, ""]}}},
+                    {"$group": {"_id": "$team_id", "count": {"$sum": 1}}},
+                ],
+            }
+        },
+    ]
+
+    rows = await requests_collection.aggregate(pipeline).to_list(length=1)
+    facets = rows[0] if rows else {}
+    after = await _read_counts()
+
+    counts = defaultdict(int)
+    for kind in KINDS:
+        for row in facets.get(kind, []):
+            # team ids can be ObjectId or str -> merge on str()
+            counts[(kind, str(row["_id"]))] += row["count"]
+
+    now = datetime.utcnow()
+    ops = []
+    in_flux = 0
+    for kind, key in set(counts) | set(after):
+        current = after.get((kind, key), 0)
+        if before.get((kind, key), 0) != current:
+            in_flux += 1
+            continue
+        diff = counts.get((kind, key), 0) - current
+        if diff:
+            ops.append(UpdateOne(
+                {"_id": f"{kind}:{key}"},
+                {"$inc": {"count": diff}, "$set": {"kind": kind, "key": key, "updated_at": now}},
+                upsert=True,
+            ))
+    corrected = len(ops)
+    ops.append(DeleteMany({"count": 0}))
+
+    await dashboard_counters_collection.bulk_write(ops, ordered=False)
+
+    return {
+        "counters": len(counts),
+        "corrected": corrected,
+        "in_flux": in_flux,
+        "reconciled_at": now,
+    }
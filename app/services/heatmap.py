@@ -0,0 +1,478 @@
+import asyncio
+import logging
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone
+
+from pymongo import UpdateOne
+
+from app.core.cache import REQUESTS_TAG, cache_key, response_cache
+from app.utils.geo import QUADKEY_ZOOM, location_quadkey, quadkey_to_tile, tile_center
+
+logger = logging.getLogger(__name__)
+
+OPEN_STATUSES = ["new", "triaged", "assigned", "in_progress"]
+
+MS_PER_HOUR = 1000 * 60 * 60
+
+# per-cell "most common value" properties
+MODE_FIELDS = ("zone", "category", "sub_category")
+
+
+def open_requests_match(from_dt: datetime) -> dict:
+    return {
+        "status": {"$in": OPEN_STATUSES},
+        "location.type": "Point",
+        "location.coordinates": {"$type": "array", "$size": 2},
+        "location.coordinates.0": {"$type": "number"},
+        "location.coordinates.1": {"$type": "number"},
+        "timestamps.created_at": {"$gte": from_dt},
+    }
+
+
+def grid_cell_expr(grid_step: float) -> dict:
+    # integer cell index: floor(coord / step) -> center is index*step + step/2
+    return {
+        "x": {"$floor": {"$divide": [{"$arrayElemAt": ["$location.coordinates", 0]}, grid_step]}},
+        "y": {"$floor": {"$divide": [{"$arrayElemAt": ["$location.coordinates", 1]}, grid_step]}},
+    }
+
+
+def cell_aggregation_pipeline(match: dict, cell_expr, now: datetime) -> list:
+    """
+    Bin matching requests into cells entirely inside MongoDB.
+    Output: one row per cell
+      { _id: <cell>, stats: [{k: "_", n: count, age: avg_age_h},
+                             {k: "zone", v: most_common_zone}, ...] }
+    """
+    return [
+        {"$match": match},
+        {"$project": {
+            "_id": 0,
+            "cell": cell_expr,
+            "items": [
+                {
+                    "k": "_",
+                    "v": {"$literal": None},
+                    "age": {"$max": [
+                        0,
+                        {"$divide": [{"$subtract": [now, "$timestamps.created_at"]}, MS_PER_HOUR]},
+                    ]},
+                },
+                {"k": "zone", "v": {"$ifNull": ["$zone_name", "$zone"]}},
+                {"k": "category", "v": "$category"},
+                {"k": "sub_category", "v": "$sub_category"},
+            ],
+        }},
+        {"$unwind": "$items"},
+        {"$match": {"$or": [{"items.k": "_"}, {"items.v": {"$nin": [None, ""]}}]}},
+
+        # count per (cell, field, value); the "_" row carries the cell totals
+        {"$group": {
+            "_id": {"cell": "$cell", "k": "$items.k", "v": "$items.v"},
+            "n": {"$sum": 1},
+            "age": {"$avg": "$items.age"},
+        }},
+
+        # mode per (cell, field): highest count, ties broken by value
+        {"$sort": {"n": -1, "_id.v": 1}},
+        {"$group": {
+            "_id": {"cell": "$_id.cell", "k": "$_id.k"},
+            "v": {"$first": "$_id.v"},
+            "n": {"$first": "$n"},
+            "age": {"$first": "$age"},
+        }},
+
+        {"$group": {
+            "_id": "$_id.cell",
+            "stats": {"$push": {"k": "$_id.k", "v": "$v", "n": "$n", "age": "$age"}},
+        }},
+    ]
+
+
+async def aggregate_cells(db, match: dict, cell_expr, now: datetime) -> list[dict]:
+    """
+    Returns [{cell, count, age_hours, zone, category, sub_category}, ...]
+    """
+    pipeline = cell_aggregation_pipeline(match, cell_expr, now)
+
+    cells = []
+    async for row in db.service_requests.aggregate(pipeline, allowDiskUse=True):
+        out = {"cell": row["_id"], "count": 0, "age_hours": None}
+        for field in MODE_FIELDS:
+            out[field] = None
+        for s in row["stats"]:
+            if s["k"] == "_":
+                out["count"] = s["n"]
+                out["age_hours"] = s.get("age")
+            else:
+                out[s["k"]] = s.get("v")
+        cells.append(out)
+
+    return cells
+
+
+def cell_feature(lng: float, lat: float, c: dict) -> dict:
+    avg_age = c.get("age_hours")
+    return {
+        "type": "Feature",
+        "geometry": {"type": "Point", "coordinates": [lng, lat]},
+        "properties": {
+            "count": c["count"],
+            "weight": c["count"],                 # ✅ popup field
+            "age_hours": round(avg_age, 2) if avg_age is not None else None,  # ✅ popup field
+            "zone": c.get("zone"),
+            "category": c.get("category"),
+            "sub_category": c.get("sub_category"),
+        },
+    }
+
+
+def _cell_center(index: float, step: float) -> float:
+    return round(index * step + (step / 2.0), 6)
+
+
+async def build_open_requests_heatmap(db, window_days: int, grid_step: float, now: datetime) -> dict:
+    from_dt = now - timedelta(days=window_days)
+
+    cells = await aggregate_cells(
+        db, open_requests_match(from_dt), grid_cell_expr(grid_step), now
+    )
+    cells.sort(key=lambda c: (c["cell"]["x"], c["cell"]["y"]))
+
+    features = [
+        cell_feature(_cell_center(c["cell"]["x"], grid_step), _cell_center(c["cell"]["y"], grid_step), c)
+        for c in cells
+    ]
+
+    return {
+        "generated_at": now.isoformat(),
+        "window_days": window_days,
+        "grid_step": grid_step,
+        "total_cells": len(features),
+        "geojson": {"type": "FeatureCollection", "features": features},
+    }
+
+
+# =========================
+# Snapshots (geo_feeds)
+# =========================
+SNAPSHOT_TYPE = "open_requests_heatmap"
+
+SNAPSHOT_FIELDS = {
+    "_id": 0,
+    "generated_at": 1,
+    "window_days": 1,
+    "grid_step": 1,
+    "total_cells": 1,
+    "geojson": 1,
+    "created_at": 1,
+}
+
+# (window_days, grid_step) -> running background refresh
+_refreshing: dict[tuple, asyncio.Task] = {}
+
+
+async def _store_snapshot(db, window_days: int, grid_step: float) -> dict:
+    now = datetime.now(timezone.utc)
+    doc = await build_open_requests_heatmap(db, window_days, grid_step, now)
+
+    await db.geo_feeds.insert_one(
+        {
+            "type": SNAPSHOT_TYPE,
+            **doc,
+            "created_at": now,
+        }
+    )
+    return doc
+
+
+def _refresh_in_background(db, window_days: int, grid_step: float) -> None:
+    key = (window_days, grid_step)
+    if key in _refreshing:
+        return
+
+    async def run():
+        try:
+            await _store_snapshot(db, window_days, grid_step)
+        except Exception:
+            logger.exception("heatmap snapshot refresh failed for %s", key)
+        finally:
+            _refreshing.pop(key, None)
+
+    _refreshing[key] = asyncio.create_task(run())
+
+
+async def get_heatmap_snapshot(
+    db, window_days: int, grid_step: float, max_age_seconds: int, refresh: bool = False
+) -> dict:
+    """
+    Stale-while-revalidate over geo_feeds:
+      - fresh snapshot (younger than max_age_seconds) -> returned as is
+      - stale snapshot -> returned as is, a new one is built in the background
+      - no snapshot (or refresh=True) -> built now
+    """
+    latest = None
+    if not refresh:
+        latest = await db.geo_feeds.find_one(
+            {"type": SNAPSHOT_TYPE, "window_days": window_days, "grid_step": grid_step},
+            SNAPSHOT_FIELDS,
+            sort=[("created_at", -1)],
+        )
+
+    if latest is None:
+        return await _store_snapshot(db, window_days, grid_step)
+
+    created_at = latest.pop("created_at")
+    age = (datetime.utcnow() - created_at).total_seconds()
+    if age > max_age_seconds:
+        _refresh_in_background(db, window_days, grid_step)
+
+    return latest
+
+
+# =========================
+# Quadkey pyramid
+# =========================
+# Every request stores location_quadkey (zoom QUADKEY_ZOOM). One aggregate at that
+# zoom keeps per-cell counts and per-value counts, written to heatmap_quadkey_cells
+# (one document per (window_days, generation, quadkey)); any coarser zoom is derived
+# from it by grouping on quadkey prefixes. A geo_feeds document per generation
+# marks it complete, and goes stale like the grid snapshots above.
+QUADKEY_BASE_TYPE = "open_requests_quadkey_base"
+QUADKEY_CELLS = "heatmap_quadkey_cells"
+
+
+async def _store_quadkey_base(db, window_days: int) -> datetime:
+    """
+    Rebuilds the base cells for window_days inside MongoDB ($merge), then drops
+    all but the previous generation. Returns the new generation.
+    """
+    now = datetime.now(timezone.utc)
+    # naive UTC at millisecond precision: what comes back from MongoDB, so it
+    # matches the stored value exactly
+    generation = datetime.utcnow()
+    generation = generation.replace(microsecond=generation.microsecond // 1000 * 1000)
+
+    previous = await db.geo_feeds.find_one(
+        {"type": QUADKEY_BASE_TYPE, "window_days": window_days},
+        {"generation": 1},
+        sort=[("created_at", -1)],
+    )
+
+    match = {
+        **open_requests_match(now - timedelta(days=window_days)),
+        "location_quadkey": {"$type": "string"},
+    }
+    pipeline = [
+        {"$match": match},
+        {"$project": {
+            "_id": 0,
+            "qk": "$location_quadkey",
+            "items": [
+                {
+                    "k": "_",
+                    "v": {"$literal": None},
+                    "age": {"$max": [
+                        0,
+                        {"$divide": [{"$subtract": [now, "$timestamps.created_at"]}, MS_PER_HOUR]},
+                    ]},
+                },
+                {"k": "zone", "v": {"$ifNull": ["$zone_name", "$zone"]}},
+                {"k": "category", "v": "$category"},
+                {"k": "sub_category", "v": "$sub_category"},
+            ],
+        }},
+        {"$unwind": "$items"},
+        {"$match": {"$or": [{"items.k": "_"}, {"items.v": {"$nin": [None, ""]}}]}},
+        {"$group": {
+            "_id": {"qk": "$qk", "k": "$items.k", "v": "$items.v"},
+            "n": {"$sum": 1},
+            "age_sum": {"$sum": "$items.age"},
+        }},
+
+        # one document per quadkey: {count, age_sum, zone: [{v, n}], category: [...], ...}
+        {"$group": {
+            "_id": "$_id.qk",
+            "count": {"$sum": {"$cond": [{"$eq": ["$_id.k", "_"]}, "$n", 0]}},
+            "age_sum": {"$sum": {"$cond": [{"$eq": ["$_id.k", "_"]}, "$age_sum", 0]}},
+            "values": {"$push": {"k": "$_id.k", "v": "$_id.v", "n": "$n"}},
+        }},
+        {"$project": {
+            "_id": 0,
+            "window_days": {"$literal": window_days},
+            "generation": {"$literal": generation},
+            "quadkey": "$_id",
+            "count": 1,
+            "age_sum": 1,
+            **{
+                f: {"$map": {
+                    "input": {"$filter": {"input": "$values", "cond": {"$eq": ["$$this.k", f]}}},
+                    "in": {"v": "$$this.v", "n": "$$this.n"},
+                }}
+                for f in MODE_FIELDS
+            },
+        }},
+        {"$merge": {"into": QUADKEY_CELLS, "whenMatched": "replace", "whenNotMatched": "insert"}},
+    ]
+    await db.service_requests.aggregate(pipeline, allowDiskUse=True).to_list(length=None)
+
+    await db.geo_feeds.insert_one({
+        "type": QUADKEY_BASE_TYPE,
+        "window_days": window_days,
+        "generation": generation,
+        "created_at": now,
+    })
+
+    # keep the previous generation for readers that picked it just before this one landed
+    if previous:
+        older = {"window_days": window_days, "generation": {"$lt": previous["generation"]}}
+        await db[QUADKEY_CELLS].delete_many(older)
+        await db.geo_feeds.delete_many({"type": QUADKEY_BASE_TYPE, **older})
+
+    return generation
+
+
+def _refresh_quadkey_base_in_background(db, window_days: int) -> None:
+    key = (QUADKEY_BASE_TYPE, window_days)
+    if key in _refreshing:
+        return
+
+    async def run():
+        try:
+            await _store_quadkey_base(db, window_days)
+        except Exception:
+            logger.exception("quadkey base refresh failed for window_days=%s", window_days)
+        finally:
+            _refreshing.pop(key, None)
+
+    _refreshing[key] = asyncio.create_task(run())
+
+
+async def _quadkey_generation(db, window_days: int, max_age_seconds: int) -> datetime:
+    """
+    Same stale-while-revalidate rule as get_heatmap_snapshot.
+    """
+    latest = await db.geo_feeds.find_one(
+        {"type": QUADKEY_BASE_TYPE, "window_days": window_days},
+        {"generation": 1, "created_at": 1},
+        sort=[("created_at", -1)],
+    )
+    if latest is None:
+        return await _store_quadkey_base(db, window_days)
+
+    age = (datetime.utcnow() - latest["created_at"]).total_seconds()
+    if age > max_age_seconds:
+        _refresh_quadkey_base_in_background(db, window_days)
+
+    return latest["generation"]
+
+
+async def _load_quadkey_base(db, window_days: int, generation: datetime) -> dict:
+    """
+    { quadkey: {"count": n, "age_sum": h, "zone": {value: n}, "category": {...}, "sub_category": {...}} }
+    """
+    base = {}
+    cursor = db[QUADKEY_CELLS].find(
+        {"window_days": window_days, "generation": generation},
+        {"_id": 0, "quadkey": 1, "count": 1, "age_sum": 1, **{f: 1 for f in MODE_FIELDS}},
+    )
+    async for row in cursor:
+        base[row["quadkey"]] = {
+            "count": row["count"],
+            "age_sum": row["age_sum"],
+            **{f: {item["v"]: item["n"] for item in row.get(f) or []} for f in MODE_FIELDS},
+        }
+    return base
+
+
+def _mode(counts: Counter):
+    # highest count, ties broken by value (same rule as the grid heatmap);
+    # compared as str so mixed value types don't raise
+    if not counts:
+        return None
+    return min(counts.items(), key=lambda kv: (-kv[1], str(kv[0])))[0]
+
+
+def rollup_quadkeys(base: dict, z: int) -> dict:
+    """
+    Group base cells by their zoom-z prefix.
+    """
+    merged = defaultdict(lambda: {"count": 0, "age_sum": 0.0, **{f: Counter() for f in MODE_FIELDS}})
+    for qk, cell in base.items():
+        m = merged[qk[:z]]
+        m["count"] += cell["count"]
+        m["age_sum"] += cell["age_sum"]
+        for f in MODE_FIELDS:
+            m[f].update(cell[f])
+    return merged
+
+
+async def _quadkey_features(db, window_days: int, z: int, generation: datetime) -> list[dict]:
+    base = await _load_quadkey_base(db, window_days, generation)
+
+    features = []
+    for qk, m in sorted(rollup_quadkeys(base, z).items()):
+        if not m["count"]:
+            continue
+        lng, lat = tile_center(*quadkey_to_tile(qk))
+        feature = cell_feature(
+            round(lng, 6),
+            round(lat, 6),
+            {
+                "count": m["count"],
+                "age_hours": m["age_sum"] / m["count"],
+                **{f: _mode(m[f]) for f in MODE_FIELDS},
+            },
+        )
+        feature["properties"]["quadkey"] = qk
+        features.append(feature)
+    return features
+
+
+async def build_quadkey_heatmap(db, window_days: int, z: int, max_age_seconds: int) -> dict:
+    z = min(z, QUADKEY_ZOOM)
+    generation = await _quadkey_generation(db, window_days, max_age_seconds)
+
+    # a generation never changes once stored, so each zoom is cached until it is replaced
+    features = await response_cache.get_or_compute(
+        cache_key("heatmap.quadkey", window_days=window_days, z=z, generation=generation.isoformat()),
+        lambda: _quadkey_features(db, window_days, z, generation),
+        ttl=max_age_seconds,
+    )
+
+    return {
+        "generated_at": generation.isoformat(),
+        "window_days": window_days,
+        "zoom": z,
+        "total_cells": len(features),
+        "geojson": {"type": "FeatureCollection", "features": features},
+    }
+
+
+async def backfill_quadkeys(db, batch_size: int = 1000) -> dict:
+    """
+    Set location_quadkey on requests written before it existed.
+    """
+    updated = 0
+    ops = []
+    cursor = db.service_requests.find(
+        {"location_quadkey": {"$exists": False}, "location.coordinates": {"$type": "array"}},
+        {"location": 1},
+    )
+    async for r in cursor:
+        qk = location_quadkey(r.get("location"))
+        if qk is None:
+            continue
+        ops.append(UpdateOne({"_id": r["_id"]}, {"$set": {"location_quadkey": qk}}))
+        if len(ops) >= batch_size:
+            await db.service_requests.bulk_write(ops, ordered=False)
+            updated += len(ops)
+            ops = []
+
+    if ops:
+        await db.service_requests.bulk_write(ops, ordered=False)
+        updated += len(ops)
+
+    if updated:
+        response_cache.invalidate(REQUESTS_TAG)
+    return {"updated": updated}
@@ -0,0 +1,18 @@
+from app.core.cache import REQUESTS_TAG, response_cache
+from app.services import cohort_rollups, dashboard_counters
+
+
+# Called by every write path that creates, changes or removes a service request,
+# so derived read models stay in sync with service_requests.
+#   create -> request_changed(None, doc)
+#   delete -> request_changed(doc, None)
+#   update -> request_changed(old_doc, new_doc)
+
+async def requests_changed(changes: list[tuple[dict | None, dict | None]]) -> None:
+    await dashboard_counters.apply_changes(changes)
+    await cohort_rollups.apply_changes(changes)
+    response_cache.invalidate(REQUESTS_TAG)
+
+
+async def request_changed(before: dict | None, after: dict | None) -> None:
+    await requests_changed([(before, after)])
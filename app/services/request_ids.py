@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import asyncio
+import time
+import uuid
+from datetime import datetime
+
+from pymongo import ReturnDocument
+
+from app.core.config import get_settings
+from app.db.mongo import db, service_requests_collection
+
+# Request ID allocation: CST-{year}-{seq:04d}.
+#
+# The per-year counter document (counters: { _id: "service_requests_2026", seq })
+# is still the source of truth, but a process no longer $inc's it once per
+# request: it leases a block of `block_size` numbers with one $inc and hands
+# them out from memory. Numbers are unique across processes because every block
+# comes from an atomic $inc. As before, sequences can have gaps: numbers of a
+# failed insert, and the unused rest of a block when the process stops.
+
+counters_collection = db["counters"]
+
+
+def make_request_id(year: int, seq: int) -> str:
+    return f"CST-{year}-{seq:04d}"
+
+
+def parse_request_id(request_id) -> tuple[int, int] | None:
+    """
+    "CST-2026-0042" -> (2026, 42); None for anything else.
+    """
+    parts = str(request_id or "").split("-")
+    if len(parts) != 3 or parts[0] != "CST" or not parts[1].isdigit() or not parts[2].isdigit():
+        return None
+    return int(parts[1]), int(parts[2])
+
+
+async def _lease(key: str, n: int) -> tuple[int, int]:
+    """
+    Atomically reserves n numbers; returns the inclusive range (first, last).
+    """
+    doc = await counters_collection.find_one_and_update(
+        {"_id": key},
+        {"$inc": {"seq": n}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    last = int(doc["seq"])
+    return last - n + 1, last
+
+
+class RequestIdAllocator:
+    def __init__(self, block_size: int, key_prefix: str = "service_requests"):
+        self.block_size = max(1, block_size)
+        self.key_prefix = key_prefix
+        # year -> [next, last] of the current block
+        self._blocks: dict[int, list[int]] = {}
+        self._lock = asyncio.Lock()
+        self.leases = 0
+
+    def _counter_key(self, year: int) -> str:
+        return f"{self.key_prefix}_{year}"
+
+    async def next_seq(self, year: int) -> int:
+        block = self._blocks.get(year)
+        if block is None or block[0] > block[1]:
+            async with self._lock:
+                block = self._blocks.get(year)
+                if block is None or block[0] > block[1]:
+                    first, last = await _lease(self._counter_key(year), self.block_size)
+                    self.leases += 1
+                    block = self._blocks[year] = [first, last]
+        seq = block[0]
+        block[0] += 1
+        return seq
+
+    async def allocate_many(self, year: int, n: int) -> list[int]:
+        """
+        n numbers with a single counter increment (bulk submissions).
+        """
+        if n <= 0:
+            return []
+        first, last = await _lease(self._counter_key(year), n)
+        self.leases += 1
+        return list(range(first, last + 1))
+
+    async def resync(self, year: int) -> int:
+        """
+        Self-healing after a duplicate request_id: drop the local block and move
+        the counter past the highest stored seq (never backwards, other
+        processes may hold blocks beyond it). Returns that seq.
+        """
+        self._blocks.pop(year, None)
+
+        last = await service_requests_collection.find_one(
+            {"request_id": {"$regex": f"^CST-{year}-"}},
+            sort=[("request_id", -1)],
+        )
+        parsed = parse_request_id((last or {}).get("request_id"))
+        max_seq = parsed[1] if parsed else 0
+
+        await self.advance_to(year, max_seq)
+        return max_seq
+
+    async def advance_to(self, year: int, seq: int) -> None:
+        """
+        Make sure the counter is at least `seq` (e.g. after importing requests
+        that carry their own IDs).
+        """
+        await counters_collection.update_one(
+            {"_id": self._counter_key(year)}, {"$max": {"seq": seq}}, upsert=True
+        )
+
+
+request_ids = RequestIdAllocator(get_settings().request_id_block_size)
+
+
+async def benchmark(n: int = 500, block_size: int = 50) -> dict:
+    """
+    n concurrent allocations, one $inc per number vs block leasing, on scratch
+    counters (removed afterwards). Reports throughput, counter writes and duplicates.
+    """
+    prefix = f"bench_{uuid.uuid4().hex}"
+    single = RequestIdAllocator(1, key_prefix=f"{prefix}_single")
+    blocked = RequestIdAllocator(block_size, key_prefix=f"{prefix}_block")
+    year = datetime.utcnow().year
+
+    result = {"n": n, "block_size": block_size}
+    try:
+        for name, allocator in (("single", single), ("block", blocked)):
+            t0 = time.perf_counter()
+            seqs = await asyncio.gather(*(allocator.next_seq(year) for _ in range(n)))
+            elapsed = time.perf_counter() - t0
+            result[name] = {
+                "seconds": round(elapsed, 4),
+                "per_second": round(n / elapsed, 1) if elapsed else None,
+                "counter_writes": allocator.leases,
+                "duplicates": n - len(set(seqs)),
+            }
+    finally:
+        await counters_collection.delete_many({"_id": {"$regex": f"^{prefix}_"}})
+    return result
+
+
+if __name__ == "__main__":
+    # python -m app.services.request_ids [n] [block_size]
+    import json
+    import sys
+
+    args = [int(a) for a in sys.argv[1:3]]
+    print(json.dumps(asyncio.run(benchmark(*args)), indent=2))
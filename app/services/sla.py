@@ -0,0 +1,200 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# SLA state engine shared by the SLA monitor, the admin SLA endpoints
+# (_compute_sla_kpis) and the service request handlers (_compute_kpis).
+#
+# Elapsed time runs from triaged_at (created_at if never triaged) until
+# resolved_at / closed_at, or now for open requests.
+#   at_risk  from target_hours
+#   breached from breach_threshold_hours (defaults to target_hours)
+# compute_sla_states() works column-wise on a whole batch; the single-request
+# helpers are thin wrappers around it.
+
+BREACH_REASON = "breach_threshold_exceeded"
+
+
+def to_datetime(v) -> Optional[datetime]:
+    """
+    datetime or ISO string -> naive UTC datetime; anything else -> None.
+    """
+    if isinstance(v, datetime):
+        return v.astimezone(timezone.utc).replace(tzinfo=None) if v.tzinfo else v
+    if isinstance(v, str):
+        try:
+            dt = datetime.fromisoformat(v.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+        return dt.astimezone(timezone.utc).replace(tzinfo=None) if dt.tzinfo else dt
+    return None
+
+
+def _hours_between(a: datetime, b: datetime) -> float:
+    return max(0.0, (b - a).total_seconds() / 3600.0)
+
+
+def _minutes_between(a: datetime, b: datetime) -> int:
+    return int(max(0, (b - a).total_seconds() // 60))
+
+
+def _thresholds(sla_policy: Dict[str, Any]) -> Tuple[float, float]:
+    target_h = float(sla_policy.get("target_hours") or 0)
+    breach_h = float(sla_policy.get("breach_threshold_hours") or target_h)
+    return target_h, breach_h
+
+
+def sla_window(doc: Dict[str, Any], now: Optional[datetime] = None) -> Tuple[datetime, Optional[datetime]]:
+    """
+    (start_at, end_at) of a request's SLA clock; end_at is None while it is open.
+    """
+    ts = doc.get("timestamps") or {}
+    created_at = to_datetime(ts.get("created_at")) or to_datetime(doc.get("created_at")) or now or datetime.utcnow()
+    start_at = to_datetime(ts.get("triaged_at")) or created_at
+
+    status = str(doc.get("status") or "").lower()
+    end_at = None
+    if status == "resolved":
+        end_at = to_datetime(ts.get("resolved_at"))
+    elif status == "closed":
+        end_at = to_datetime(ts.get("closed_at")) or to_datetime(ts.get("updated_at"))
+
+    return start_at, end_at
+
+
+def compute_sla_states(
+    starts: Sequence[datetime],
+    policies: Sequence[Dict[str, Any]],
+    now: Optional[datetime] = None,
+    ends: Optional[Sequence[Optional[datetime]]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Batch form: one entry per (start, policy[, end]).
+    Returns [{elapsed_hours, target_hours, breach_hours, sla_state, breach_reason}, ...].
+    """
+    now = now or datetime.utcnow()
+    ends = ends or [None] * len(starts)
+
+    elapsed = [_hours_between(s, e or now) for s, e in zip(starts, ends)]
+    limits = [_thresholds(p) for p in policies]
+
+    out = []
+    for elapsed_h, (target_h, breach_h) in zip(elapsed, limits):
+        if breach_h > 0 and elapsed_h >= breach_h:
+            state, reason = "breached", BREACH_REASON
+        elif target_h > 0 and elapsed_h >= target_h:
+            state, reason = "at_risk", None
+        else:
+            state, reason = "on_track", None
+        out.append({
+            "elapsed_hours": elapsed_h,
+            "target_hours": target_h,
+            "breach_hours": breach_h,
+            "sla_state": state,
+            "breach_reason": reason,
+        })
+    return out
+
+
+def compute_sla_state(
+    start_at: datetime,
+    sla_policy: Dict[str, Any],
+    escalation_count: int = 0,
+    now: Optional[datetime] = None,
+    end_at: Optional[datetime] = None,
+) -> Dict[str, Any]:
+    state = compute_sla_states([start_at], [sla_policy], now, [end_at])[0]
+    state["escalation_count"] = escalation_count
+    return state
+
+
+def due_escalations(
+    sla_policy: Dict[str, Any], elapsed_hours: float, escalation_count: int
+) -> List[Tuple[int, Dict[str, Any]]]:
+    """
+    Escalation steps reached by elapsed_hours that were not fired yet,
+    as [(step_number, step), ...] with step numbers starting at 1.
+    """
+    steps = sorted(
+        sla_policy.get("escalation_steps") or [],
+        key=lambda step: step["after_hours"],
+    )
+    return [
+        (index, step)
+        for index, step in enumerate(steps, start=1)
+        if elapsed_hours >= step["after_hours"] and escalation_count < index
+    ]
+
+
+def next_sla_check_at(
+    start_at: datetime,
+    sla_policy: Dict[str, Any],
+    escalation_count: int = 0,
+    now: Optional[datetime] = None,
+) -> Optional[datetime]:
+    """
+    When the request's SLA state next changes: the earliest of its unfired
+    escalation steps, target_hours and breach_threshold_hours that is still
+    ahead of `now`. None when nothing is left to fire.
+    """
+    now = now or datetime.utcnow()
+    elapsed_h = _hours_between(start_at, now)
+
+    thresholds = [h for h in _thresholds(sla_policy) if h > 0]
+    steps = sorted(
+        sla_policy.get("escalation_steps") or [],
+        key=lambda step: step["after_hours"],
+    )
+    thresholds += [
+        float(step["after_hours"])
+        for index, step in enumerate(steps, start=1)
+        if escalation_count < index
+    ]
+
+    upcoming = [h for h in thresholds if h > elapsed_h]
+    if not upcoming:
+        return None
+    return start_at + timedelta(hours=min(upcoming))
+
+
+def compute_kpis(
+    doc: Dict[str, Any],
+    sla_policy: Optional[Dict[str, Any]] = None,
+    escalation_count: int = 0,
+    breach_reason: Optional[str] = None,
+    now: Optional[datetime] = None,
+) -> Dict[str, Any]:
+    """
+    computed_kpis for performance_logs (the fields the UI reads).
+    sla_policy defaults to the request's own; breach_reason overrides the computed one.
+    """
+    now = now or datetime.utcnow()
+    sla_policy = sla_policy if sla_policy is not None else (doc.get("sla_policy") or {})
+    start_at, end_at = sla_window(doc, now)
+    state = compute_sla_state(start_at, sla_policy, escalation_count, now=now, end_at=end_at)
+
+    return {
+        "resolution_minutes": _minutes_between(start_at, end_at) if end_at is not None else None,
+        "sla_target_hours": state["target_hours"],
+        "sla_state": state["sla_state"],
+        "escalation_count": escalation_count,
+        "breach_reason": breach_reason or state["breach_reason"],
+        "computed_at": now,
+    }
+
+
+def sla_deadlines(
+    doc: Dict[str, Any], sla_policy: Optional[Dict[str, Any]] = None
+) -> Dict[str, Optional[datetime]]:
+    """
+    Absolute deadlines stored on the request ({sla_target_at, sla_breach_at}),
+    so at-risk / breached become indexed range queries against now.
+    """
+    sla_policy = sla_policy if sla_policy is not None else (doc.get("sla_policy") or {})
+    start_at, _ = sla_window(doc)
+    target_h, breach_h = _thresholds(sla_policy)
+    return {
+        "sla_target_at": start_at + timedelta(hours=target_h) if target_h > 0 else None,
+        "sla_breach_at": start_at + timedelta(hours=breach_h) if breach_h > 0 else None,
+    }
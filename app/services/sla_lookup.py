@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import asyncio
+import time
+
+from app.core.config import get_settings
+from app.db.mongo import cache_versions_collection, sla_rules_collection, subcategory_collection
+
+# In-memory copy of the SLA rules table and the subcategory -> priority map used
+# by create_sla.
+#
+# Versioned invalidation: writers call invalidate(), which drops this process's
+# copy and $inc's a shared version document. Other processes compare that
+# version at most every `check_seconds` and reload when it moved, so they are
+# never more than check_seconds stale.
+
+VERSION_KEY = "sla_lookup"
+
+
+class SLALookupCache:
+    def __init__(self, check_seconds: float):
+        self.check_seconds = check_seconds
+        self._rules: dict | None = None
+        self._priorities: dict[str, str] | None = None
+        self._version: int | None = None
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+        self._loads = 0
+
+    async def _shared_version(self) -> int:
+        doc = await cache_versions_collection.find_one({"_id": VERSION_KEY})
+        return int((doc or {}).get("v", 0))
+
+    async def _load(self) -> None:
+        rules = await sla_rules_collection.find_one()
+
+        # same lookup as before (by name); a live subcategory wins over a deleted one
+        priorities: dict[str, str] = {}
+        live: set[str] = set()
+        async for s in subcategory_collection.find({}, {"name": 1, "priority": 1, "deleted": 1}):
+            name = s.get("name")
+            if name is None or name in live:
+                continue
+            if not s.get("deleted"):
+                live.add(name)
+                priorities[name] = s.get("priority")
+            else:
+                priorities.setdefault(name, s.get("priority"))
+
+        self._rules = rules
+        self._priorities = priorities
+        self._loads += 1
+
+    async def _ensure_fresh(self) -> None:
+        now = time.monotonic()
+        if self._priorities is not None and now - self._checked_at < self.check_seconds:
+            return
+
+        async with self._lock:
+            if self._priorities is not None and time.monotonic() - self._checked_at < self.check_seconds:
+                return
+            version = await self._shared_version()
+            if self._priorities is None or version != self._version:
+                await self._load()
+                self._version = version
+            self._checked_at = time.monotonic()
+
+    async def rules(self) -> dict | None:
+        await self._ensure_fresh()
+        return self._rules
+
+    async def priority_for(self, subcategory_name: str) -> str | None:
+        await self._ensure_fresh()
+        return self._priorities.get(subcategory_name)
+
+    async def invalidate(self) -> None:
+        self._rules = None
+        self._priorities = None
+        await cache_versions_collection.update_one(
+            {"_id": VERSION_KEY}, {"$inc": {"v": 1}}, upsert=True
+        )
+
+    def stats(self) -> dict:
+        return {
+            "version": self._version,
+            "loaded": self._priorities is not None,
+            "subcategories": len(self._priorities or {}),
+            "loads": self._loads,
+        }
+
+
+sla_lookup = SLALookupCache(get_settings().sla_lookup_check_seconds)
@@ -0,0 +1,263 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+import httpx
+
+from app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+
+class TileFetchError(Exception):
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+class OSMTileCache:
+    """
+    Disk cache in front of the OSM tile server.
+
+    Layout: <cache_dir>/<z>/<x>/<y>.png + <y>.json (etag, last_modified, fetched_at).
+    - fresh tiles (younger than fresh_seconds) are served from disk
+    - stale tiles are revalidated with If-None-Match / If-Modified-Since (304 -> reuse)
+    - if upstream fails, a stale tile is still served
+    - total size is bounded; least recently used tiles are evicted first
+    - one pooled httpx client, at most max_concurrency requests upstream at a time
+    """
+
+    def __init__(
+        self,
+        cache_dir: str,
+        max_bytes: int,
+        fresh_seconds: int,
+        upstream_url: str,
+        max_concurrency: int,
+        timeout_seconds: float,
+        user_agent: str,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.fresh_seconds = fresh_seconds
+        self.upstream_url = upstream_url
+        self.timeout_seconds = timeout_seconds
+        self.user_agent = user_agent
+        self.max_concurrency = max_concurrency
+        # None -> real network; tests pass an httpx.MockTransport
+        self.transport = transport
+
+        self._client: httpx.AsyncClient | None = None
+        self._upstream = asyncio.Semaphore(max_concurrency)
+        self._inflight: dict[tuple, asyncio.Task] = {}
+
+        # (z, x, y) -> bytes on disk, oldest access first
+        self._lru: OrderedDict[tuple, int] = OrderedDict()
+        self._bytes = 0
+
+        self._stats = {"hits": 0, "revalidated": 0, "fetched": 0, "stale_served": 0, "evictions": 0}
+
+    # -------------------------
+    # lifecycle
+    # -------------------------
+    async def start(self) -> None:
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        await asyncio.to_thread(self._load_index)
+        self._client = httpx.AsyncClient(
+            timeout=self.timeout_seconds,
+            headers={"User-Agent": self.user_agent},
+            transport=self.transport,
+            limits=httpx.Limits(
+                max_connections=self.max_concurrency,
+                max_keepalive_connections=self.max_concurrency,
+            ),
+        )
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _load_index(self) -> None:
+        entries = []
+        for png in self.cache_dir.glob("*/*/*.png"):
+            try:
+                st = png.stat()
+                key = (int(png.parent.parent.name), int(png.parent.name), int(png.stem))
+            except (OSError, ValueError):
+                continue
+            entries.append((st.st_atime, key, st.st_size))
+
+        self._lru.clear()
+        self._bytes = 0
+        for _, key, size in sorted(entries):
+            self._lru[key] = size
+            self._bytes += size
+
+    # -------------------------
+    # disk
+    # -------------------------
+    def _paths(self, key: tuple) -> tuple[Path, Path]:
+        z, x, y = key
+        base = self.cache_dir / str(z) / str(x)
+        return base / f"{y}.png", base / f"{y}.json"
+
+    def _read(self, key: tuple) -> tuple[bytes, dict] | None:
+        png, meta = self._paths(key)
+        try:
+            return png.read_bytes(), json.loads(meta.read_text())
+        except (OSError, ValueError):
+            return None
+
+    def _write(self, key: tuple, content: bytes, meta: dict) -> None:
+        png, meta_path = self._paths(key)
+        png.parent.mkdir(parents=True, exist_ok=True)
+        tmp = png.with_suffix(".tmp")
+        tmp.write_bytes(content)
+        os.replace(tmp, png)
+        meta_path.write_text(json.dumps(meta))
+
+    def _write_meta(self, key: tuple, meta: dict) -> None:
+        self._paths(key)[1].write_text(json.dumps(meta))
+
+    def _remove(self, key: tuple) -> None:
+        for p in self._paths(key):
+            try:
+                p.unlink()
+            except FileNotFoundError:
+                pass
+
+    def _touch(self, key: tuple, size: int | None = None) -> None:
+        if size is not None:
+            self._bytes += size - self._lru.get(key, 0)
+            self._lru[key] = size
+        if key in self._lru:
+            self._lru.move_to_end(key)
+
+    async def _evict(self) -> None:
+        victims = []
+        while self._bytes > self.max_bytes and len(self._lru) > 1:
+            key, size = self._lru.popitem(last=False)
+            self._bytes -= size
+            victims.append(key)
+        if victims:
+            self._stats["evictions"] += len(victims)
+            await asyncio.to_thread(lambda: [self._remove(k) for k in victims])
+
+    # -------------------------
+    # upstream
+    # -------------------------
+    async def _fetch_upstream(self, key: tuple, cached_meta: dict | None) -> httpx.Response:
+        if self._client is None:
+            raise TileFetchError(503, "Tile proxy not started")
+
+        z, x, y = key
+        headers = {}
+        if cached_meta:
+            if cached_meta.get("etag"):
+                headers["If-None-Match"] = cached_meta["etag"]
+            if cached_meta.get("last_modified"):
+                headers["If-Modified-Since"] = cached_meta["last_modified"]
+
+        async with self._upstream:
+            return await self._client.get(self.upstream_url.format(z=z, x=x, y=y), headers=headers)
+
+    async def _load(self, key: tuple) -> tuple[bytes, dict]:
+        cached = await asyncio.to_thread(self._read, key)
+        if cached and time.time() - cached[1].get("fetched_at", 0) < self.fresh_seconds:
+            self._stats["hits"] += 1
+            self._touch(key)
+            return cached
+
+        meta = cached[1] if cached else None
+        try:
+            r = await self._fetch_upstream(key, meta)
+        except httpx.HTTPError:
+            if cached:
+                self._stats["stale_served"] += 1
+                return cached
+            raise TileFetchError(502, "Tile proxy error")
+
+        if r.status_code == 304 and cached:
+            self._stats["revalidated"] += 1
+            meta = {**cached[1], "fetched_at": time.time()}
+            await asyncio.to_thread(self._write_meta, key, meta)
+            self._touch(key)
+            return cached[0], meta
+
+        if r.status_code != 200:
+            if cached:
+                self._stats["stale_served"] += 1
+                return cached
+            raise TileFetchError(r.status_code, "Tile fetch failed")
+
+        self._stats["fetched"] += 1
+        meta = {
+            "etag": r.headers.get("ETag"),
+            "last_modified": r.headers.get("Last-Modified"),
+            "fetched_at": time.time(),
+        }
+        await asyncio.to_thread(self._write, key, r.content, meta)
+        self._touch(key, len(r.content))
+        await self._evict()
+        return r.content, meta
+
+    # -------------------------
+    # public
+    # -------------------------
+    async def get_tile(self, z: int, x: int, y: int) -> tuple[bytes, dict]:
+        """
+        Returns (png_bytes, meta). Concurrent requests for the same tile share one load.
+        """
+        key = (z, x, y)
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._load(key))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    def is_cached(self, z: int, x: int, y: int) -> bool:
+        return (z, x, y) in self._lru
+
+    def count_cached(self, ranges: dict[int, tuple[int, int, int, int]]) -> dict[int, int]:
+        """
+        Cached tiles per zoom inside {z: (x_min, y_min, x_max, y_max)}.
+        One pass over the index: cost follows the cache size, not the area asked for.
+        """
+        counts = {z: 0 for z in ranges}
+        for z, x, y in self._lru:
+            r = ranges.get(z)
+            if r is not None and r[0] <= x <= r[2] and r[1] <= y <= r[3]:
+                counts[z] += 1
+        return counts
+
+    def stats(self) -> dict:
+        return {
+            **self._stats,
+            "tiles": len(self._lru),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "inflight": len(self._inflight),
+        }
+
+
+_settings = get_settings()
+
+tile_cache = OSMTileCache(
+    cache_dir=_settings.tile_cache_dir,
+    max_bytes=_settings.tile_cache_max_bytes,
+    fresh_seconds=_settings.tile_cache_fresh_seconds,
+    upstream_url=_settings.tile_upstream_url,
+    max_concurrency=_settings.tile_upstream_concurrency,
+    timeout_seconds=_settings.tile_upstream_timeout_seconds,
+    user_agent=_settings.tile_user_agent,
+)
@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+import contextlib
+import uuid
+from typing import AsyncIterator, List, Tuple
+
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from pymongo import monitoring
+
+# Helpers for the `python -m ...` benchmarks: a throwaway database on the
+# configured server, on its own client whose commands are counted, so a
+# benchmark can report round trips next to latency without touching real data.
+
+
+class CommandCounter(monitoring.CommandListener):
+    """
+    Counts the commands (round trips, getMore included) sent by one client.
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        self.count += 1
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        pass
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        pass
+
+
+@contextlib.asynccontextmanager
+async def scratch_db(name: str) -> AsyncIterator[Tuple[AsyncIOMotorDatabase, CommandCounter]]:
+    """
+    Yields (database, counter) for a database named {MONGO_DB}_bench_{name}_{random},
+    dropped on exit.
+    """
+    # not at module level: app.jobs.sla_benchmark imports this module before
+    # it points MONGO_DB at its scratch database
+    from app.db.mongo import MONGO_DB, MONGO_URI
+
+    counter = CommandCounter()
+    client = AsyncIOMotorClient(MONGO_URI, event_listeners=[counter])
+    db_name = f"{MONGO_DB}_bench_{name}_{uuid.uuid4().hex[:8]}"
+    try:
+        yield client[db_name], counter
+    finally:
+        await client.drop_database(db_name)
+        client.close()
+
+
+def percentiles(timings: List[float]) -> dict:
+    """
+    {p50, p95, max} in milliseconds (nearest-rank).
+    """
+    ordered = sorted(timings)
+
+    def rank(p: float) -> float:
+        index = max(0, min(len(ordered) - 1, round(p * len(ordered)) - 1))
+        return round(ordered[index] * 1000, 2)
+
+    return {"p50_ms": rank(0.50), "p95_ms": rank(0.95), "max_ms": rank(1.0)}
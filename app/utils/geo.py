@@ -0,0 +1,85 @@
+import math
+
+# Web-mercator tile pyramid helpers (same x/y/z scheme as the OSM tiles we proxy).
+# A quadkey is the tile path from zoom 1 down to zoom z, one digit per level,
+# so the tile of a point at any coarser zoom is just a prefix of its quadkey.
+
+QUADKEY_ZOOM = 18  # zoom stored on each request (~150m tiles at the equator)
+
+MAX_LAT = 85.05112878
+
+
+def lnglat_to_tile(lng: float, lat: float, z: int) -> tuple[int, int]:
+    lat = max(min(lat, MAX_LAT), -MAX_LAT)
+    n = 2 ** z
+    x = int((lng + 180.0) / 360.0 * n)
+    lat_rad = math.radians(lat)
+    y = int((1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def tile_to_quadkey(x: int, y: int, z: int) -> str:
+    digits = []
+    for i in range(z, 0, -1):
+        digit = 0
+        mask = 1 << (i - 1)
+        if x & mask:
+            digit += 1
+        if y & mask:
+            digit += 2
+        digits.append(str(digit))
+    return "".join(digits)
+
+
+def quadkey_to_tile(quadkey: str) -> tuple[int, int, int]:
+    x = y = 0
+    z = len(quadkey)
+    for i in range(z, 0, -1):
+        mask = 1 << (i - 1)
+        digit = quadkey[z - i]
+        if digit in "13":
+            x |= mask
+        if digit in "23":
+            y |= mask
+    return x, y, z
+
+
+def lnglat_to_quadkey(lng: float, lat: float, z: int = QUADKEY_ZOOM) -> str:
+    x, y = lnglat_to_tile(lng, lat, z)
+    return tile_to_quadkey(x, y, z)
+
+
+def _tile_lng(x: float, z: int) -> float:
+    return x / (2 ** z) * 360.0 - 180.0
+
+
+def _tile_lat(y: float, z: int) -> float:
+    n = math.pi - 2.0 * math.pi * y / (2 ** z)
+    return math.degrees(math.atan(math.sinh(n)))
+
+
+def tile_bounds(x: int, y: int, z: int) -> tuple[float, float, float, float]:
+    """
+    (west, south, east, north) in degrees.
+    """
+    return _tile_lng(x, z), _tile_lat(y + 1, z), _tile_lng(x + 1, z), _tile_lat(y, z)
+
+
+def tile_center(x: int, y: int, z: int) -> tuple[float, float]:
+    """
+    (lng, lat) of the tile center.
+    """
+    return _tile_lng(x + 0.5, z), _tile_lat(y + 0.5, z)
+
+
+def location_quadkey(location: dict | None) -> str | None:
+    """
+    Quadkey for a GeoJSON Point stored on a request, None if it has no usable coordinates.
+    """
+    coords = (location or {}).get("coordinates") or []
+    if len(coords) != 2:
+        return None
+    lng, lat = coords
+    if not isinstance(lng, (int, float)) or not isinstance(lat, (int, float)):
+        return None
+    return lnglat_to_quadkey(lng, lat)
@@ -0,0 +1,115 @@
+import math
+import struct
+
+# Minimal Mapbox Vector Tile (v2) encoder for point layers.
+# Spec: https://github.com/mapbox/vector-tile-spec/tree/master/2.1
+# Only what the request tiles need: POINT features with string/number/bool properties.
+
+EXTENT = 4096
+
+_VARINT = 0
+_FIXED64 = 1
+_LENGTH = 2
+
+_GEOM_POINT = 1
+_CMD_MOVE_TO = 1
+
+
+def _varint(n: int) -> bytes:
+    out = bytearray()
+    while True:
+        b = n & 0x7F
+        n >>= 7
+        if n:
+            out.append(b | 0x80)
+        else:
+            out.append(b)
+            return bytes(out)
+
+
+def _zigzag(n: int) -> int:
+    return (n << 1) ^ (n >> 63)
+
+
+def _key(field: int, wire_type: int) -> bytes:
+    return _varint((field << 3) | wire_type)
+
+
+def _len_field(field: int, payload: bytes) -> bytes:
+    return _key(field, _LENGTH) + _varint(len(payload)) + payload
+
+
+def _uint_field(field: int, n: int) -> bytes:
+    return _key(field, _VARINT) + _varint(n)
+
+
+def _packed(field: int, values: list[int]) -> bytes:
+    return _len_field(field, b"".join(_varint(v) for v in values))
+
+
+def _value(v) -> bytes:
+    if isinstance(v, bool):
+        return _uint_field(7, int(v))
+    if isinstance(v, int):
+        return _uint_field(6, _zigzag(v) & 0xFFFFFFFFFFFFFFFF)  # sint_value
+    if isinstance(v, float):
+        return _key(3, _FIXED64) + struct.pack("<d", v)      # double_value
+    return _len_field(1, str(v).encode("utf-8"))              # string_value
+
+
+def lnglat_to_tile_pixel(lng: float, lat: float, x: int, y: int, z: int, extent: int = EXTENT) -> tuple[int, int]:
+    """
+    Position of (lng, lat) inside tile x/y/z in tile units (0..extent).
+    """
+    n = 2 ** z
+    lat_rad = math.radians(max(min(lat, 85.05112878), -85.05112878))
+    fx = (lng + 180.0) / 360.0 * n - x
+    fy = (1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * n - y
+    return int(round(fx * extent)), int(round(fy * extent))
+
+
+def encode_point_layer(name: str, features: list[dict], extent: int = EXTENT) -> bytes:
+    """
+    features: [{"id": int | None, "x": px, "y": px, "properties": {...}}, ...]
+    (x, y already in tile units). Properties with None values are skipped.
+    Returns the layer message wrapped as a Tile (ready to concatenate with other layers).
+    """
+    keys: dict[str, int] = {}
+    values: dict[tuple, int] = {}
+
+    encoded_features = []
+    for f in features:
+        tags = []
+        for k, v in (f.get("properties") or {}).items():
+            if v is None:
+                continue
+            ki = keys.setdefault(k, len(keys))
+            vi = values.setdefault((type(v).__name__, v), len(values))
+            tags += [ki, vi]
+
+        geometry = [
+            (_CMD_MOVE_TO & 0x7) | (1 << 3),
+            _zigzag(int(f["x"])),
+            _zigzag(int(f["y"])),
+        ]
+
+        msg = b""
+        if f.get("id") is not None:
+            msg += _uint_field(1, int(f["id"]))
+        if tags:
+            msg += _packed(2, tags)
+        msg += _uint_field(3, _GEOM_POINT)
+        msg += _packed(4, geometry)
+        encoded_features.append(msg)
+
+    layer = _uint_field(15, 2)
+    layer += _len_field(1, name.encode("utf-8"))
+    for msg in encoded_features:
+        layer += _len_field(2, msg)
+    for k in keys:
+        layer += _len_field(3, k.encode("utf-8"))
+    for (_, v) in values:
+        layer += _len_field(4, _value(v))
+    layer += _uint_field(5, extent)
+
+    return _len_field(3, layer)
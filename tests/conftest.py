@@ -0,0 +1,31 @@
+import os
+import uuid
+
+import pytest
+
+# app.db.mongo reads MONGO_URI at import time. Motor connects lazily, so tests
+# that never touch the database run without a server. Tests using the
+# `mongo_db` fixture run against MONGO_TEST_URI in a throwaway database and are
+# skipped when it is not set.
+MONGO_TEST_URI = os.getenv("MONGO_TEST_URI")
+MONGO_TEST_DB = f"cst_test_{uuid.uuid4().hex[:8]}"
+
+if MONGO_TEST_URI:
+    os.environ["MONGO_URI"] = MONGO_TEST_URI
+    os.environ["MONGO_DB"] = MONGO_TEST_DB
+else:
+    os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+
+
+@pytest.fixture
+def mongo_db():
+    if not MONGO_TEST_URI:
+        pytest.skip("MONGO_TEST_URI not set")
+
+    from pymongo import MongoClient
+
+    client = MongoClient(MONGO_TEST_URI)
+    client.drop_database(MONGO_TEST_DB)
+    yield client[MONGO_TEST_DB]
+    client.drop_database(MONGO_TEST_DB)
+    client.close()
@@ -0,0 +1,226 @@
+"""
+GET /admin/dashboard: the aggregation-based build against the original
+Python implementation (load every request, walk the list per widget) on a
+seeded dataset.
+
+Intended differences:
+- category explicitly null: the original grouped it under a None category,
+  the pipeline puts it under "Uncategorized" together with a missing category.
+- list order of categories, priorities and zones is not specified; compared as mappings.
+
+The "sla" widget keeps the original population (every request with a truthy
+sla_policy, open or closed, measured from created_at). "open_sla" is new: open
+requests by their stored sla_target_at / sla_breach_at (measured from triage),
+the same bounds as /admin/requests/sla/at-risk; asserted separately.
+
+Both checks share one event loop (one asyncio.run): the Motor client binds to
+the loop it is first used on.
+"""
+import asyncio
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from app.services.sla import sla_deadlines
+
+OPEN_STATUSES = {"new", "triaged", "assigned", "in_progress"}
+STATUSES = ["new", "triaged", "assigned", "in_progress", "resolved", "closed"]
+PRIORITIES = ["P1", "P2", "P3", None, ""]
+CATEGORIES = [("Roads", "Pothole"), ("Roads", "Streetlight"), ("Roads", None), ("Roads", ""),
+              ("Water", "Leak"), ("Water", None), (None, "Leak"), ("<missing>", None)]
+ZONES = ["North", "South", "East", None, ""]
+
+
+def seed_requests(now: datetime, team_ids: list) -> list[dict]:
+    docs = []
+    for i in range(90):
+        created_at = (now - timedelta(days=i % 12, hours=2)).replace(microsecond=0)
+        triaged_at = created_at + timedelta(minutes=5 * (i % 7)) if i % 3 else None
+        category, sub = CATEGORIES[i % len(CATEGORIES)]
+
+        doc = {
+            "request_id": f"CST-2026-{i:04d}",
+            "status": STATUSES[i % len(STATUSES)],
+            "priority": PRIORITIES[i % len(PRIORITIES)],
+            "sub_category": sub,
+            "zone_name": ZONES[i % len(ZONES)],
+            "timestamps": {"created_at": created_at, "triaged_at": triaged_at},
+            "assignment": {"assigned_team_id": None},
+        }
+        if category != "<missing>":
+            doc["category"] = category
+
+        team = team_ids[i % len(team_ids)]
+        if i % 4 == 0:
+            doc["assignment"]["assigned_team_id"] = team
+        elif i % 4 == 1:
+            doc["assignment"]["assigned_team_id"] = str(team)
+
+        if i % 5 == 0:
+            doc["sla_policy"] = {}
+        elif i % 5 != 1:
+            policy = {"target_hours": 4 + 20 * (i % 3), "breach_threshold_hours": 8 + 40 * (i % 3)}
+            if i % 4 == 2:
+                policy["team_id"] = team
+            doc["sla_policy"] = policy
+            doc.update(sla_deadlines(doc, policy))
+        docs.append(doc)
+    return docs
+
+
+def original_dashboard(requests: list[dict], now: datetime, teams: list[dict]) -> dict:
+    """
+    The request-derived widgets as admin_dashboard computed them before the
+    aggregation rewrite.
+    """
+    total_requests = len(requests)
+    open_requests = sum(1 for r in requests if r.get("status") in OPEN_STATUSES)
+    closed_requests = sum(1 for r in requests if r.get("status") == "closed")
+
+    response_times = []
+    for r in requests:
+        ts = r.get("timestamps", {})
+        if ts.get("created_at") and ts.get("triaged_at"):
+            response_times.append((ts["triaged_at"] - ts["created_at"]).total_seconds() / 60)
+
+    status_breakdown = {s: 0 for s in STATUSES}
+    for r in requests:
+        status = r.get("status", "new")
+        if status in status_breakdown:
+            status_breakdown[status] += 1
+
+    priority_distribution = defaultdict(int)
+    for r in requests:
+        if r.get("priority"):
+            priority_distribution[r["priority"]] += 1
+
+    categories = {}
+    for r in requests:
+        cat = r.get("category", "Uncategorized")
+        c = categories.setdefault(cat, {"total": 0, "subs": defaultdict(int)})
+        c["total"] += 1
+        if r.get("sub_category"):
+            c["subs"][r["sub_category"]] += 1
+
+    trend_map = defaultdict(int)
+    for r in requests:
+        created = r.get("timestamps", {}).get("created_at")
+        if created and created >= now - timedelta(days=7):
+            trend_map[created.date().isoformat()] += 1
+
+    sla_ok = sla_at_risk = sla_breached = 0
+    for r in requests:
+        sla = r.get("sla_policy")
+        created = r.get("timestamps", {}).get("created_at")
+        if not sla or not created:
+            continue
+        elapsed_hours = (now - created).total_seconds() / 3600
+        if elapsed_hours >= sla["breach_threshold_hours"]:
+            sla_breached += 1
+        elif elapsed_hours >= sla["target_hours"]:
+            sla_at_risk += 1
+        else:
+            sla_ok += 1
+    total_sla = sla_ok + sla_at_risk + sla_breached
+
+    team_requests = defaultdict(int)
+    for r in requests:
+        team_id = r.get("assignment", {}).get("assigned_team_id") or r.get("sla_policy", {}).get("team_id")
+        if team_id:
+            team_requests[str(team_id)] += 1
+
+    zones = defaultdict(int)
+    for r in requests:
+        if r.get("zone_name"):
+            zones[r["zone_name"]] += 1
+
+    return {
+        "totals": {
+            "total_requests": total_requests,
+            "open_requests": open_requests,
+            "closed_requests": closed_requests,
+            "closed_rate": round((closed_requests / total_requests) * 100, 2) if total_requests else 0,
+            "avg_response_time_minutes": (
+                round(sum(response_times) / len(response_times), 1) if response_times else None
+            ),
+        },
+        "sla": {
+            "ok": sla_ok,
+            "at_risk": sla_at_risk,
+            "breached": sla_breached,
+            "compliance_percent": round((sla_ok / total_sla) * 100, 2) if total_sla else 0,
+        },
+        "status_breakdown": status_breakdown,
+        "priority_distribution": dict(priority_distribution),
+        "categories": {k: (v["total"], dict(v["subs"])) for k, v in categories.items()},
+        "trend": [{"date": d, "count": c} for d, c in sorted(trend_map.items())],
+        "teams": {str(t["_id"]): team_requests.get(str(t["_id"]), 0) for t in teams},
+        "zones": dict(zones),
+    }
+
+
+def comparable(result: dict) -> dict:
+    return {
+        "totals": result["totals"],
+        "sla": result["sla"],
+        "status_breakdown": result["status_breakdown"],
+        "priority_distribution": {
+            row["priority"]: row["count"] for row in result["priority_distribution"]
+        },
+        "categories": {
+            c["category"]: (c["total"], {s["name"]: s["count"] for s in c["subs"]})
+            for c in result["requests_by_category"]
+        },
+        "trend": result["trend"],
+        "teams": {t["team_id"]: t["requests_count"] for t in result["teams"]["per_team"]},
+        "zones": {z["zone"]: z["count"] for z in result["zones"]},
+    }
+
+
+def merge_null_category(original: dict) -> dict:
+    categories = dict(original["categories"])
+    null_total, null_subs = categories.pop(None, (0, {}))
+    total, subs = categories.get("Uncategorized", (0, {}))
+    merged = dict(subs)
+    for name, n in null_subs.items():
+        merged[name] = merged.get(name, 0) + n
+    categories["Uncategorized"] = (total + null_total, merged)
+    return {**original, "categories": categories}
+
+
+def expected_open_sla(requests: list[dict], now: datetime) -> dict:
+    expected = {"ok": 0, "at_risk": 0, "breached": 0}
+    for r in requests:
+        if r["status"] not in OPEN_STATUSES or not r.get("sla_target_at"):
+            continue
+        if r["sla_breach_at"] <= now:
+            expected["breached"] += 1
+        elif r["sla_target_at"] <= now:
+            expected["at_risk"] += 1
+        else:
+            expected["ok"] += 1
+    return expected
+
+
+def test_dashboard_matches_original_implementation(mongo_db):
+    from app.api.admin.dashboard import _build_dashboard
+
+    now = datetime.utcnow()
+    teams = [{"_id": ObjectId(), "name": f"Team {n}", "deleted": False} for n in range(3)]
+    mongo_db.teams.insert_many(teams)
+    requests = seed_requests(now, [t["_id"] for t in teams])
+    mongo_db.service_requests.insert_many([dict(r) for r in requests])
+
+    result = asyncio.run(_build_dashboard())
+    original = original_dashboard(requests, now, teams)
+
+    # the dataset exercises the null-category difference
+    assert None in original["categories"]
+    assert comparable(result) == merge_null_category(original)
+
+    assert all(original["sla"][k] for k in ("ok", "at_risk", "breached"))
+
+    open_sla = expected_open_sla(requests, now)
+    assert open_sla["ok"] and open_sla["at_risk"] and open_sla["breached"]
+    assert result["open_sla"] == open_sla
@@ -0,0 +1,56 @@
+import asyncio
+from datetime import datetime
+
+from app.services import cohort_rollups
+
+REQUEST = {
+    "zone_name": "North",
+    "category": "Roads",
+    "sub_category": "Pothole",
+    "timestamps": {"created_at": datetime(2026, 3, 4, 10, 30)},
+}
+
+
+class FakeRollups:
+    def __init__(self):
+        self.ops = []
+
+    async def bulk_write(self, ops, ordered=True):
+        self.ops.extend(ops)
+
+
+def apply_changes(monkeypatch, changes):
+    rollups = FakeRollups()
+    # record (filter, update, upsert) instead of building pymongo operations
+    monkeypatch.setattr(
+        cohort_rollups, "UpdateOne", lambda filter, update, upsert=False: (filter, update, upsert)
+    )
+    monkeypatch.setattr(cohort_rollups, "cohort_rollups_collection", rollups)
+    asyncio.run(cohort_rollups.apply_changes(changes))
+    return rollups.ops
+
+
+def test_created_request_upserts_its_rollup(monkeypatch):
+    [(filter, update, upsert)] = apply_changes(monkeypatch, [(None, REQUEST)])
+
+    assert upsert is True
+    assert filter["_id"]["day"] == datetime(2026, 3, 4)
+    assert update["$inc"] == {"count": 1}
+    assert update["$setOnInsert"] == filter["_id"]
+    assert update["$min"] == {"first_seen": datetime(2026, 3, 4, 10, 30)}
+
+
+def test_moved_request_never_creates_a_rollup_for_the_decrement(monkeypatch):
+    moved = {**REQUEST, "zone_name": "South"}
+
+    [(old_filter, old_update, old_upsert), (new_filter, _, new_upsert)] = apply_changes(
+        monkeypatch, [(REQUEST, moved)]
+    )
+
+    assert old_filter["_id"]["zone"] == "North" and new_filter["_id"]["zone"] == "South"
+    assert old_update == {"$inc": {"count": -1}}
+    assert old_upsert is False and new_upsert is True
+
+
+def test_unchanged_cohort_writes_nothing(monkeypatch):
+    assert apply_changes(monkeypatch, [(REQUEST, {**REQUEST, "status": "closed"})]) == []
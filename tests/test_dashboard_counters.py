@@ -0,0 +1,67 @@
+import asyncio
+
+from app.services import dashboard_counters
+
+
+class FakeCursor:
+    def __init__(self, rows):
+        self.rows = rows
+
+    async def to_list(self, length=None):
+        return self.rows
+
+
+class FakeCounters:
+    def __init__(self):
+        self.ops = []
+
+    async def bulk_write(self, ops, ordered=True):
+        self.ops.extend(ops)
+
+
+def reconcile(monkeypatch, facets, before, after):
+    reads = iter([before, after])
+
+    async def read_counts():
+        return next(reads)
+
+    counters = FakeCounters()
+    # record the update documents instead of building pymongo operations
+    monkeypatch.setattr(
+        dashboard_counters, "UpdateOne", lambda filter, update, upsert=False: (filter, update)
+    )
+    monkeypatch.setattr(dashboard_counters, "DeleteMany", lambda filter: ("delete", filter))
+    monkeypatch.setattr(dashboard_counters, "_read_counts", read_counts)
+    monkeypatch.setattr(dashboard_counters, "dashboard_counters_collection", counters)
+    monkeypatch.setattr(
+        dashboard_counters.requests_collection, "aggregate", lambda pipeline: FakeCursor([facets])
+    )
+    result = asyncio.run(dashboard_counters.reconcile())
+    assert counters.ops[-1] == ("delete", {"count": 0})
+    updates = {filter["_id"]: update["$inc"]["count"] for filter, update in counters.ops[:-1]}
+    return result, updates
+
+
+def test_reconcile_corrects_by_difference(monkeypatch):
+    facets = {
+        "total": [{"_id": "all", "count": 10}],
+        "status": [{"_id": "new", "count": 7}, {"_id": "closed", "count": 3}],
+    }
+    counts = {("total", "all"): 9, ("status", "new"): 7, ("zone", "North"): 2}
+
+    result, updates = reconcile(monkeypatch, facets, counts, dict(counts))
+
+    # $inc by (recount - stored); "status:new" is already right, "zone:North" has no requests left
+    assert updates == {"total:all": 1, "status:closed": 3, "zone:North": -2}
+    assert result["corrected"] == 3 and result["in_flux"] == 0
+
+
+def test_reconcile_skips_counters_that_moved_during_the_aggregation(monkeypatch):
+    facets = {"total": [{"_id": "all", "count": 10}], "status": [{"_id": "new", "count": 10}]}
+    before = {("total", "all"): 8, ("status", "new"): 8}
+    after = {("total", "all"): 9, ("status", "new"): 8}
+
+    result, updates = reconcile(monkeypatch, facets, before, after)
+
+    assert updates == {"status:new": 2}
+    assert result["in_flux"] == 1
@@ -0,0 +1,27 @@
+from collections import Counter
+
+from app.services.heatmap import _mode, rollup_quadkeys
+
+
+def cell(count, zone=None):
+    return {"count": count, "age_sum": 2.0 * count, "zone": zone or {}, "category": {}, "sub_category": {}}
+
+
+def test_mode_breaks_ties_on_mixed_value_types():
+    assert _mode(Counter({"North": 2, 7: 2, None: 1})) == 7
+    assert _mode(Counter({"North": 3, 7: 2})) == "North"
+    assert _mode(Counter()) is None
+
+
+def test_rollup_merges_cells_on_the_quadkey_prefix():
+    base = {
+        "0120": cell(2, {"North": 2}),
+        "0121": cell(3, {"South": 3}),
+        "0300": cell(1, {"North": 1}),
+    }
+
+    merged = rollup_quadkeys(base, 3)
+
+    assert set(merged) == {"012", "030"}
+    assert merged["012"]["count"] == 5 and merged["012"]["age_sum"] == 10.0
+    assert _mode(merged["012"]["zone"]) == "South"
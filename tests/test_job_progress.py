@@ -0,0 +1,39 @@
+import asyncio
+
+from app.jobs import progress
+
+
+class FakeJobProgress:
+    def __init__(self):
+        self.docs = {}
+
+    async def replace_one(self, filter, doc, upsert=False):
+        self.docs[filter["_id"]] = dict(doc)
+
+    async def find_one(self, filter):
+        doc = self.docs.get(filter["_id"])
+        return dict(doc) if doc else None
+
+
+def test_progress_is_readable_from_another_process(monkeypatch):
+    stored = FakeJobProgress()
+    monkeypatch.setattr(progress, "job_progress_collection", stored)
+    monkeypatch.setattr(progress, "_jobs", {})
+
+    async def main():
+        job = progress.start_job("prefetch", total=4)
+        job.advance(n=3)
+        job.finish({"tiles": 3})
+        await asyncio.gather(*progress._persisting)
+
+        # another worker: nothing in memory, answered from job_progress
+        progress._jobs.clear()
+        return job.id, await progress.get_job(job.id), await progress.get_job("missing")
+
+    job_id, stored_job, missing = asyncio.run(main())
+
+    assert stored_job["job_id"] == job_id
+    assert stored_job["status"] == "done"
+    assert stored_job["done"] == 3 and stored_job["percent"] == 75.0
+    assert stored_job["result"] == {"tiles": 3}
+    assert missing is None
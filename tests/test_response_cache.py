@@ -0,0 +1,109 @@
+import asyncio
+
+import pytest
+
+from app.core.cache import ResponseCache
+
+
+def make_cache() -> ResponseCache:
+    return ResponseCache(ttl_seconds=60, max_bytes=10_000)
+
+
+def test_concurrent_callers_share_one_computation():
+    cache = make_cache()
+    calls = 0
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"n": calls}
+
+    async def main():
+        return await asyncio.gather(*(cache.get_or_compute("k", compute) for _ in range(5)))
+
+    results = asyncio.run(main())
+
+    assert results == [{"n": 1}] * 5
+    assert calls == 1
+    assert cache.stats()["coalesced"] == 4
+
+
+def test_waiter_takes_over_when_the_leader_is_cancelled():
+    cache = make_cache()
+    started = []
+    release = None
+
+    async def compute():
+        started.append(1)
+        if len(started) == 1:
+            await asyncio.sleep(3600)  # the leader, cancelled below
+        await release.wait()
+        return "value"
+
+    async def main():
+        nonlocal release
+        release = asyncio.Event()
+        leader = asyncio.create_task(cache.get_or_compute("k", compute))
+        await asyncio.sleep(0)
+        waiters = [asyncio.create_task(cache.get_or_compute("k", compute)) for _ in range(3)]
+        await asyncio.sleep(0)
+
+        leader.cancel()
+        await asyncio.sleep(0.01)
+        release.set()
+        return leader, await asyncio.gather(*waiters)
+
+    leader, results = asyncio.run(main())
+
+    assert leader.cancelled()
+    assert results == ["value"] * 3
+    assert len(started) == 2  # one waiter recomputed, the others coalesced onto it
+    assert cache.get("k") == "value"
+
+
+def test_invalidating_another_tag_keeps_the_computed_result():
+    cache = make_cache()
+
+    async def main():
+        async def compute():
+            cache.invalidate("other")
+            return "fresh"
+
+        return await cache.get_or_compute("k", compute, tags=("requests",))
+
+    assert asyncio.run(main()) == "fresh"
+    assert cache.get("k") == "fresh"
+
+
+@pytest.mark.parametrize("tag", ["requests", None])
+def test_result_computed_across_its_own_invalidation_is_not_stored(tag):
+    cache = make_cache()
+
+    async def main():
+        async def compute():
+            cache.invalidate(tag)
+            return "stale"
+
+        return await cache.get_or_compute("k", compute, tags=("requests",))
+
+    assert asyncio.run(main()) == "stale"
+    assert cache.get("k") is None
+
+
+def test_none_result_is_cached():
+    cache = make_cache()
+    calls = 0
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        return None
+
+    async def main():
+        return [await cache.get_or_compute("k", compute) for _ in range(3)]
+
+    assert asyncio.run(main()) == [None] * 3
+    assert calls == 1
+    assert cache.stats()["hits"] == 2
+    assert cache.get("missing", "default") == "default"
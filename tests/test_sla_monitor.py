@@ -0,0 +1,41 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+
+from app.jobs import sla_monitor
+
+NOW = datetime(2026, 5, 1, 12, 0)
+
+
+def sweep_due(monkeypatch, checkpoint, interval=3600, requested=False):
+    async def get(job):
+        assert job == sla_monitor.CHECKPOINT
+        return checkpoint
+
+    async def take_request(job):
+        return requested
+
+    monkeypatch.setattr(sla_monitor.JobCheckpointRepository, "get", get)
+    monkeypatch.setattr(sla_monitor.JobCheckpointRepository, "take_request", take_request)
+    return asyncio.run(sla_monitor._sweep_due(NOW, interval))
+
+
+@pytest.mark.parametrize(
+    "checkpoint, interval, expected",
+    [
+        (None, 3600, "periodic"),  # never swept: catch-up on the first leader
+        ({"completed_at": NOW - timedelta(hours=2)}, 3600, "periodic"),
+        ({"completed_at": NOW - timedelta(minutes=5)}, 3600, None),
+        ({"completed_at": NOW - timedelta(days=9)}, 0, None),  # periodic sweeps off
+        ({"last_id": ObjectId(), "completed_at": NOW}, 0, "resume"),  # interrupted by a handover
+    ],
+)
+def test_sweep_due(monkeypatch, checkpoint, interval, expected):
+    assert sweep_due(monkeypatch, checkpoint, interval) == expected
+
+
+def test_requested_sweep_wins(monkeypatch):
+    recent = {"completed_at": NOW - timedelta(minutes=1)}
+    assert sweep_due(monkeypatch, recent, requested=True) == "requested"
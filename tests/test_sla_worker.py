@@ -0,0 +1,64 @@
+import asyncio
+
+from app.jobs import sla_worker
+
+
+class HeldLease:
+    owner = "test-worker"
+
+    async def acquire(self):
+        return True
+
+    async def renew(self):
+        return True
+
+    async def release(self):
+        pass
+
+
+def stop_worker_during_batch(monkeypatch, batch_seconds: float, grace: float) -> list:
+    monkeypatch.setattr(sla_worker.get_settings(), "sla_stop_grace_seconds", grace)
+    finished = []
+
+    async def monitor_loop(interval_seconds, stop_event):
+        await stop_event.wait()
+        await asyncio.sleep(batch_seconds)  # the batch in flight when stop was signalled
+        finished.append(True)
+
+    monkeypatch.setattr(sla_worker, "sla_monitor_loop", monitor_loop)
+
+    async def main():
+        stop_event = asyncio.Event()
+        worker = asyncio.create_task(sla_worker.run_sla_worker(stop_event, HeldLease()))
+        await asyncio.sleep(0.01)
+        stop_event.set()
+        await asyncio.wait_for(worker, timeout=5)
+
+    asyncio.run(main())
+    return finished
+
+
+def test_stop_lets_the_current_batch_finish(monkeypatch):
+    assert stop_worker_during_batch(monkeypatch, batch_seconds=0.05, grace=1) == [True]
+
+
+def test_stop_cancels_a_batch_that_outlasts_the_grace_period(monkeypatch):
+    assert stop_worker_during_batch(monkeypatch, batch_seconds=5, grace=0.05) == []
+
+
+def test_manual_scan_stops_when_the_lease_is_lost(monkeypatch):
+    monkeypatch.setattr(sla_worker.get_settings(), "sla_lease_ttl_seconds", 3)  # renew every 1s
+
+    class LostOnRenew(HeldLease):
+        async def renew(self):
+            return False
+
+    monkeypatch.setattr(sla_worker, "Lease", lambda name, ttl: LostOnRenew())
+
+    async def scan(batch_size, concurrency, stop_event):
+        await asyncio.wait_for(stop_event.wait(), timeout=5)
+        return {"interrupted": stop_event.is_set()}
+
+    monkeypatch.setattr(sla_worker, "run_sla_scan", scan)
+
+    assert asyncio.run(sla_worker.run_sla_scan_exclusive(100, 1)) == {"interrupted": True}
@@ -0,0 +1,172 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.services.tile_cache import OSMTileCache, TileFetchError
+
+UPSTREAM = "https://tiles.test/{z}/{x}/{y}.png"
+
+
+class StandInTileServer:
+    """
+    httpx.MockTransport handler: serves `body` per tile with an ETag and
+    Last-Modified, answers conditional requests with 304 and can be switched
+    to failing.
+    """
+
+    def __init__(self, size: int = 100):
+        self.size = size
+        self.requests: list[httpx.Request] = []
+        self.fail_with: str | int | None = None  # "connect" or an HTTP status
+
+    def body(self, path: str) -> bytes:
+        return path.encode().ljust(self.size, b"\0")[: self.size]
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        if self.fail_with == "connect":
+            raise httpx.ConnectError("upstream down", request=request)
+        if isinstance(self.fail_with, int):
+            return httpx.Response(self.fail_with)
+
+        etag = f'"{request.url.path}"'
+        if request.headers.get("If-None-Match") == etag:
+            return httpx.Response(304)
+        return httpx.Response(
+            200,
+            content=self.body(request.url.path),
+            headers={"ETag": etag, "Last-Modified": "Wed, 01 Jan 2025 00:00:00 GMT"},
+        )
+
+
+def make_cache(tmp_path, server, fresh_seconds=3600, max_bytes=10_000) -> OSMTileCache:
+    return OSMTileCache(
+        cache_dir=str(tmp_path),
+        max_bytes=max_bytes,
+        fresh_seconds=fresh_seconds,
+        upstream_url=UPSTREAM,
+        max_concurrency=2,
+        timeout_seconds=1,
+        user_agent="cst-tests",
+        transport=httpx.MockTransport(server),
+    )
+
+
+def run(cache: OSMTileCache, steps):
+    async def main():
+        await cache.start()
+        try:
+            return await steps()
+        finally:
+            await cache.close()
+
+    return asyncio.run(main())
+
+
+def test_fresh_tile_is_served_from_disk(tmp_path):
+    server = StandInTileServer()
+    cache = make_cache(tmp_path, server)
+
+    async def steps():
+        first, _ = await cache.get_tile(12, 1, 2)
+        second, _ = await cache.get_tile(12, 1, 2)
+        return first, second
+
+    first, second = run(cache, steps)
+
+    assert first == second == server.body("/12/1/2.png")
+    assert len(server.requests) == 1
+    assert cache.stats()["hits"] == 1
+    assert (tmp_path / "12" / "1" / "2.png").read_bytes() == first
+
+
+def test_stale_tile_is_revalidated_with_etag_and_last_modified(tmp_path):
+    server = StandInTileServer()
+    cache = make_cache(tmp_path, server, fresh_seconds=0)
+
+    async def steps():
+        await cache.get_tile(12, 1, 2)
+        return await cache.get_tile(12, 1, 2)
+
+    content, meta = run(cache, steps)
+
+    revalidation = server.requests[1]
+    assert revalidation.headers["If-None-Match"] == '"/12/1/2.png"'
+    assert revalidation.headers["If-Modified-Since"] == "Wed, 01 Jan 2025 00:00:00 GMT"
+    assert content == server.body("/12/1/2.png")
+    assert meta["etag"] == '"/12/1/2.png"'
+    assert cache.stats()["revalidated"] == 1
+    assert cache.stats()["fetched"] == 1
+
+
+@pytest.mark.parametrize("failure", ["connect", 503])
+def test_stale_tile_is_served_when_upstream_fails(tmp_path, failure):
+    server = StandInTileServer()
+    cache = make_cache(tmp_path, server, fresh_seconds=0)
+
+    async def steps():
+        await cache.get_tile(12, 1, 2)
+        server.fail_with = failure
+        return await cache.get_tile(12, 1, 2)
+
+    content, _ = run(cache, steps)
+
+    assert content == server.body("/12/1/2.png")
+    assert cache.stats()["stale_served"] == 1
+
+
+def test_upstream_failure_without_cached_copy_raises(tmp_path):
+    server = StandInTileServer()
+    server.fail_with = "connect"
+    cache = make_cache(tmp_path, server)
+
+    with pytest.raises(TileFetchError) as exc:
+        run(cache, lambda: cache.get_tile(12, 1, 2))
+    assert exc.value.status_code == 502
+
+
+def test_least_recently_used_tile_is_evicted_over_byte_budget(tmp_path):
+    server = StandInTileServer(size=100)
+    cache = make_cache(tmp_path, server, max_bytes=250)
+
+    async def steps():
+        await cache.get_tile(12, 0, 0)  # A
+        await cache.get_tile(12, 0, 1)  # B
+        await cache.get_tile(12, 0, 0)  # A again: B is now least recently used
+        await cache.get_tile(12, 0, 2)  # C pushes the cache over 250 bytes
+
+    run(cache, steps)
+
+    assert cache.is_cached(12, 0, 0)
+    assert not cache.is_cached(12, 0, 1)
+    assert cache.is_cached(12, 0, 2)
+    assert not (tmp_path / "12" / "0" / "1.png").exists()
+    assert cache.stats()["bytes"] == 200
+    assert cache.stats()["evictions"] == 1
+
+
+def test_index_is_rebuilt_from_disk_on_start(tmp_path):
+    server = StandInTileServer()
+    first = make_cache(tmp_path, server)
+    run(first, lambda: first.get_tile(12, 3, 4))
+
+    restarted = make_cache(tmp_path, server)
+    run(restarted, lambda: restarted.get_tile(12, 3, 4))
+
+    assert restarted.is_cached(12, 3, 4)
+    assert restarted.stats()["hits"] == 1
+    assert len(server.requests) == 1
+
+
+def test_count_cached_only_counts_tiles_inside_each_zoom_range(tmp_path):
+    server = StandInTileServer()
+    cache = make_cache(tmp_path, server)
+
+    async def steps():
+        for z, x, y in [(12, 1, 1), (12, 5, 5), (13, 2, 2), (14, 0, 0)]:
+            await cache.get_tile(z, x, y)
+
+    run(cache, steps)
+
+    assert cache.count_cached({12: (0, 0, 2, 2), 13: (2, 2, 3, 3)}) == {12: 1, 13: 1}
@@ -0,0 +1,26 @@
+import asyncio
+
+import pytest
+
+from app.core.config import OSM_TILE_URL, get_settings
+from app.jobs.tile_prefetch import check_prefetch_upstream, start_prefetch
+
+
+@pytest.mark.parametrize(
+    "url",
+    [OSM_TILE_URL, "https://a.tile.openstreetmap.org/{z}/{x}/{y}.png"],
+)
+def test_prefetch_refuses_the_public_osm_servers(url):
+    with pytest.raises(ValueError):
+        check_prefetch_upstream(url)
+
+
+def test_prefetch_accepts_a_configured_upstream():
+    check_prefetch_upstream("https://tiles.example.org/osm/{z}/{x}/{y}.png")
+
+
+def test_start_prefetch_with_the_default_upstream_is_refused(monkeypatch):
+    monkeypatch.setattr(get_settings(), "tile_upstream_url", OSM_TILE_URL)
+
+    with pytest.raises(ValueError, match="OpenStreetMap"):
+        asyncio.run(start_prefetch(bbox=(4.8, 52.3, 4.9, 52.4), min_zoom=10, max_zoom=10))